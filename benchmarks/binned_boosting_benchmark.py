@@ -0,0 +1,103 @@
+"""
+Benchmark of the histogram gradient boosting candidate trained on binned features.
+
+Builds APS shaped train and test sets (the resampling benchmark data) and compares the
+candidates of config/model.yaml on their inputs: the random forest and k nearest neighbors on
+the scaled float32 features, resampled with smote_batched, the fastest strategy, and the
+histogram gradient boosting on the uint8 codes of ``FeatureBinner``, with weighted classes.
+For every input the benchmark reports the preprocessing time and the size of the training set
+as .npy (against float64 and float32), and for every model the fit time, the predict time on
+the test set, the size of the pickled model and the f1 on the test set.
+
+    python -m benchmarks.binned_boosting_benchmark --rows 60000
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.resampling_benchmark import make_fault_dataset
+
+
+def npy_size(array: np.ndarray) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "array.npy")
+        np.save(file_path, array)
+        return os.path.getsize(file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=60000)
+    parser.add_argument("--columns", type=int, default=170)
+    parser.add_argument("--signal-columns", type=int, default=20)
+    parser.add_argument("--test-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+    from sklearn.metrics import f1_score
+    from sklearn.neighbors import KNeighborsClassifier
+
+    from sensor_fault_detection.components.data_transformation import DataTransformation
+    from sensor_fault_detection.ml.binning import FeatureBinner
+    from sensor_fault_detection.ml.resampling import Resampler
+
+    n_test = int(args.rows * args.test_ratio)
+    x_train_df, y_train = make_fault_dataset(args.rows - n_test, args.columns, args.signal_columns, 0)
+    x_test_df, y_test = make_fault_dataset(n_test, args.columns, args.signal_columns, 1)
+
+    start = time.perf_counter()
+    preprocessor = DataTransformation.get_data_transformer_object(None)
+    x_features = preprocessor.fit_transform(x_train_df).astype(np.float32)
+    x_features_test = preprocessor.transform(x_test_df).astype(np.float32)
+    x_features, y_features = Resampler(strategy="smote_batched").fit_resample(x_features, y_train)
+    x_features = x_features.astype(np.float32)
+    features_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    binner = FeatureBinner().fit(x_train_df)
+    x_binned = binner.transform(x_train_df)
+    x_binned_test = binner.transform(x_test_df)
+    binned_seconds = time.perf_counter() - start
+
+    print(f"train rows: {len(y_train)}, columns: {args.columns}, cpus: {os.cpu_count()}")
+    print(f"{'input':>9} {'prep s':>7} {'rows':>7} {'npy MiB':>8} {'vs f64':>7} {'vs f32':>7}")
+    for name, seconds, x in (
+        ("features", features_seconds, x_features),
+        ("binned", binned_seconds, x_binned),
+    ):
+        size = npy_size(x)
+        print(
+            f"{name:>9} {seconds:>7.2f} {len(x):>7} {size / 2 ** 20:>8.1f} "
+            f"{x.size * 8 / size:>7.2f} {x.size * 4 / size:>7.2f}"
+        )
+
+    print(f"{'model':>14} {'input':>9} {'fit s':>7} {'predict s':>10} {'pickle MiB':>11} {'f1':>6}")
+    for name, model, model_input, x, y, x_test in (
+        ("random forest", RandomForestClassifier(n_estimators=200, max_depth=12, n_jobs=-1,
+                                                 random_state=42),
+         "features", x_features, y_features, x_features_test),
+        ("knn", KNeighborsClassifier(n_neighbors=5), "features", x_features, y_features,
+         x_features_test),
+        ("hist boosting", HistGradientBoostingClassifier(max_iter=200, max_leaf_nodes=31,
+                                                         class_weight="balanced",
+                                                         random_state=42),
+         "binned", x_binned, y_train, x_binned_test),
+    ):
+        start = time.perf_counter()
+        model.fit(x, y)
+        fit_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        y_pred = model.predict(x_test)
+        predict_seconds = time.perf_counter() - start
+        print(
+            f"{name:>14} {model_input:>9} {fit_seconds:>7.2f} {predict_seconds:>10.2f} "
+            f"{len(pickle.dumps(model)) / 2 ** 20:>11.2f} {f1_score(y_test, y_pred):>6.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark of the in memory and the chunked preprocessing fit of data transformation.
+
+Writes an APS shaped train parquet file (the drift benchmark data with the schema column
+names) and fits and applies the preprocessor on it with ``fit_mode`` "memory" and
+"chunked", each in a fresh process, reporting the seconds and peak RSS growth. The chunked
+scaler center and scale are then compared with the exact ones: the error is reported
+relative to the exact scale, the sensor counts are integers so the quantile estimates
+are off by whole counts when they are off.
+
+    python -m benchmarks.chunked_preprocessing_benchmark --rows 200000 --chunk-size 50000
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.drift_benchmark import make_dataset
+from benchmarks.mongo_export_benchmark import PeakRSSSampler, current_rss
+
+
+def run_mode(fit_mode, data_dir, chunk_size, n_jobs, results):
+    from sensor_fault_detection.components.data_transformation import DataTransformation
+    from sensor_fault_detection.entity.artifact_entity import (
+        DataIngestionArtifact,
+        DataValidationArtifact,
+    )
+    from sensor_fault_detection.entity.config_entity import DataTransformationConfig
+    from sensor_fault_detection.utils.main_utils import save_object
+
+    ingestion_artifact = DataIngestionArtifact(
+        trained_file_path=os.path.join(data_dir, "train.parquet"),
+        test_file_path=os.path.join(data_dir, "test.parquet"),
+    )
+    validation_artifact = DataValidationArtifact(True, "", "", "", "")
+    config = DataTransformationConfig(
+        transformed_train_features_file_path=os.path.join(data_dir, fit_mode, "train_features.npy"),
+        transformed_test_features_file_path=os.path.join(data_dir, fit_mode, "test_features.npy"),
+        fit_mode=fit_mode,
+        chunk_size=chunk_size,
+        n_jobs=n_jobs,
+    )
+    data_transformation = DataTransformation(ingestion_artifact, validation_artifact, config)
+    preprocessor = data_transformation.get_data_transformer_object()
+
+    baseline = current_rss()
+    sampler = PeakRSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    if fit_mode == "chunked":
+        data_transformation.transform_features_in_chunks(preprocessor, fit=True)
+    else:
+        data_transformation.transform_features(preprocessor, fit=True)
+    elapsed = time.perf_counter() - start
+    results[fit_mode] = (elapsed, sampler.stop() - baseline)
+    save_object(os.path.join(data_dir, f"{fit_mode}.pkl"), preprocessor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--jobs", type=int, default=4)
+    args = parser.parse_args()
+
+    from sensor_fault_detection.constant.training_pipeline import (
+        DATA_INGESTION_EXPORT_BATCH_SIZE,
+    )
+    from sensor_fault_detection.utils.main_utils import (
+        DataFrameWriter,
+        get_schema_dtypes,
+        load_object,
+    )
+
+    feature_columns = list(get_schema_dtypes())
+    data_dir = tempfile.mkdtemp()
+    for file_name, n_rows, seed in (("train", args.rows, 0), ("test", args.rows // 4, 1)):
+        dataframe = make_dataset(n_rows, len(feature_columns), 0.0, seed)
+        dataframe.columns = feature_columns + ["class"]
+        # row groups of the ingestion export batch size, like the ingested files
+        with DataFrameWriter(os.path.join(data_dir, f"{file_name}.parquet")) as writer:
+            for start in range(0, n_rows, DATA_INGESTION_EXPORT_BATCH_SIZE):
+                writer.write(dataframe.iloc[start: start + DATA_INGESTION_EXPORT_BATCH_SIZE])
+        del dataframe
+
+    results = multiprocessing.Manager().dict()
+    for fit_mode in ("memory", "chunked"):
+        process = multiprocessing.Process(
+            target=run_mode, args=(fit_mode, data_dir, args.chunk_size, args.jobs, results)
+        )
+        process.start()
+        process.join()
+
+    exact = load_object(os.path.join(data_dir, "memory.pkl")).steps[-1][1]
+    streamed = load_object(os.path.join(data_dir, "chunked.pkl")).steps[-1][1]
+    shutil.rmtree(data_dir)
+    center_error = np.abs(streamed.center_ - exact.center_) / exact.scale_
+    scale_error = np.abs(streamed.scale_ / exact.scale_ - 1)
+
+    print(f"{'fit mode':<10} {'seconds':>10} {'peak RSS MiB':>14}")
+    for fit_mode, (elapsed, peak_rss) in results.items():
+        print(f"{fit_mode:<10} {elapsed:>10.2f} {peak_rss / 2 ** 20:>14.1f}")
+    print(
+        f"center error / scale: median {np.median(center_error):.2e} max {center_error.max():.2e}, "
+        f"relative scale error: median {np.median(scale_error):.2e} max {scale_error.max():.2e}"
+    )
+
+
+if __name__ == "__main__":
+    main()
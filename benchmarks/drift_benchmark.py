@@ -0,0 +1,76 @@
+"""
+Benchmark of the data validation drift engines.
+
+Builds APS shaped reference (train) and current (test) sets: heavy tailed
+float32 sensor counts with missing values and the "pos"/"neg" class, with a
+shift applied to part of the current columns. It then times the evidently
+DataDriftPreset report and the native ``DataDriftDetector`` for several
+thread counts, and checks that both engines report the same number of
+drifted columns and the same dataset drift decision.
+
+    python -m benchmarks.drift_benchmark --rows 60000 --columns 170 --jobs 1 4
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def make_dataset(rows: int, columns: int, drifted_share: float, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {}
+    n_drifted = int(columns * drifted_share)
+    for index in range(columns):
+        shift = 0.5 if index < n_drifted else 0.0
+        values = np.round(rng.lognormal(mean=3 + shift, sigma=2, size=rows)).astype(np.float32)
+        values[rng.random(rows) < 0.05 + 0.2 * (index % 7 == 0)] = np.nan
+        data[f"f{index:03d}"] = values
+    data["class"] = np.where(rng.random(rows) < 0.017, "pos", "neg")
+    return pd.DataFrame(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=60000)
+    parser.add_argument("--columns", type=int, default=170)
+    parser.add_argument("--test-ratio", type=float, default=0.2)
+    parser.add_argument("--drifted-share", type=float, default=0.3)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--skip-evidently", action="store_true")
+    args = parser.parse_args()
+
+    from sensor_fault_detection.ml.drift import DataDriftDetector
+
+    n_test = int(args.rows * args.test_ratio)
+    reference_df = make_dataset(args.rows - n_test, args.columns, 0.0, seed=0)
+    current_df = make_dataset(n_test, args.columns, args.drifted_share, seed=1)
+
+    results = []
+    if not args.skip_evidently:
+        from evidently.metric_preset import DataDriftPreset
+        from evidently.report import Report
+
+        start = time.perf_counter()
+        report = Report([DataDriftPreset()])
+        report.run(reference_data=reference_df, current_data=current_df)
+        result = json.loads(report.json())["metrics"][0]["result"]
+        results.append(("evidently", time.perf_counter() - start, result))
+
+    for n_jobs in args.jobs:
+        start = time.perf_counter()
+        result = DataDriftDetector(n_jobs=n_jobs).run(reference_df, current_df)
+        results.append((f"native x{n_jobs}", time.perf_counter() - start, result))
+
+    baseline = results[0][1]
+    print(f"{'engine':<12} {'seconds':>10} {'speed-up':>10} {'drifted':>9} {'dataset drift':>14}")
+    for engine, elapsed, result in results:
+        print(
+            f"{engine:<12} {elapsed:>10.2f} {baseline / elapsed:>10.1f} "
+            f"{result['number_of_drifted_columns']:>9} {str(result['dataset_drift']):>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark of the feature pruning of data transformation.
+
+Builds APS shaped train and test sets (the resampling benchmark data) where a share of the
+columns is redundant like in the APS data: constant, mostly missing or a rescaled copy of a
+signal column plus noise. The data transformation pipeline is fitted on them, then, without
+pruning and with ``FeaturePruner`` (and optionally its importance selection), the benchmark
+reports the pruning time, the number of columns, the smote_batched resampling time, the
+random forest fit time, the ``SensorFaultModel.predict`` time on the test set and the f1 on it.
+
+    python -m benchmarks.feature_pruning_benchmark --rows 40000 --redundant-share 0.4
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.resampling_benchmark import make_fault_dataset
+
+
+def add_redundant_columns(dataframe, share: float, signal_columns: int, seed: int):
+    rng = np.random.default_rng(seed)
+    n_redundant = int(dataframe.shape[1] * share)
+    for index, column in enumerate(dataframe.columns[dataframe.shape[1] - n_redundant:]):
+        kind = index % 3
+        if kind == 0:
+            dataframe[column] = np.float32(index)
+        elif kind == 1:
+            dataframe.loc[rng.random(len(dataframe)) < 0.9, column] = np.nan
+        else:
+            source = dataframe[dataframe.columns[index % signal_columns]]
+            dataframe[column] = (
+                source * 3 + rng.normal(0, 1e-3, len(dataframe)) * source.std()
+            ).astype(np.float32)
+    return dataframe
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=40000)
+    parser.add_argument("--signal-columns", type=int, default=20)
+    parser.add_argument("--redundant-share", type=float, default=0.4)
+    parser.add_argument("--importance-top-k", type=int, default=40)
+    parser.add_argument("--test-ratio", type=float, default=0.2)
+    parser.add_argument("--trees", type=int, default=50)
+    args = parser.parse_args()
+
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import f1_score
+
+    from sensor_fault_detection.components.data_transformation import DataTransformation
+    from sensor_fault_detection.ml.estimator import SensorFaultModel
+    from sensor_fault_detection.ml.feature_pruning import FeaturePruner, prune_preprocessor
+    from sensor_fault_detection.ml.resampling import Resampler
+    from sensor_fault_detection.utils.main_utils import get_schema_dtypes
+
+    feature_columns = list(get_schema_dtypes())
+    n_test = int(args.rows * args.test_ratio)
+    frames = []
+    for n_rows, seed in ((args.rows - n_test, 0), (n_test, 1)):
+        x, y = make_fault_dataset(n_rows, len(feature_columns), args.signal_columns, seed)
+        x.columns = feature_columns
+        frames.append((add_redundant_columns(x, args.redundant_share, args.signal_columns, seed), y))
+    (x_train_df, y_train), (x_test_df, y_test) = frames
+    preprocessor = DataTransformation.get_data_transformer_object(None)
+    x_train = preprocessor.fit_transform(x_train_df)
+    missing_ratios = x_train_df.isna().mean()
+
+    print(
+        f"{'pruning':>12} {'prune s':>8} {'columns':>8} {'smote s':>8} {'fit s':>7} "
+        f"{'predict s':>10} {'f1':>6}"
+    )
+    for name, top_k in (("none", None), ("thresholds", 0), ("importance", args.importance_top_k)):
+        start = time.perf_counter()
+        if top_k is None:
+            pruned_preprocessor, x_pruned = preprocessor, x_train
+        else:
+            positions = FeaturePruner(importance_top_k=top_k).fit(
+                x_train, y_train, feature_columns, missing_ratios
+            )
+            pruned_preprocessor = prune_preprocessor(preprocessor, positions)
+            x_pruned = x_train[:, positions]
+        prune_seconds = time.perf_counter() - start
+
+        resampler = Resampler(strategy="smote_batched")
+        x_resampled, y_resampled = resampler.fit_resample(x_pruned, y_train)
+        model = RandomForestClassifier(
+            n_estimators=args.trees, max_depth=10, n_jobs=-1, random_state=0
+        )
+        start = time.perf_counter()
+        model.fit(x_resampled, y_resampled)
+        fit_seconds = time.perf_counter() - start
+        sensor_fault_model = SensorFaultModel(pruned_preprocessor, model)
+        start = time.perf_counter()
+        y_pred = sensor_fault_model.predict(x_test_df)
+        predict_seconds = time.perf_counter() - start
+        print(
+            f"{name:>12} {prune_seconds:>8.2f} {x_pruned.shape[1]:>8} "
+            f"{resampler.report['seconds']:>8.2f} {fit_seconds:>7.2f} {predict_seconds:>10.3f} "
+            f"{f1_score(y_test, y_pred):>6.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
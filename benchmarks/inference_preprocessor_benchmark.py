@@ -0,0 +1,74 @@
+"""
+Benchmark of the compiled inference preprocessor of ``SensorFaultModel``.
+
+Fits the data transformation pipeline on APS shaped data (the resampling benchmark data,
+float32 with missing values) and, for batches of increasing size, checks that
+``CompiledPreprocessor.transform`` returns exactly the pipeline output and reports the
+median latency of both, and of a full ``SensorFaultModel.predict`` with either.
+
+    python -m benchmarks.inference_preprocessor_benchmark --batch-sizes 1 10 100 1000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.resampling_benchmark import make_fault_dataset
+
+
+def median_seconds(function, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    from sklearn.ensemble import RandomForestClassifier
+
+    from sensor_fault_detection.components.data_transformation import DataTransformation
+    from sensor_fault_detection.ml.estimator import SensorFaultModel
+    from sensor_fault_detection.utils.main_utils import get_schema_dtypes
+
+    feature_columns = list(get_schema_dtypes())
+    x, y = make_fault_dataset(args.rows, len(feature_columns), 20, 0)
+    x.columns = feature_columns
+    preprocessor = DataTransformation.get_data_transformer_object(None)
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0)
+    model.fit(preprocessor.fit_transform(x), y)
+    sensor_fault_model = SensorFaultModel(preprocessor, model)
+    compiled = sensor_fault_model.compiled_preprocessor
+    pipeline_model = SensorFaultModel(preprocessor, model)
+    pipeline_model.compiled_preprocessor = None
+
+    print(
+        f"{'batch':>6} {'pipeline us':>12} {'compiled us':>12} {'speedup':>8} "
+        f"{'predict us':>11} {'compiled predict us':>20}"
+    )
+    for batch_size in args.batch_sizes:
+        batch = x.iloc[:batch_size].copy()
+        if not np.array_equal(compiled.transform(batch), preprocessor.transform(batch)):
+            raise AssertionError(f"compiled output differs from the pipeline at batch {batch_size}")
+        pipeline_seconds = median_seconds(lambda: preprocessor.transform(batch), args.repeats)
+        compiled_seconds = median_seconds(lambda: compiled.transform(batch), args.repeats)
+        predict_seconds = median_seconds(lambda: pipeline_model.predict(batch), args.repeats)
+        compiled_predict_seconds = median_seconds(
+            lambda: sensor_fault_model.predict(batch), args.repeats
+        )
+        print(
+            f"{batch_size:>6} {pipeline_seconds * 1e6:>12.0f} {compiled_seconds * 1e6:>12.0f} "
+            f"{pipeline_seconds / compiled_seconds:>8.1f} {predict_seconds * 1e6:>11.0f} "
+            f"{compiled_predict_seconds * 1e6:>20.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark of the parameter search of model training.
+
+Preprocesses an APS shaped training set (the resampling benchmark data, resampled with
+smote_batched, the fastest strategy) into memory mapped .npy files and searches the
+models and grids of config/model.yaml with the neuro_mf sequential GridSearchCV and with
+``ModelSearch`` for every --strategies search strategy and --jobs process count, reporting
+the wall time, the speedup over the first search, the best candidate with its cross
+validation score and its f1 on a test set once refitted on the whole training set. The
+search only scales up to the number of cpus of the machine.
+
+    python -m benchmarks.model_search_benchmark --rows 10000 --jobs 1 2 4 8
+    python -m benchmarks.model_search_benchmark --strategies grid halving random --jobs 1
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.resampling_benchmark import make_fault_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--strategies", nargs="+", default=["grid"])
+    parser.add_argument("--resource", default="n_samples")
+    parser.add_argument("--budget", type=float, default=None)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    from neuro_mf import ModelFactory
+    from sklearn.base import clone
+    from sklearn.metrics import f1_score
+
+    from sensor_fault_detection.components.data_transformation import DataTransformation
+    from sensor_fault_detection.constant.training_pipeline import (
+        MODEL_TRAINER_MODEL_CONFIG_FILE_PATH,
+    )
+    from sensor_fault_detection.ml.model_search import ModelSearch
+    from sensor_fault_detection.ml.resampling import Resampler
+
+    x, y = make_fault_dataset(args.rows, 170, 20, 0)
+    x_test, y_test = make_fault_dataset(args.rows // 4, 170, 20, 1)
+    preprocessor = DataTransformation.get_data_transformer_object(None)
+    x = preprocessor.fit_transform(x)
+    x_test = preprocessor.transform(x_test)
+    x, y = Resampler(strategy="smote_batched").fit_resample(x, y)
+    data_dir = tempfile.mkdtemp()
+    x_file_path, y_file_path = os.path.join(data_dir, "x.npy"), os.path.join(data_dir, "y.npy")
+    np.save(x_file_path, x.astype(np.float32))
+    np.save(y_file_path, y.astype(np.int8))
+
+    model_factory = ModelFactory(model_config_path=MODEL_TRAINER_MODEL_CONFIG_FILE_PATH)
+    cv = model_factory.grid_search_property_data.get("cv", 5)
+    results = []
+    if not args.skip_sequential:
+        model_factory.grid_search_property_data["verbose"] = 0
+        start = time.perf_counter()
+        best = ModelFactory.get_best_model_from_grid_searched_best_model_list(
+            model_factory.initiate_best_parameter_search_for_initialized_models(
+                model_factory.get_initialized_model_list(),
+                np.load(x_file_path, mmap_mode="r"),
+                np.load(y_file_path, mmap_mode="r"),
+            ),
+            base_accuracy=0.0,
+        )
+        results.append(("GridSearchCV", time.perf_counter() - start, best))
+    for strategy in args.strategies:
+        for n_jobs in args.jobs:
+            model_search = ModelSearch(
+                strategy=strategy,
+                cv=cv,
+                n_jobs=n_jobs,
+                candidate_time_budget=args.budget,
+                resource=args.resource,
+            )
+            start = time.perf_counter()
+            best = ModelFactory.get_best_model_from_grid_searched_best_model_list(
+                model_search.search(
+                    model_factory.get_initialized_model_list(), x_file_path, y_file_path
+                ),
+                base_accuracy=0.0,
+            )
+            results.append((f"{strategy}({n_jobs})", time.perf_counter() - start, best))
+    shutil.rmtree(data_dir)
+
+    print(f"cpus: {os.cpu_count()}, rows: {len(y)}")
+    print(f"{'search':>16} {'seconds':>9} {'speedup':>8} {'cv score':>9} {'test f1':>8}  best candidate")
+    for name, seconds, best in results:
+        model = clone(best.best_model).fit(x, y)
+        print(
+            f"{name:>16} {seconds:>9.1f} {results[0][1] / seconds:>8.2f} "
+            f"{best.best_score:>9.4f} {f1_score(y_test, model.predict(x_test)):>8.3f}  {best.best_model}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark of the mongodb export used by data ingestion.
+
+Compares the legacy ``pd.DataFrame(list(collection.find()))`` export with the
+batched streaming export of ``SensorData`` and reports rows/sec and peak RSS
+growth for each mode. Every mode runs in a fresh process so the RSS numbers
+do not leak between runs.
+
+By default the collection lives in mongomock, pass ``--mongodb-url`` to run
+against a real mongod.
+
+    python -m benchmarks.mongo_export_benchmark --rows 36000 --batch-size 10000
+"""
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+
+DATABASE_NAME = "sensor_fault_benchmark"
+COLLECTION_NAME = "sensor_fault"
+
+
+def current_rss() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class PeakRSSSampler(threading.Thread):
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, current_rss())
+            time.sleep(self.interval)
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return max(self.peak, current_rss())
+
+
+def get_mongo_client(mongodb_url):
+    if mongodb_url is None:
+        import mongomock
+
+        return mongomock.MongoClient()
+    import pymongo
+
+    return pymongo.MongoClient(mongodb_url)
+
+
+def seed_collection(client, rows: int, columns: int) -> None:
+    collection = client[DATABASE_NAME][COLLECTION_NAME]
+    if collection.estimated_document_count() == rows:
+        return
+    collection.drop()
+    rng = np.random.default_rng(42)
+    names = [f"f{i:03d}" for i in range(columns)]
+    for start in range(0, rows, 10000):
+        values = rng.random((min(10000, rows - start), columns))
+        documents = [dict(zip(names, map(float, row)), **{"class": "neg"}) for row in values]
+        collection.insert_many(documents)
+
+
+def run_mode(mode, rows, columns, batch_size, mongodb_url, results):
+    from sensor_fault_detection.configuration.mongo_db_connection import MongoDBClient
+    from sensor_fault_detection.data_access.sensor_fault_data import SensorData
+
+    client = get_mongo_client(mongodb_url)
+    seed_collection(client, rows, columns)
+    MongoDBClient.clients[MongoDBClient.get_client_key()] = client
+    sensor_data = SensorData()
+
+    import pandas as pd
+
+    baseline = current_rss()
+    sampler = PeakRSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    exported = 0
+    if mode == "legacy":
+        collection = client[DATABASE_NAME][COLLECTION_NAME]
+        exported = len(pd.DataFrame(list(collection.find())))
+    else:
+        for chunk in sensor_data.export_collection_as_chunks(
+            COLLECTION_NAME, database_name=DATABASE_NAME, batch_size=batch_size
+        ):
+            exported += len(chunk)
+    elapsed = time.perf_counter() - start
+    peak = sampler.stop()
+    results[mode] = (exported, elapsed, peak - baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=36000)
+    parser.add_argument("--columns", type=int, default=170)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--mongodb-url", default=None)
+    args = parser.parse_args()
+
+    manager = multiprocessing.Manager()
+    results = manager.dict()
+    for mode in ("legacy", "streaming"):
+        process = multiprocessing.Process(
+            target=run_mode,
+            args=(mode, args.rows, args.columns, args.batch_size, args.mongodb_url, results),
+        )
+        process.start()
+        process.join()
+
+    print(f"{'mode':<10} {'rows':>10} {'seconds':>10} {'rows/sec':>12} {'peak RSS MiB':>14}")
+    for mode, (exported, elapsed, peak_rss) in results.items():
+        print(
+            f"{mode:<10} {exported:>10} {elapsed:>10.2f} {exported / elapsed:>12.0f} "
+            f"{peak_rss / 2 ** 20:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
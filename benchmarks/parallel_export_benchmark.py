@@ -0,0 +1,56 @@
+"""
+Benchmark of the parallel partitioned mongodb export.
+
+Seeds an APS shaped collection (if it does not already hold ``--rows``
+documents) and exports it with ``SensorData.export_collection_in_partitions``
+for an increasing number of worker processes, reporting rows/sec and the
+speed-up over a single worker. Worker processes open their own connections,
+so this needs a real mongod, mongomock lives in a single process.
+
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.parallel_export_benchmark --workers 1 2 4 8
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from benchmarks.mongo_export_benchmark import COLLECTION_NAME, DATABASE_NAME, seed_collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--columns", type=int, default=170)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    from sensor_fault_detection.data_access.sensor_fault_data import SensorData
+
+    sensor_data = SensorData()
+    seed_collection(sensor_data.mongo_client.client, args.rows, args.columns)
+
+    print(f"{'workers':>8} {'seconds':>10} {'rows/sec':>12} {'speed-up':>10}")
+    baseline = None
+    for n_workers in args.workers:
+        output_dir = tempfile.mkdtemp()
+        start = time.perf_counter()
+        sensor_data.export_collection_in_partitions(
+            COLLECTION_NAME,
+            output_dir=output_dir,
+            n_workers=n_workers,
+            database_name=DATABASE_NAME,
+            batch_size=args.batch_size,
+            projection={"_id": 0},
+        )
+        elapsed = time.perf_counter() - start
+        shutil.rmtree(output_dir)
+        baseline = baseline or elapsed
+        print(
+            f"{n_workers:>8} {elapsed:>10.2f} {args.rows / elapsed:>12.0f} "
+            f"{baseline / elapsed:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
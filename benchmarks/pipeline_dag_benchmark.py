@@ -0,0 +1,101 @@
+"""
+Benchmark of the stage graph of the training pipeline.
+
+Writes APS shaped train and test files (the resampling benchmark data, with the schema columns)
+as the data ingestion artifact, then runs the stage graph of ``TrainPipeline`` from the
+schema validation to the model evaluation with every --workers thread count, in a run
+directory of its own under artifact/. The production model fetch waits --s3-latency seconds
+instead of reading s3, for a bucket without model, and the model pusher is left out. Reports
+the wall time, the stage work, the critical path and, per stage, when it was ready, started
+and ended, and checks that every run gives the same transformed features and model scores.
+Independent stages only overlap their cpu work on a machine with more than one cpu.
+
+    python -m benchmarks.pipeline_dag_benchmark --rows 20000 --workers 1 4 --s3-latency 5
+"""
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+
+from benchmarks.resampling_benchmark import make_fault_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--test-ratio", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--s3-latency", type=float, default=5.0)
+    args = parser.parse_args()
+
+    from sensor_fault_detection.constant.training_pipeline import ARTIFACT_DIR
+    from sensor_fault_detection.entity.artifact_entity import (
+        DataIngestionArtifact,
+        ProductionModelArtifact,
+    )
+    from sensor_fault_detection.pipeline.dag import Stage, StageGraph
+    from sensor_fault_detection.pipeline.training_pipeline import TrainPipeline
+    from sensor_fault_detection.utils.main_utils import get_schema_dtypes, write_dataframe
+
+    feature_columns = [column for column in get_schema_dtypes() if column != "class"]
+    data_dir = os.path.join(ARTIFACT_DIR, "pipeline_dag_benchmark_data")
+    file_paths = {}
+    n_test = int(args.rows * args.test_ratio)
+    for name, n_rows, seed in (("train", args.rows - n_test, 0), ("test", n_test, 1)):
+        dataframe, faulty = make_fault_dataset(n_rows, len(feature_columns), 20, seed)
+        dataframe.columns = feature_columns
+        dataframe["class"] = np.where(faulty == 1, "pos", "neg")
+        file_paths[name] = os.path.join(data_dir, f"{name}.parquet")
+        write_dataframe(dataframe, file_paths[name])
+    data_ingestion_artifact = DataIngestionArtifact(
+        trained_file_path=file_paths["train"], test_file_path=file_paths["test"]
+    )
+
+    def fetch_production_model():
+        time.sleep(args.s3_latency)
+        return ProductionModelArtifact(is_model_present=False)
+
+    results = []
+    for workers in args.workers:
+        run_name = f"pipeline_dag_benchmark_{workers}"
+        pipeline = TrainPipeline(run_name=run_name)
+        stages = []
+        for stage in pipeline.get_stage_graph().stages.values():
+            if stage.name == "data_ingestion":
+                stage = Stage(stage.name, lambda: data_ingestion_artifact)
+            elif stage.name == "production_model":
+                stage = Stage(stage.name, fetch_production_model)
+            elif stage.name == "model_pusher":
+                continue
+            stages.append(stage)
+        stage_graph = StageGraph(stages, max_workers=workers)
+        artifacts = stage_graph.run()
+        features = np.load(artifacts["data_transformation"].transformed_train_features_file_path)
+        results.append((workers, stage_graph.report, features, artifacts["model_trainer"]))
+        shutil.rmtree(os.path.join(ARTIFACT_DIR, run_name))
+    shutil.rmtree(data_dir)
+
+    print(f"cpus: {os.cpu_count()}, rows: {args.rows}, s3 latency: {args.s3_latency}s")
+    for workers, report, features, model_trainer_artifact in results:
+        print(
+            f"workers {workers}: {report['seconds']:.1f}s, "
+            f"stage work {report['stage_seconds']:.1f}s, "
+            f"critical path {report['critical_path_seconds']:.1f}s "
+            f"{' -> '.join(report['critical_path'])}"
+        )
+        print(f"{'stage':>20} {'ready':>7} {'start':>7} {'end':>7} {'slack':>7}")
+        for name, stage in report["stages"].items():
+            print(
+                f"{name:>20} {stage['ready']:>7.1f} {stage['start']:>7.1f} {stage['end']:>7.1f} "
+                f"{stage['slack']:>7.1f}"
+            )
+        print(
+            f"same features as workers {results[0][0]}: {np.array_equal(features, results[0][2])}, "
+            f"test f1 {model_trainer_artifact.metric_artifact.f1_score:.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
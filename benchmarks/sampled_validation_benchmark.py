@@ -0,0 +1,79 @@
+"""
+Benchmark of the full and the sample data validation modes.
+
+Writes APS shaped train and test parquet files (the drift benchmark data with the
+schema column names) of increasing sizes and runs ``DataValidation`` on them in
+"full" and in "sample" mode, reporting the seconds, the number of drifted columns
+and, for the sample mode, how many columns had to be escalated to a full scan.
+The full mode grows with the data, the sample mode stays bounded by the sample
+size and the number of escalated columns.
+
+    python -m benchmarks.sampled_validation_benchmark --rows 60000 240000 --sample-size 10000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.drift_benchmark import make_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[60000, 240000])
+    parser.add_argument("--test-ratio", type=float, default=0.2)
+    parser.add_argument("--drifted-share", type=float, default=0.3)
+    parser.add_argument("--sample-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    from sensor_fault_detection.components.data_validation import DataValidation
+    from sensor_fault_detection.entity.artifact_entity import DataIngestionArtifact
+    from sensor_fault_detection.entity.config_entity import DataValidationConfig
+    from sensor_fault_detection.utils.main_utils import (
+        get_schema_dtypes,
+        read_json_file,
+        write_dataframe,
+    )
+
+    feature_columns = list(get_schema_dtypes())
+
+    print(f"{'rows':>8} {'mode':>7} {'seconds':>10} {'drifted':>9} {'escalated':>10}")
+    for rows in args.rows:
+        data_dir = tempfile.mkdtemp()
+        n_test = int(rows * args.test_ratio)
+        artifact = DataIngestionArtifact(
+            trained_file_path=os.path.join(data_dir, "train.parquet"),
+            test_file_path=os.path.join(data_dir, "test.parquet"),
+        )
+        for file_path, n_rows, drifted_share, seed in (
+            (artifact.trained_file_path, rows - n_test, 0.0, 0),
+            (artifact.test_file_path, n_test, args.drifted_share, 1),
+        ):
+            dataframe = make_dataset(n_rows, len(feature_columns), drifted_share, seed)
+            dataframe.columns = feature_columns + ["class"]
+            write_dataframe(dataframe, file_path)
+
+        for mode in ("full", "sample"):
+            config = DataValidationConfig(
+                data_validation_dir=data_dir,
+                schema_report_file_path=os.path.join(data_dir, mode, "schema_report.json"),
+                drift_report_file_path=os.path.join(data_dir, mode, "report.json"),
+                reference_profile_file_path=os.path.join(data_dir, mode, "reference_profile.json"),
+                validation_mode=mode,
+                sample_size=args.sample_size,
+            )
+            start = time.perf_counter()
+            DataValidation(artifact, config).initiate_data_validation()
+            elapsed = time.perf_counter() - start
+            drift_report = read_json_file(config.drift_report_file_path)
+            n_escalated = sum(drift_report["columns"].get("escalated", []))
+            print(
+                f"{rows:>8} {mode:>7} {elapsed:>10.2f} "
+                f"{drift_report['summary']['number_of_drifted_columns']:>9} {n_escalated:>10}"
+            )
+        shutil.rmtree(data_dir)
+
+
+if __name__ == "__main__":
+    main()
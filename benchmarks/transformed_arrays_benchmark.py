@@ -0,0 +1,137 @@
+"""
+Benchmark of the memory used by the transformed array artifacts.
+
+Writes APS shaped train and test parquet files (the drift benchmark data with the
+schema column names), runs ``DataTransformation`` on them and then loads the
+transformed arrays and fits a model on them, in two layouts:
+
+    concatenated   one float32 array of features and target per set, loaded eagerly
+                   and sliced apart (the former layout)
+    separate       float32 features and int8 target files, memory mapped the way
+                   ``ModelTrainer`` loads them
+
+Every step runs in a fresh process and reports its peak RSS growth.
+
+    python -m benchmarks.transformed_arrays_benchmark --rows 30000
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.drift_benchmark import make_dataset
+from benchmarks.mongo_export_benchmark import PeakRSSSampler, current_rss
+
+
+def run_transformation(data_dir, results):
+    from sensor_fault_detection.components.data_transformation import DataTransformation
+    from sensor_fault_detection.entity.artifact_entity import (
+        DataIngestionArtifact,
+        DataValidationArtifact,
+    )
+    from sensor_fault_detection.entity.config_entity import DataTransformationConfig
+
+    ingestion_artifact = DataIngestionArtifact(
+        trained_file_path=os.path.join(data_dir, "train.parquet"),
+        test_file_path=os.path.join(data_dir, "test.parquet"),
+    )
+    validation_artifact = DataValidationArtifact(
+        validation_status=True,
+        message="",
+        schema_report_file_path="",
+        drift_report_file_path="",
+        reference_profile_file_path="",
+    )
+    config = DataTransformationConfig(
+        transformed_train_features_file_path=os.path.join(data_dir, "train_features.npy"),
+        transformed_train_target_file_path=os.path.join(data_dir, "train_target.npy"),
+        transformed_test_features_file_path=os.path.join(data_dir, "test_features.npy"),
+        transformed_test_target_file_path=os.path.join(data_dir, "test_target.npy"),
+        transformer_object_file_path=os.path.join(data_dir, "preprocessing.pkl"),
+        label_encoder_object_file_path=os.path.join(data_dir, "target_encoder.pkl"),
+        use_preprocessor_cache=False,
+    )
+
+    baseline = current_rss()
+    sampler = PeakRSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    DataTransformation(ingestion_artifact, validation_artifact, config).initiate_data_transformation()
+    elapsed = time.perf_counter() - start
+    results["transformation"] = (elapsed, sampler.stop() - baseline)
+
+
+def run_training(layout, data_dir, results):
+    from sklearn.linear_model import LogisticRegression
+
+    from sensor_fault_detection.utils.main_utils import load_numpy_array_data
+
+    baseline = current_rss()
+    sampler = PeakRSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    if layout == "concatenated":
+        train = load_numpy_array_data(os.path.join(data_dir, "train.npy"))
+        test = load_numpy_array_data(os.path.join(data_dir, "test.npy"))
+        x_train, y_train, x_test = train[:, :-1], train[:, -1], test[:, :-1]
+    else:
+        x_train, y_train, x_test = (
+            load_numpy_array_data(os.path.join(data_dir, file_name), mmap_mode="r")
+            for file_name in ("train_features.npy", "train_target.npy", "test_features.npy")
+        )
+    LogisticRegression(max_iter=50).fit(x_train, y_train).predict(x_test)
+    elapsed = time.perf_counter() - start
+    results[f"training ({layout})"] = (elapsed, sampler.stop() - baseline)
+
+
+def run_in_process(target, *args):
+    process = multiprocessing.Process(target=target, args=args)
+    process.start()
+    process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=30000)
+    parser.add_argument("--test-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    from sensor_fault_detection.utils.main_utils import (
+        get_schema_dtypes,
+        load_numpy_array_data,
+        save_numpy_array_data,
+        write_dataframe,
+    )
+
+    feature_columns = list(get_schema_dtypes())
+    data_dir = tempfile.mkdtemp()
+    n_test = int(args.rows * args.test_ratio)
+    for file_name, n_rows, seed in (("train", args.rows - n_test, 0), ("test", n_test, 1)):
+        dataframe = make_dataset(n_rows, len(feature_columns), 0.0, seed)
+        dataframe.columns = feature_columns + ["class"]
+        write_dataframe(dataframe, os.path.join(data_dir, f"{file_name}.parquet"))
+
+    results = multiprocessing.Manager().dict()
+    run_in_process(run_transformation, data_dir, results)
+    for file_name in ("train", "test"):
+        features = load_numpy_array_data(os.path.join(data_dir, f"{file_name}_features.npy"))
+        target = load_numpy_array_data(os.path.join(data_dir, f"{file_name}_target.npy"))
+        save_numpy_array_data(
+            os.path.join(data_dir, f"{file_name}.npy"),
+            array=np.c_[features, np.asarray(target, dtype=features.dtype)],
+        )
+    for layout in ("concatenated", "separate"):
+        run_in_process(run_training, layout, data_dir, results)
+    shutil.rmtree(data_dir)
+
+    print(f"{'step':<24} {'seconds':>10} {'peak RSS MiB':>14}")
+    for step, (elapsed, peak_rss) in results.items():
+        print(f"{step:<24} {elapsed:>10.2f} {peak_rss / 2 ** 20:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
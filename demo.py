@@ -1,5 +1,12 @@
+import sys
+
 from sensor_fault_detection.pipeline.training_pipeline import TrainPipeline
 
-train_pipeline = TrainPipeline()
+# the model search and the partitioned export start processes that import this module
+if __name__ == "__main__":
+    # python demo.py starts a new timestamped run under artifact/. A failed run is only resumed
+    # when its name is given, python demo.py <run> (the artifact/<run> directory): its stages
+    # that are up to date are reused. Without a name every stage runs again
+    train_pipeline = TrainPipeline(run_name=sys.argv[1] if len(sys.argv) > 1 else None)
 
-train_pipeline.run_pipeline()
\ No newline at end of file
+    train_pipeline.run_pipeline()
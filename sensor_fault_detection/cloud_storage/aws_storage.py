@@ -11,6 +11,7 @@ from pandas import DataFrame, read_csv
 from sensor_fault_detection.configuration.aws_connection import S3Client
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
+from sensor_fault_detection.utils.main_utils import get_schema_dtypes
 
 
 class SimpleStorageService:
@@ -233,7 +234,7 @@ class SimpleStorageService:
 
         try:
             content = self.read_object(object_, make_readable=True)
-            df = read_csv(content, na_values="na")
+            df = read_csv(content, na_values="na", dtype=get_schema_dtypes())
             logging.info("Exited the get_df_from_object method of S3Operations class")
             return df
         except Exception as e:
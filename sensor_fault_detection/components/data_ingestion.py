@@ -1,16 +1,33 @@
+import glob
 import os
+import shutil
 import sys
+from typing import Any, Dict, Iterator, List
 
+import numpy as np
+import pandas as pd
+from bson import ObjectId
 from pandas import DataFrame
-from sklearn.model_selection import train_test_split
 
-from sensor_fault_detection.constant.training_pipeline import SCHEMA_FILE_PATH
+from sensor_fault_detection.constant.training_pipeline import (
+    DATA_INGESTION_PENDING_PARTITION_PREFIX,
+    SCHEMA_FILE_PATH,
+)
 from sensor_fault_detection.data_access.sensor_fault_data import SensorData
 from sensor_fault_detection.entity.artifact_entity import DataIngestionArtifact
 from sensor_fault_detection.entity.config_entity import DataIngestionConfig
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
-from sensor_fault_detection.utils.main_utils import read_yaml_file
+from sensor_fault_detection.ml.sampling import hash_split_mask
+from sensor_fault_detection.utils.main_utils import (
+    DataFrameWriter,
+    get_file_hash,
+    iter_dataframe_chunks,
+    link_or_copy_file,
+    merge_dataframe_files,
+    read_yaml_file,
+    write_yaml_file,
+)
 
 
 class DataIngestion:
@@ -20,67 +37,448 @@ class DataIngestion:
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
         except Exception as e:
             raise SensorFaultException(e, sys)
-    
-    def export_data_into_feature_store(self) -> DataFrame:
+
+    def get_projection(self) -> dict:
+        """
+        Method Name :   get_projection
+        Description :   This method builds the mongodb projection from the schema so that
+                        _id and the drop_columns are never sent by the server
+
+        Output      :   projection dict
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            projection = {"_id": 0}
+            for column in self._schema_config["drop_columns"]:
+                projection[column] = 0
+            return projection
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_column_dtypes(self) -> dict:
+        """
+        Method Name :   get_column_dtypes
+        Description :   This method returns the declared schema dtype of every feature column,
+                        the target column keeps its labels as exported
+
+        Output      :   dict of column name to dtype
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            target_column = self._schema_config["target_column"]
+            return {
+                column.strip(): dtype
+                for column, dtype in self._schema_config["columns"].items()
+                if column.strip() != target_column
+            }
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def export_data_into_feature_store(self) -> None:
         """
         Method Name :   export_data_into_feature_store
-        Description :   This method exports the dataframe from mongodb feature store as dataframe
+        Description :   This method streams the mongodb collection into the feature store file
 
-        Output      :   DataFrame
+        Output      :   feature store file is written
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
             logging.info(f"Exporting data from mongodb")
-            sensor_fault_data = SensorData()
-            dataframe = sensor_fault_data.export_collection_as_dataframe(
-                collection_name=self.data_ingestion_config.collection_name
+            sensor_fault_data = SensorData(
+                compressors=self.data_ingestion_config.mongo_compressors
             )
-            logging.info(f"Shape of dataframe: {dataframe.shape}")
             feature_store_file_path = self.data_ingestion_config.feature_store_file_path
             dir_path = os.path.dirname(feature_store_file_path)
             os.makedirs(dir_path, exist_ok=True)
             logging.info(
                 f"Saving exported data into feature store file path: {feature_store_file_path}"
             )
-            dataframe.to_csv(feature_store_file_path, index=False, header=True)
-            return dataframe
+            if self.data_ingestion_config.export_workers > 1:
+                partition_file_paths = sensor_fault_data.export_collection_in_partitions(
+                    collection_name=self.data_ingestion_config.collection_name,
+                    output_dir=self.data_ingestion_config.feature_store_partition_dir,
+                    n_workers=self.data_ingestion_config.export_workers,
+                    batch_size=self.data_ingestion_config.export_batch_size,
+                    projection=self.get_projection(),
+                    dtypes=self.get_column_dtypes(),
+                    file_format=self.data_ingestion_config.file_format,
+                )
+                self.merge_feature_store_partitions(partition_file_paths)
+            else:
+                with DataFrameWriter(feature_store_file_path) as writer:
+                    for chunk in sensor_fault_data.export_collection_as_chunks(
+                        collection_name=self.data_ingestion_config.collection_name,
+                        batch_size=self.data_ingestion_config.export_batch_size,
+                        projection=self.get_projection(),
+                        dtypes=self.get_column_dtypes(),
+                    ):
+                        writer.write(chunk)
+                logging.info(f"Exported {writer.rows} rows")
 
         except Exception as e:
             raise SensorFaultException(e, sys)
-    
-    def split_data_as_train_test(self, dataframe: DataFrame) -> None:
+
+    def read_watermark(self) -> Any:
         """
-        Method Name :   split_data_as_train_test
-        Description :   This method splits the dataframe into train set and test set based on split ratio and stratified sampling
+        Method Name :   read_watermark
+        Description :   This method reads the watermark stored by the previous incremental run
 
-        Output      :   Folder is created in s3 bucket
+        Output      :   highest watermark field value already ingested, None on the first run
         On Failure  :   Write an exception log and then raise an exception
         """
-        logging.info("Entered split_data_as_train_test method of Data_Ingestion class")
+        try:
+            watermark_file_path = self.data_ingestion_config.watermark_file_path
+            if not os.path.exists(watermark_file_path):
+                return None
+            watermark = read_yaml_file(file_path=watermark_file_path)
+            if watermark["field"] != self.data_ingestion_config.watermark_field:
+                raise Exception(
+                    f"Stored watermark is on field [{watermark['field']}], "
+                    f"not on [{self.data_ingestion_config.watermark_field}]"
+                )
+            if watermark["type"] == "ObjectId":
+                return ObjectId(watermark["value"])
+            return watermark["value"]
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def write_watermark(self, value: Any, partition_file_name: str) -> None:
+        """
+        Method Name :   write_watermark
+        Description :   This method persists the highest watermark field value ingested so far
+                        and the name of the partition holding the documents up to it
 
+        Output      :   watermark file is written
+        On Failure  :   Write an exception log and then raise an exception
+        """
         try:
-            train_set, test_set = train_test_split(
-                dataframe, test_size=self.data_ingestion_config.train_test_split_ratio, stratify=dataframe[self._schema_config["target_column"]]
+            write_yaml_file(
+                file_path=self.data_ingestion_config.watermark_file_path,
+                content={
+                    "field": self.data_ingestion_config.watermark_field,
+                    "type": type(value).__name__,
+                    "value": str(value) if isinstance(value, ObjectId) else value,
+                    "partition": partition_file_name,
+                },
+                replace=True,
             )
-            logging.info("Performed train test split on the dataframe")
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def recover_pending_partitions(self) -> None:
+        """
+        Method Name :   recover_pending_partitions
+        Description :   This method finishes or rolls back the delta export interrupted by a
+                        crash: a pending partition is renamed into the feature store when the
+                        watermark was moved past it, removed otherwise so that its documents
+                        are exported again, never twice
+
+        Output      :   no pending partition is left in the persistent feature store
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            persistent_feature_store_dir = self.data_ingestion_config.persistent_feature_store_dir
+            watermark_file_path = self.data_ingestion_config.watermark_file_path
+            committed_partition = None
+            if os.path.exists(watermark_file_path):
+                committed_partition = read_yaml_file(file_path=watermark_file_path).get("partition")
+            pending_file_paths = glob.glob(
+                os.path.join(
+                    persistent_feature_store_dir, f"{DATA_INGESTION_PENDING_PARTITION_PREFIX}part-*"
+                )
+            )
+            for pending_file_path in pending_file_paths:
+                partition_file_name = os.path.basename(pending_file_path)[
+                    len(DATA_INGESTION_PENDING_PARTITION_PREFIX):
+                ]
+                if partition_file_name == committed_partition:
+                    os.replace(
+                        pending_file_path,
+                        os.path.join(persistent_feature_store_dir, partition_file_name),
+                    )
+                    logging.info(f"Committed the pending partition {partition_file_name}")
+                else:
+                    os.remove(pending_file_path)
+                    logging.info(f"Removed the uncommitted partition {partition_file_name}")
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_feature_store_file_paths(self) -> List[str]:
+        """
+        Method Name :   get_feature_store_file_paths
+        Description :   This method lists the files making up the feature store, the partitions
+                        of the persistent feature store in incremental mode
+
+        Output      :   feature store file paths in ingestion order
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if self.data_ingestion_config.ingestion_mode != "incremental":
+                return [self.data_ingestion_config.feature_store_file_path]
+            return sorted(
+                glob.glob(
+                    os.path.join(self.data_ingestion_config.persistent_feature_store_dir, "part-*")
+                )
+            )
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def export_delta_into_feature_store(self) -> None:
+        """
+        Method Name :   export_delta_into_feature_store
+        Description :   This method exports only the documents inserted since the previous run,
+                        appends them as a new partition of the persistent feature store
+                        and moves the watermark forward. The partition is written under a
+                        pending name and only renamed once the watermark is saved, a crash in
+                        between is recovered by recover_pending_partitions
+
+        Output      :   new feature store partition and watermark are written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            watermark_field = self.data_ingestion_config.watermark_field
+            collection_name = self.data_ingestion_config.collection_name
+            sensor_fault_data = SensorData(
+                compressors=self.data_ingestion_config.mongo_compressors
+            )
+            self.recover_pending_partitions()
+            lower_watermark = self.read_watermark()
+            lower_bound = {"$exists": True}
+            if lower_watermark is not None:
+                lower_bound["$gt"] = lower_watermark
+            # fix the upper bound first, documents inserted during the export go to the next run
+            upper_watermark = sensor_fault_data.get_max_value(
+                collection_name, watermark_field, query={watermark_field: lower_bound}
+            )
+            if upper_watermark is None:
+                logging.info(f"No new documents above watermark [{lower_watermark}]")
+                return
+
             logging.info(
-                "Exited split_data_as_train_test method of Data_Ingestion class"
+                f"Exporting documents with {watermark_field} in ({lower_watermark}, {upper_watermark}]"
+            )
+            projection = self.get_projection()
+            if watermark_field != "_id":
+                projection[watermark_field] = 0
+            partition_index = len(self.get_feature_store_file_paths())
+            partition_file_name = f"part-{partition_index:05d}.{self.data_ingestion_config.file_format}"
+            partition_file_path = os.path.join(
+                self.data_ingestion_config.persistent_feature_store_dir, partition_file_name
+            )
+            pending_file_path = os.path.join(
+                self.data_ingestion_config.persistent_feature_store_dir,
+                f"{DATA_INGESTION_PENDING_PARTITION_PREFIX}{partition_file_name}",
+            )
+            with DataFrameWriter(pending_file_path) as writer:
+                for chunk in sensor_fault_data.export_collection_as_chunks(
+                    collection_name=collection_name,
+                    batch_size=self.data_ingestion_config.export_batch_size,
+                    projection=projection,
+                    dtypes=self.get_column_dtypes(),
+                    query={watermark_field: {**lower_bound, "$lte": upper_watermark}},
+                ):
+                    writer.write(chunk)
+            # the watermark is the commit point, the partition only counts once it is renamed
+            self.write_watermark(upper_watermark, partition_file_name)
+            os.replace(pending_file_path, partition_file_path)
+            logging.info(f"Appended {writer.rows} rows to the feature store: {partition_file_path}")
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def merge_feature_store_partitions(self, partition_file_paths: List[str]) -> None:
+        """
+        Method Name :   merge_feature_store_partitions
+        Description :   This method merges the exported partition files, in order,
+                        into the single feature store file and removes the partitions
+
+        Output      :   feature store file is written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            feature_store_file_path = self.data_ingestion_config.feature_store_file_path
+            merge_dataframe_files(partition_file_paths, feature_store_file_path)
+            shutil.rmtree(self.data_ingestion_config.feature_store_partition_dir, ignore_errors=True)
+            logging.info(
+                f"Merged {len(partition_file_paths)} partitions into {feature_store_file_path}"
             )
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def iter_feature_store_chunks(self, file_paths: List[str]) -> Iterator[DataFrame]:
+        """
+        Method Name :   iter_feature_store_chunks
+        Description :   This method streams the feature store files, in order, as chunks
+                        of at most split_chunk_size rows
+
+        Output      :   DataFrame chunks
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            for file_path in file_paths:
+                yield from iter_dataframe_chunks(
+                    file_path, chunk_size=self.data_ingestion_config.split_chunk_size
+                )
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    @staticmethod
+    def get_row_hashes(dataframe: DataFrame) -> np.ndarray:
+        """
+        stable 64 bit hash of every row computed from its values only, so that a record
+        hashes the same whatever its position in the feature store and identical records
+        always land in the same set
+        """
+        return pd.util.hash_pandas_object(dataframe, index=False).to_numpy()
+
+    def split_data_as_train_test(self, feature_store_file_paths: List[str]) -> None:
+        """
+        Method Name :   split_data_as_train_test
+        Description :   This method splits the feature store into train set and test set based on
+                        split ratio. A row goes to the test set when its stable hash falls in
+                        the first split ratio of the hash space (hash_split_mask), decided row
+                        by row in a single pass written chunk by chunk, so the split never holds
+                        the dataset in memory, is identical between runs on the same data and
+                        keeps every row in its set when rows are appended
+
+        Output      :   train and test files are written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered split_data_as_train_test method of Data_Ingestion class")
+
+        try:
+            if len(feature_store_file_paths) == 0:
+                raise Exception("Feature store is empty")
             dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
             os.makedirs(dir_path, exist_ok=True)
 
             logging.info(f"Exporting train and test file path.")
-            train_set.to_csv(
-                self.data_ingestion_config.training_file_path, index=False, header=True
+            with DataFrameWriter(
+                self.data_ingestion_config.training_file_path
+            ) as train_writer, DataFrameWriter(
+                self.data_ingestion_config.testing_file_path
+            ) as test_writer:
+                for chunk in self.iter_feature_store_chunks(feature_store_file_paths):
+                    is_test = hash_split_mask(
+                        self.get_row_hashes(chunk),
+                        self.data_ingestion_config.train_test_split_ratio,
+                    )
+                    train_writer.write(chunk[~is_test])
+                    test_writer.write(chunk[is_test])
+            logging.info("Performed train test split on the dataframe")
+            logging.info(
+                "Exited split_data_as_train_test method of Data_Ingestion class"
+            )
+
+            logging.info(
+                f"Exported {train_writer.rows} train rows and {test_writer.rows} test rows."
+            )
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_source_fingerprint(self) -> Dict[str, Any]:
+        """
+        Method Name :   get_source_fingerprint
+        Description :   This method summarises everything the ingestion artifacts depend on:
+                        the collection fingerprint (document count, max _id and optionally
+                        the dbHash checksum), the schema and the ingestion settings
+
+        Output      :   fingerprint dict
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            sensor_fault_data = SensorData(
+                compressors=self.data_ingestion_config.mongo_compressors
+            )
+            fingerprint = sensor_fault_data.get_collection_fingerprint(
+                self.data_ingestion_config.collection_name,
+                checksum=self.data_ingestion_config.fingerprint_checksum,
             )
-            test_set.to_csv(
-                self.data_ingestion_config.testing_file_path, index=False, header=True
+            fingerprint.update(
+                collection_name=self.data_ingestion_config.collection_name,
+                schema=get_file_hash(SCHEMA_FILE_PATH),
+                ingestion_mode=self.data_ingestion_config.ingestion_mode,
+                file_format=self.data_ingestion_config.file_format,
+                train_test_split_ratio=self.data_ingestion_config.train_test_split_ratio,
+            )
+            return fingerprint
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_artifact_file_paths(self) -> Dict[str, str]:
+        """
+        Method Name :   get_artifact_file_paths
+        Description :   This method lists the files written by this run, the persistent
+                        feature store of incremental mode is shared and not included
+
+        Output      :   dict of config field name to file path
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            field_names = ["training_file_path", "testing_file_path"]
+            if self.data_ingestion_config.ingestion_mode != "incremental":
+                field_names.append("feature_store_file_path")
+            return {
+                field_name: getattr(self.data_ingestion_config, field_name)
+                for field_name in field_names
+            }
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def reuse_previous_artifacts(self, fingerprint: Dict[str, Any]) -> bool:
+        """
+        Method Name :   reuse_previous_artifacts
+        Description :   This method hardlinks the artifacts of the last successful run into this
+                        run's artifact directory when the source fingerprint has not changed
+
+        Output      :   True when the previous artifacts were reused
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            fingerprint_file_path = self.data_ingestion_config.fingerprint_file_path
+            if not os.path.exists(fingerprint_file_path):
+                return False
+            previous_run = read_yaml_file(file_path=fingerprint_file_path)
+            if previous_run["fingerprint"] != fingerprint:
+                logging.info("Source fingerprint changed since the last run, exporting")
+                return False
+            previous_file_paths = previous_run["artifacts"]
+            file_paths = self.get_artifact_file_paths()
+            if set(previous_file_paths) != set(file_paths) or not all(
+                os.path.exists(file_path) for file_path in previous_file_paths.values()
+            ):
+                logging.info("Artifacts of the last run are gone, exporting")
+                return False
+            for field_name, file_path in file_paths.items():
+                if os.path.abspath(previous_file_paths[field_name]) != os.path.abspath(file_path):
+                    link_or_copy_file(previous_file_paths[field_name], file_path)
+            logging.info(
+                f"Source unchanged, reused the artifacts of the last run: {previous_file_paths}"
             )
+            return True
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def write_fingerprint(self, fingerprint: Dict[str, Any]) -> None:
+        """
+        Method Name :   write_fingerprint
+        Description :   This method records the source fingerprint and the artifacts of this
+                        successful run for the next run to compare against
 
-            logging.info(f"Exported train and test file path.")
+        Output      :   fingerprint file is written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            write_yaml_file(
+                file_path=self.data_ingestion_config.fingerprint_file_path,
+                content={
+                    "fingerprint": fingerprint,
+                    "artifacts": self.get_artifact_file_paths(),
+                },
+                replace=True,
+            )
         except Exception as e:
             raise SensorFaultException(e, sys)
-    
+
     def initiate_data_ingestion(self) -> DataIngestionArtifact:
         """
         Method Name :   initiate_data_ingestion
@@ -92,16 +490,21 @@ class DataIngestion:
         logging.info("Entered initiate_data_ingestion method of Data_Ingestion class")
 
         try:
-            dataframe = self.export_data_into_feature_store()
-            _schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            # taken before the export, documents inserted meanwhile make the next run export again
+            fingerprint = self.get_source_fingerprint()
+            if not self.reuse_previous_artifacts(fingerprint):
+                if self.data_ingestion_config.ingestion_mode == "incremental":
+                    self.export_delta_into_feature_store()
+                else:
+                    self.export_data_into_feature_store()
 
-            dataframe = dataframe.drop(_schema_config["drop_columns"], axis=1)
+                logging.info("Got the data from mongodb")
 
-            logging.info("Got the data from mongodb")
+                self.split_data_as_train_test(self.get_feature_store_file_paths())
 
-            self.split_data_as_train_test(dataframe)
+                logging.info("Performed train test split on the dataset")
 
-            logging.info("Performed train test split on the dataset")
+                self.write_fingerprint(fingerprint)
 
             logging.info(
                 "Exited initiate_data_ingestion method of Data_Ingestion class"
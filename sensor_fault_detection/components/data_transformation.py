@@ -1,35 +1,70 @@
+import hashlib
+import json
+import os
+import shutil
 import sys
+from typing import Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
-from imblearn.combine import SMOTETomek
+import sklearn
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import RobustScaler, LabelEncoder
 
-from sensor_fault_detection.constant.training_pipeline import SCHEMA_FILE_PATH, TARGET_COLUMN
+from sensor_fault_detection.constant.training_pipeline import (
+    SCHEMA_FILE_PATH,
+    TARGET_COLUMN,
+)
 from sensor_fault_detection.entity.artifact_entity import (
     DataIngestionArtifact,
     DataTransformationArtifact,
     DataValidationArtifact,
+    SchemaValidationArtifact,
 )
 from sensor_fault_detection.entity.config_entity import DataTransformationConfig
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
+from sensor_fault_detection.ml.binning import BINNING_SAMPLE_SIZE, FeatureBinner
+from sensor_fault_detection.ml.feature_pruning import (
+    FeaturePruner,
+    get_input_columns,
+    get_output_columns,
+    prune_preprocessor,
+)
+from sensor_fault_detection.ml.resampling import Resampler
+from sensor_fault_detection.ml.streaming_preprocessing import (
+    fit_preprocessor_in_chunks,
+    transform_in_chunks,
+    write_array_in_chunks,
+)
 from sensor_fault_detection.utils.main_utils import (
+    get_dataframe_row_count,
+    get_file_hash,
+    get_schema_dtypes,
+    iter_dataframe_chunks,
+    link_or_copy_file,
+    load_object,
+    read_dataframe,
+    read_dataframe_rows,
     read_yaml_file,
     save_numpy_array_data,
     save_object,
+    write_json_file,
 )
 
 class DataTransformation:
     def __init__(
         self,
         data_ingestion_artifact: DataIngestionArtifact,
-        data_validation_artifact: DataValidationArtifact,
+        data_validation_artifact: Union[DataValidationArtifact, SchemaValidationArtifact],
         data_transformation_config: DataTransformationConfig,
     ):
+        """
+        :param data_validation_artifact: Output reference of data validation, only its schema
+            validation status is used, so the transformation does not wait for drift detection
+        """
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_artifact = data_validation_artifact
@@ -39,9 +74,9 @@ class DataTransformation:
             raise SensorFaultException(e, sys)
 
     @staticmethod
-    def read_data(file_path) -> pd.DataFrame:
+    def read_data(file_path, columns: Optional[List[str]] = None) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path, columns=columns, dtype=get_schema_dtypes())
         except Exception as e:
             raise SensorFaultException(e, sys)
 
@@ -63,7 +98,8 @@ class DataTransformation:
             )
 
             simple_imputer = SimpleImputer(strategy='constant', fill_value=0)
-            robust_scaler = RobustScaler()
+            # scales the imputer output in place, the imputer already made a copy of the input
+            robust_scaler = RobustScaler(copy=False)
 
             pipeline = Pipeline(
                 steps=[
@@ -81,106 +117,565 @@ class DataTransformation:
         except Exception as e:
             raise SensorFaultException(e, sys)
     
-    def initiate_data_transformation(self) -> DataTransformationArtifact:
+    def get_preprocessor_cache_key(
+        self, preprocessor: Pipeline, label_encoder: LabelEncoder
+    ) -> str:
         """
-        Method Name :   initiate_data_transformation
-        Description :   This method initiates the data transformation component for the pipeline
+        Method Name :   get_preprocessor_cache_key
+        Description :   This method hashes everything the fitted objects depend on: the content
+                        of the train file, the schema the data is cast with, the class and
+                        parameters of every transformer step and the library versions the
+                        objects are pickled with
 
-        Output      :   data transformer steps are performed and preprocessor object is created
+        Output      :   sha256 hex digest used as the cache entry name
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            if self.data_validation_artifact.validation_status:
-                logging.info("Starting data transformation")
+            transformers = {
+                name: [type(step).__name__, step.get_params(deep=False)]
+                for name, step in preprocessor.steps
+            }
+            transformers["target_encoder"] = [type(label_encoder).__name__, {}]
+            fingerprint = {
+                "train_file": get_file_hash(self.data_ingestion_artifact.trained_file_path),
+                "schema": get_file_hash(SCHEMA_FILE_PATH),
+                "target_column": TARGET_COLUMN,
+                "transformers": transformers,
+                "fit_mode": self.data_transformation_config.fit_mode,
+                "files": [os.path.basename(file_path) for file_path in self.get_cache_file_paths()],
+                "sklearn": sklearn.__version__,
+                "numpy": np.__version__,
+            }
+            if self.data_transformation_config.prune_features:
+                fingerprint["feature_pruning"] = [
+                    self.data_transformation_config.max_missing_ratio,
+                    self.data_transformation_config.min_variance,
+                    self.data_transformation_config.max_correlation,
+                    self.data_transformation_config.importance_top_k,
+                ]
+            if self.data_transformation_config.fit_mode == "chunked":
+                fingerprint["chunk_size"] = self.data_transformation_config.chunk_size
+                fingerprint["quantile_sketch_size"] = (
+                    self.data_transformation_config.quantile_sketch_size
+                )
+            content = json.dumps(fingerprint, sort_keys=True, default=repr)
+            return hashlib.sha256(content.encode()).hexdigest()
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-                preprocessor = self.get_data_transformer_object()
-                logging.info("Got the preprocessor object")
+    def get_cache_file_paths(self) -> Tuple[str, ...]:
+        """
+        files of this run a preprocessor cache entry holds: the fitted objects and, with the
+        feature pruning, its report, so that a cache hit writes the same report as a fit
+        """
+        config = self.data_transformation_config
+        file_paths = (config.transformer_object_file_path, config.label_encoder_object_file_path)
+        if config.prune_features:
+            file_paths += (config.feature_pruning_report_file_path,)
+        return file_paths
+
+    def get_cached_object_file_paths(self, cache_key: str) -> Tuple[str, ...]:
+        cache_dir = os.path.join(self.data_transformation_config.preprocessor_cache_dir, cache_key)
+        return tuple(
+            os.path.join(cache_dir, os.path.basename(file_path))
+            for file_path in self.get_cache_file_paths()
+        )
 
-                train_df = DataTransformation.read_data(
-                    file_path=self.data_ingestion_artifact.trained_file_path
-                )
-                test_df = DataTransformation.read_data(
-                    file_path=self.data_ingestion_artifact.test_file_path
-                )
+    def load_cached_preprocessor(
+        self, cache_key: str
+    ) -> Optional[Tuple[Pipeline, LabelEncoder]]:
+        """
+        Method Name :   load_cached_preprocessor
+        Description :   This method loads the fitted preprocessor and target encoder of the
+                        cache entry and links them, with the feature pruning report, into this
+                        run's paths
 
-                input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
-                target_feature_train_df = train_df[TARGET_COLUMN]
+        Output      :   fitted preprocessor and label encoder, None when the entry is missing
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            cached_file_paths = self.get_cached_object_file_paths(cache_key)
+            if not all(os.path.exists(file_path) for file_path in cached_file_paths):
+                return None
+            file_paths = self.get_cache_file_paths()
+            for cached_file_path, file_path in zip(cached_file_paths, file_paths):
+                link_or_copy_file(cached_file_path, file_path)
+            preprocessor, label_encoder = (load_object(file_path) for file_path in file_paths[:2])
+            logging.info(f"Reused the fitted preprocessor of cache entry [{cache_key}]")
+            return preprocessor, label_encoder
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-                logging.info("Got train features and test features of Training dataset")
+    @staticmethod
+    def save_files_to_cache(cache_dir: str, file_paths: Tuple[str, ...]) -> None:
+        """
+        Method Name :   save_files_to_cache
+        Description :   This method adds files of this run to the cache entry cache_dir. The
+                        entry is written in a temporary directory renamed into place, so a
+                        concurrent or interrupted run never sees half an entry
 
-                input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN], axis=1)
-                target_feature_test_df = test_df[TARGET_COLUMN]
+        Output      :   cache entry is written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            temporary_dir = f"{cache_dir}.{os.getpid()}.tmp"
+            for file_path in file_paths:
+                link_or_copy_file(
+                    file_path, os.path.join(temporary_dir, os.path.basename(file_path))
+                )
+            try:
+                os.rename(temporary_dir, cache_dir)
+                logging.info(f"Saved cache entry [{cache_dir}]")
+            except OSError:
+                # another run stored the same entry first
+                shutil.rmtree(temporary_dir, ignore_errors=True)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-                logging.info("Got train features and test features of Testing dataset")
+    def save_preprocessor_to_cache(self, cache_key: str) -> None:
+        """
+        Method Name :   save_preprocessor_to_cache
+        Description :   This method adds the saved preprocessor and target encoder of this run,
+                        with the feature pruning report, to the cache
 
-                logging.info("Applying preprocessing object on training dataframe and testing dataframe")
+        Output      :   cache entry is written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            cached_file_paths = self.get_cached_object_file_paths(cache_key)
+            DataTransformation.save_files_to_cache(
+                os.path.dirname(cached_file_paths[0]), self.get_cache_file_paths()
+            )
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
+    def read_features(self, file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        if columns is not None:
+            return DataTransformation.read_data(file_path=file_path, columns=columns)
+        return DataTransformation.read_data(file_path=file_path).drop(columns=[TARGET_COLUMN])
+
+    def transform_features(
+        self, preprocessor: Pipeline, fit: bool, columns: Optional[List[str]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Method Name :   transform_features
+        Description :   This method reads the train and test features (columns only, all of
+                        them when None) in memory, fits the preprocessor on the train features
+                        when fit is set and transforms both
+
+        Output      :   transformed train and test features
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            input_feature_train_df = self.read_features(
+                self.data_ingestion_artifact.trained_file_path, columns
+            )
+            if fit:
                 input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
 
                 logging.info("Used the preprocessor object to fit transform the train features")
+            else:
+                input_feature_train_arr = preprocessor.transform(input_feature_train_df)
+            del input_feature_train_df
 
-                input_feature_test_arr = preprocessor.transform(input_feature_test_df)
+            input_feature_test_df = self.read_features(
+                self.data_ingestion_artifact.test_file_path, columns
+            )
+            input_feature_test_arr = preprocessor.transform(input_feature_test_df)
 
+            logging.info("Used the preprocessor object to transform the test features")
 
-                logging.info("Converting target categorical column into nummerical column for train and test")
+            return input_feature_train_arr, input_feature_test_arr
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-                label_encoder = LabelEncoder()
-                label_encoder.fit(target_feature_train_df)
+    def iter_feature_chunks(
+        self, file_path: str, columns: Optional[List[str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        for chunk in iter_dataframe_chunks(
+            file_path,
+            self.data_transformation_config.chunk_size,
+            columns=columns,
+            dtype=get_schema_dtypes(),
+        ):
+            yield chunk if columns is not None else chunk.drop(columns=[TARGET_COLUMN])
+
+    def transform_features_in_chunks(
+        self, preprocessor: Pipeline, fit: bool, columns: Optional[List[str]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Method Name :   transform_features_in_chunks
+        Description :   This method streams the train features (columns only, all of them when
+                        None) to fit the preprocessor when fit is
+                        set, with quantile sketches in place of the exact scaler quantiles, and
+                        transforms the train and test files chunk by chunk into the transformed
+                        features files, so that no file is ever held in memory
+
+        Output      :   transformed train and test features, memory mapped read only
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_transformation_config
+            if fit:
+                fit_preprocessor_in_chunks(
+                    preprocessor,
+                    self.iter_feature_chunks(self.data_ingestion_artifact.trained_file_path, columns),
+                    sketch_size=config.quantile_sketch_size,
+                    n_jobs=config.n_jobs,
+                )
+            transformed = []
+            for file_path, features_file_path in (
+                (
+                    self.data_ingestion_artifact.trained_file_path,
+                    config.transformed_train_features_file_path,
+                ),
+                (
+                    self.data_ingestion_artifact.test_file_path,
+                    config.transformed_test_features_file_path,
+                ),
+            ):
+                transformed.append(
+                    transform_in_chunks(
+                        preprocessor,
+                        self.iter_feature_chunks(file_path, columns),
+                        features_file_path,
+                        n_rows=get_dataframe_row_count(file_path),
+                    )
+                )
+            logging.info("Transformed the train and test features chunk by chunk")
+            return transformed[0], transformed[1]
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-                target_feature_train_df = label_encoder.transform(target_feature_train_df)
-                target_feature_test_df = label_encoder.transform(target_feature_test_df)
+    def get_missing_ratios(self, file_path: str) -> pd.Series:
+        """
+        Method Name :   get_missing_ratios
+        Description :   This method streams the feature columns of a dataframe artifact and
+                        counts their missing values
 
-                logging.info("Used the preprocessor object to transform the test features")
+        Output      :   ratio of missing values of every feature column
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            missing_counts, n_rows = None, 0
+            for chunk in self.iter_feature_chunks(file_path):
+                chunk_missing_counts = chunk.isna().sum()
+                missing_counts = (
+                    chunk_missing_counts
+                    if missing_counts is None
+                    else missing_counts + chunk_missing_counts
+                )
+                n_rows += len(chunk)
+            return missing_counts / max(n_rows, 1)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-                logging.info("Applying SMOTETomek on Training dataset")
+    def get_feature_pruner(self) -> FeaturePruner:
+        config = self.data_transformation_config
+        return FeaturePruner(
+            max_missing_ratio=config.max_missing_ratio,
+            min_variance=config.min_variance,
+            max_correlation=config.max_correlation,
+            importance_top_k=config.importance_top_k,
+            batch_size=config.chunk_size,
+        )
 
-                smt = SMOTETomek(random_state=42, sampling_strategy='minority', n_jobs=-1)
+    def prune_features(
+        self,
+        pruner: FeaturePruner,
+        preprocessor: Pipeline,
+        input_feature_train_arr: np.ndarray,
+        input_feature_test_arr: np.ndarray,
+        target_feature_train_arr: np.ndarray,
+    ) -> Tuple[Pipeline, np.ndarray, np.ndarray]:
+        """
+        Method Name :   prune_features
+        Description :   This method selects the feature columns to train on with the pruner,
+                        whose missing ratio criterion was applied before the fit, writes its
+                        report and restricts the fitted preprocessor and the transformed
+                        features to the kept columns. Memory mapped features are rewritten in
+                        place chunk by chunk
+
+        Output      :   pruned preprocessor, train features and test features
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_transformation_config
+            positions = pruner.fit(
+                input_feature_train_arr,
+                target_feature_train_arr,
+                columns=get_output_columns(preprocessor),
+            )
+            write_json_file(config.feature_pruning_report_file_path, pruner.report)
+
+            pruned = []
+            for array, features_file_path in (
+                (input_feature_train_arr, config.transformed_train_features_file_path),
+                (input_feature_test_arr, config.transformed_test_features_file_path),
+            ):
+                if isinstance(array, np.memmap):
+                    array = write_array_in_chunks(
+                        (
+                            array[start: start + config.chunk_size, positions]
+                            for start in range(0, len(array), config.chunk_size)
+                        ),
+                        features_file_path,
+                        n_rows=len(array),
+                        n_columns=len(positions),
+                    )
+                else:
+                    array = array[:, positions]
+                pruned.append(array)
+            return prune_preprocessor(preprocessor, positions), pruned[0], pruned[1]
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-                (
-                    input_feature_train_final,
-                    target_feature_train_final,
-                ) = smt.fit_resample(input_feature_train_arr, target_feature_train_df)
+    def create_binned_features(
+        self,
+        columns: Optional[List[str]],
+        target_feature_train_arr: np.ndarray,
+        target_feature_test_arr: np.ndarray,
+    ) -> None:
+        """
+        Method Name :   create_binned_features
+        Description :   This method fits a FeatureBinner on a sample of the raw train features
+                        (columns only, all of them when None) and bins the train and test
+                        files chunk by chunk into uint8 .npy files saved with their encoded
+                        target. The binner and the files are cached by the content of the
+                        data files and the binning parameters, a cached entry is linked in
+                        place of the work
+
+        Output      :   binner object and binned features and target files are written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_transformation_config
+            file_paths = (
+                config.binner_object_file_path,
+                config.binned_train_features_file_path,
+                config.binned_train_target_file_path,
+                config.binned_test_features_file_path,
+                config.binned_test_target_file_path,
+            )
+            fingerprint = {
+                "train_file": get_file_hash(self.data_ingestion_artifact.trained_file_path),
+                "test_file": get_file_hash(self.data_ingestion_artifact.test_file_path),
+                "schema": get_file_hash(SCHEMA_FILE_PATH),
+                "columns": columns,
+                "binner": FeatureBinner().get_params(),
+                "sample_size": BINNING_SAMPLE_SIZE,
+                "sklearn": sklearn.__version__,
+                "numpy": np.__version__,
+            }
+            cache_key = hashlib.sha256(
+                json.dumps(fingerprint, sort_keys=True, default=repr).encode()
+            ).hexdigest()
+            cache_dir = os.path.join(config.preprocessor_cache_dir, f"binned_{cache_key}")
+            cached_file_paths = [
+                os.path.join(cache_dir, os.path.basename(file_path)) for file_path in file_paths
+            ]
+            if config.use_preprocessor_cache and all(
+                os.path.exists(file_path) for file_path in cached_file_paths
+            ):
+                for cached_file_path, file_path in zip(cached_file_paths, file_paths):
+                    link_or_copy_file(cached_file_path, file_path)
+                logging.info(f"Reused the binned features of cache entry [{cache_key}]")
+                return
+
+            train_file_path = self.data_ingestion_artifact.trained_file_path
+            n_rows = get_dataframe_row_count(train_file_path)
+            rng = np.random.default_rng(0)
+            sample = read_dataframe_rows(
+                train_file_path,
+                np.sort(rng.choice(n_rows, min(n_rows, BINNING_SAMPLE_SIZE), replace=False)),
+                dtype=get_schema_dtypes(),
+            ).drop(columns=[TARGET_COLUMN])
+            binner = FeatureBinner().fit(sample if columns is None else sample[columns])
+            del sample
+
+            for file_path, features_file_path in (
+                (train_file_path, config.binned_train_features_file_path),
+                (self.data_ingestion_artifact.test_file_path, config.binned_test_features_file_path),
+            ):
+                write_array_in_chunks(
+                    (binner.transform(chunk) for chunk in self.iter_feature_chunks(file_path)),
+                    features_file_path,
+                    n_rows=get_dataframe_row_count(file_path),
+                    n_columns=binner.n_features_in_,
+                    dtype=np.uint8,
+                )
+            save_numpy_array_data(
+                config.binned_train_target_file_path, np.asarray(target_feature_train_arr, np.int8)
+            )
+            save_numpy_array_data(
+                config.binned_test_target_file_path, np.asarray(target_feature_test_arr, np.int8)
+            )
+            save_object(config.binner_object_file_path, binner)
+            logging.info(f"Binned the train and test features into {binner.n_features_in_} uint8 columns")
+            if config.use_preprocessor_cache:
+                DataTransformation.save_files_to_cache(cache_dir, file_paths)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-                logging.info("Applied SMOTETomek on training dataset")
+    def initiate_data_transformation(self) -> DataTransformationArtifact:
+        """
+        Method Name :   initiate_data_transformation
+        Description :   This method initiates the data transformation component for the pipeline
 
-                logging.info("Applying SMOTETomek on testing dataset")
+        Output      :   data transformer steps are performed and preprocessor object is created
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if self.data_validation_artifact.validation_status:
+                logging.info("Starting data transformation")
 
-                input_feature_test_final, target_feature_test_final = smt.fit_resample(
-                    input_feature_test_arr, target_feature_test_df
-                )
+                preprocessor = self.get_data_transformer_object()
+                label_encoder = LabelEncoder()
+                logging.info("Got the preprocessor object")
 
-                logging.info("Applied SMOTETomek on testing dataset")
+                cache_key, cached_preprocessor = None, None
+                if self.data_transformation_config.use_preprocessor_cache:
+                    cache_key = self.get_preprocessor_cache_key(preprocessor, label_encoder)
+                    cached_preprocessor = self.load_cached_preprocessor(cache_key)
+
+                if cached_preprocessor is not None:
+                    preprocessor, label_encoder = cached_preprocessor
+                    logging.info("Using the cached preprocessor object")
+
+                config = self.data_transformation_config
+                pruner, columns = None, None
+                if cached_preprocessor is None and config.prune_features:
+                    # before the fit, the columns without any observed value would be
+                    # skipped by the imputer
+                    pruner = self.get_feature_pruner()
+                    columns = pruner.select_missing_ratio(
+                        self.get_missing_ratios(self.data_ingestion_artifact.trained_file_path)
+                    )
 
-                logging.info("Created train array and test array")
+                logging.info("Applying preprocessing object on training dataframe and testing dataframe")
 
-                train_arr = np.c_[
-                    input_feature_train_final, np.array(target_feature_train_final)
-                ]
+                if config.fit_mode == "chunked":
+                    input_feature_train_arr, input_feature_test_arr = self.transform_features_in_chunks(
+                        preprocessor, fit=cached_preprocessor is None, columns=columns
+                    )
+                else:
+                    input_feature_train_arr, input_feature_test_arr = self.transform_features(
+                        preprocessor, fit=cached_preprocessor is None, columns=columns
+                    )
 
-                test_arr = np.c_[
-                    input_feature_test_final, np.array(target_feature_test_final)
-                ]
+                logging.info("Converting target categorical column into nummerical column for train and test")
 
-                # save features preprocessing object
-                save_object(
-                    self.data_transformation_config.transformer_object_file_path,
-                    preprocessor,
-                )
-                # save target preprocessin object
-                save_object(
-                    self.data_transformation_config.label_encoder_object_file_path,
-                    label_encoder,
+                target_feature_train_df, target_feature_test_df = (
+                    DataTransformation.read_data(file_path=file_path, columns=[TARGET_COLUMN])[
+                        TARGET_COLUMN
+                    ]
+                    for file_path in (
+                        self.data_ingestion_artifact.trained_file_path,
+                        self.data_ingestion_artifact.test_file_path,
+                    )
                 )
-                # save processed train data
-                save_numpy_array_data(
-                    self.data_transformation_config.transformed_train_file_path,
-                    array=test_arr,
+                if cached_preprocessor is None:
+                    label_encoder.fit(target_feature_train_df)
+
+                target_feature_train_df = label_encoder.transform(target_feature_train_df)
+                target_feature_test_df = label_encoder.transform(target_feature_test_df)
+
+                if pruner is not None:
+                    # before resampling, so that SMOTE works on the kept columns only
+                    (
+                        preprocessor,
+                        input_feature_train_arr,
+                        input_feature_test_arr,
+                    ) = self.prune_features(
+                        pruner,
+                        preprocessor,
+                        input_feature_train_arr,
+                        input_feature_test_arr,
+                        target_feature_train_df,
+                    )
+                if config.emit_binned_features:
+                    # raw rows of the kept columns, before the resampling
+                    self.create_binned_features(
+                        get_input_columns(preprocessor),
+                        target_feature_train_df,
+                        target_feature_test_df,
+                    )
+
+                resampler = Resampler(
+                    strategy=config.resampling_strategy,
+                    k_neighbors=config.resampling_k_neighbors,
+                    batch_size=config.resampling_batch_size,
                 )
-                # save processed test data
-                save_numpy_array_data(
-                    self.data_transformation_config.transformed_test_file_path,
-                    array=test_arr,
+                # the training set is resampled by the model trainer, inside every cross
+                # validation fold, a synthetic row resampled here would be scored in the fold
+                # its neighbours were trained on
+                save_object(config.resampler_object_file_path, resampler)
+                input_feature_train_final, target_feature_train_final = (
+                    input_feature_train_arr,
+                    target_feature_train_df,
                 )
+                resampling_report = {"strategy": config.resampling_strategy}
+
+                if config.resample_test_set:
+                    logging.info(f"Applying {config.resampling_strategy} resampling on testing dataset")
+
+                    input_feature_test_final, target_feature_test_final = resampler.fit_resample(
+                        input_feature_test_arr, target_feature_test_df
+                    )
+                    del input_feature_test_arr
+                    resampling_report["test"] = resampler.report
+                else:
+                    input_feature_test_final, target_feature_test_final = (
+                        input_feature_test_arr,
+                        target_feature_test_df,
+                    )
+                write_json_file(config.resampling_report_file_path, resampling_report)
+
+                logging.info("Created train array and test array")
+
+                if cached_preprocessor is None:
+                    # save features preprocessing object
+                    save_object(
+                        self.data_transformation_config.transformer_object_file_path,
+                        preprocessor,
+                    )
+                    # save target preprocessin object
+                    save_object(
+                        self.data_transformation_config.label_encoder_object_file_path,
+                        label_encoder,
+                    )
+                    if cache_key is not None:
+                        self.save_preprocessor_to_cache(cache_key)
+                # features and target are saved separately, so that they are never
+                # concatenated into a copy of the data and read back sliced apart.
+                # Features transformed in chunks are already in place unless resampled (test set)
+                for file_path, array, dtype in (
+                    (
+                        self.data_transformation_config.transformed_train_features_file_path,
+                        input_feature_train_final,
+                        np.float32,
+                    ),
+                    (
+                        self.data_transformation_config.transformed_train_target_file_path,
+                        target_feature_train_final,
+                        np.int8,
+                    ),
+                    (
+                        self.data_transformation_config.transformed_test_features_file_path,
+                        input_feature_test_final,
+                        np.float32,
+                    ),
+                    (
+                        self.data_transformation_config.transformed_test_target_file_path,
+                        target_feature_test_final,
+                        np.int8,
+                    ),
+                ):
+                    if isinstance(array, np.memmap) and os.path.abspath(
+                        array.filename
+                    ) == os.path.abspath(file_path):
+                        continue
+                    save_numpy_array_data(file_path, array=np.asarray(array, dtype=dtype))
 
                 logging.info("Saved the preprocessor object")
 
@@ -191,8 +686,25 @@ class DataTransformation:
                 data_transformation_artifact = DataTransformationArtifact(
                     transformer_object_file_path=self.data_transformation_config.transformer_object_file_path,
                     label_encoder_object_file_path = self.data_transformation_config.label_encoder_object_file_path,
-                    transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
-                    transformed_test_file_path=self.data_transformation_config.transformed_test_file_path,
+                    transformed_train_features_file_path=self.data_transformation_config.transformed_train_features_file_path,
+                    transformed_train_target_file_path=self.data_transformation_config.transformed_train_target_file_path,
+                    transformed_test_features_file_path=self.data_transformation_config.transformed_test_features_file_path,
+                    transformed_test_target_file_path=self.data_transformation_config.transformed_test_target_file_path,
+                    resampling_strategy=self.data_transformation_config.resampling_strategy,
+                    resampler_object_file_path=self.data_transformation_config.resampler_object_file_path,
+                    resampling_report_file_path=self.data_transformation_config.resampling_report_file_path,
+                    feature_pruning_report_file_path=self.data_transformation_config.feature_pruning_report_file_path,
+                    **(
+                        dict(
+                            binner_object_file_path=config.binner_object_file_path,
+                            binned_train_features_file_path=config.binned_train_features_file_path,
+                            binned_train_target_file_path=config.binned_train_target_file_path,
+                            binned_test_features_file_path=config.binned_test_features_file_path,
+                            binned_test_target_file_path=config.binned_test_target_file_path,
+                        )
+                        if config.emit_binned_features
+                        else {}
+                    ),
                 )
                 return data_transformation_artifact
             else:
@@ -1,21 +1,43 @@
 import json
 import sys
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
-from evidently.report import Report
-from evidently.metric_preset import DataDriftPreset
 from pandas import DataFrame
 
 from sensor_fault_detection.constant.training_pipeline import SCHEMA_FILE_PATH
+from sensor_fault_detection.data_access.sensor_fault_data import SensorData
 from sensor_fault_detection.entity.artifact_entity import (
     DataIngestionArtifact,
     DataValidationArtifact,
+    SchemaValidationArtifact,
 )
 
 from sensor_fault_detection.entity.config_entity import DataValidationConfig
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
-from sensor_fault_detection.utils.main_utils import read_yaml_file, write_yaml_file
+from sensor_fault_detection.ml.drift import (
+    DataDriftDetector,
+    ReferenceProfile,
+    compact_drift_report,
+)
+from sensor_fault_detection.ml.sampling import (
+    add_drift_intervals,
+    hash_split_mask,
+    stratified_sample_indices,
+    wilson_interval,
+)
+from sensor_fault_detection.ml.schema_validation import SchemaValidator
+from sensor_fault_detection.utils.main_utils import (
+    apply_schema_dtypes,
+    get_dataframe_columns,
+    get_schema_dtypes,
+    read_dataframe,
+    read_dataframe_rows,
+    read_yaml_file,
+    write_dataframe,
+    write_json_file,
+)
 import os
 os.environ["NUMBA_LOG_LEVEL"] = "WARNING"
 
@@ -30,24 +52,163 @@ class DataValidation:
         except Exception as e:
             raise SensorFaultException(e, sys)
     
-    def validate_number_of_columns(self, dataframe: DataFrame) -> bool:
+    def validate_schema(self) -> dict:
         """
-        Method Name :   validate_number_of_columns
-        Description :   This method validates the number of columns
+        Method Name :   validate_schema
+        Description :   This method checks the train and test files against the schema
+                        (columns, dtypes, ranges, allowed values and missing ratios) chunk
+                        by chunk and saves the per column report
 
-        Output      :   Returns bool value based on validation results
+        Output      :   Returns the schema validation report of both files
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            schema_validator = SchemaValidator(self._schema_config)
+            schema_report = {
+                name: schema_validator.validate_file(
+                    file_path, chunk_size=self.data_validation_config.schema_chunk_size
+                )
+                for name, file_path in self.get_data_file_paths().items()
+            }
+            write_json_file(
+                file_path=self.data_validation_config.schema_report_file_path,
+                content=schema_report,
+            )
+            return schema_report
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_data_file_paths(self) -> Dict[str, str]:
+        return {
+            "train": self.data_ingestion_artifact.trained_file_path,
+            "test": self.data_ingestion_artifact.test_file_path,
+        }
+
+    def get_sample_file_paths(self) -> Dict[str, str]:
+        return {
+            "train": self.data_validation_config.train_sample_file_path,
+            "test": self.data_validation_config.test_sample_file_path,
+        }
+
+    def get_validation_samples(self) -> Tuple[Dict[str, DataFrame], Dict[str, bool]]:
+        """
+        Method Name :   get_validation_samples
+        Description :   This method draws the stratified train and test samples of the sample
+                        validation mode, from the train and test files (only the target column
+                        and the sampled rows are read) or server side from the mongodb
+                        collection, split into train and test by row hash like the ingestion
+
+        Output      :   Returns the train and test samples and whether each sample holds
+                        all the rows of its file
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_validation_config
+            target_column = self._schema_config["target_column"]
+            samples, complete = {}, {}
+            if config.sample_source == "mongodb":
+                projection = {"_id": 0}
+                for column in self._schema_config["drop_columns"]:
+                    projection[column] = 0
+                strata = SchemaValidator(self._schema_config).constraints[target_column].get(
+                    "allowed_values"
+                )
+                sample = SensorData(
+                    compressors=config.sample_mongo_compressors
+                ).sample_collection_as_dataframe(
+                    collection_name=config.sample_collection_name,
+                    sample_size=config.sample_size,
+                    stratify_field=target_column if strata else None,
+                    strata=strata,
+                    projection=projection,
+                    dtypes=get_schema_dtypes(),
+                )
+                # the rows the ingestion puts in the test set, by row hash
+                is_test = hash_split_mask(
+                    pd.util.hash_pandas_object(sample, index=False).to_numpy(),
+                    config.sample_test_ratio,
+                )
+                samples["train"] = sample[~is_test].reset_index(drop=True)
+                samples["test"] = sample[is_test].reset_index(drop=True)
+                complete = {"train": False, "test": False}
+            else:
+                for name, file_path in self.get_data_file_paths().items():
+                    labels = read_dataframe(file_path, columns=[target_column])[target_column]
+                    indices = stratified_sample_indices(
+                        labels.to_numpy(), config.sample_size, config.sample_seed
+                    )
+                    samples[name] = read_dataframe_rows(file_path, indices)
+                    complete[name] = len(indices) == len(labels)
+            logging.info(
+                f"Validation samples: {', '.join(f'{name} {len(sample)} rows' for name, sample in samples.items())}"
+            )
+            return samples, complete
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def validate_schema_sample(
+        self, samples: Dict[str, DataFrame], complete: Dict[str, bool]
+    ) -> dict:
+        """
+        Method Name :   validate_schema_sample
+        Description :   This method checks the train and test samples against the schema and
+                        adds the Wilson interval of every missing ratio. The columns whose
+                        interval contains their max_missing_ratio are checked again on the full
+                        file, the per column report is saved
+
+        Output      :   Returns the schema validation report of both samples
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            status = len(dataframe.columns) == len(self._schema_config["columns"])
-            return status
+            schema_validator = SchemaValidator(self._schema_config)
+            file_paths = self.get_data_file_paths()
+            schema_report = {}
+            for name, sample in samples.items():
+                report = schema_validator.validate(sample)
+                column_reports = report["columns"]
+                columns = list(column_reports)
+                lows, highs = wilson_interval(
+                    [column_reports[column]["n_missing"] for column in columns],
+                    report["n_rows"],
+                    self.data_validation_config.sample_confidence,
+                )
+                inconclusive_columns = []
+                for column, low, high in zip(columns, lows, highs):
+                    column_reports[column]["missing_ratio_interval"] = [float(low), float(high)]
+                    max_missing_ratio = schema_validator.constraints[column].get("max_missing_ratio")
+                    if max_missing_ratio is not None and low < max_missing_ratio < high:
+                        inconclusive_columns.append(column)
+
+                if inconclusive_columns and not complete[name]:
+                    logging.info(
+                        f"Missing ratio of {inconclusive_columns} inconclusive on the {name} sample, "
+                        f"checking the full file"
+                    )
+                    full_report = schema_validator.validate_file(
+                        file_paths[name],
+                        chunk_size=self.data_validation_config.schema_chunk_size,
+                        columns=inconclusive_columns,
+                    )
+                    for column in inconclusive_columns:
+                        column_reports[column] = {**full_report["columns"][column], "escalated": True}
+                    report = schema_validator.dataset_report(
+                        list(sample.columns), report["n_rows"], column_reports
+                    )
+                report["validation_mode"] = "full" if complete[name] else "sample"
+                schema_report[name] = report
+
+            write_json_file(
+                file_path=self.data_validation_config.schema_report_file_path,
+                content=schema_report,
+            )
+            return schema_report
         except Exception as e:
             raise SensorFaultException(e, sys)
 
     @staticmethod
-    def read_data(file_path) -> DataFrame:
+    def read_data(file_path, columns: Optional[List[str]] = None) -> DataFrame:
         try:
-            return pd.read_csv(file_path, low_memory=False)
+            return read_dataframe(file_path, columns=columns, dtype=get_schema_dtypes())
         except Exception as e:
             raise SensorFaultException(e, sys)
 
@@ -64,79 +225,278 @@ class DataValidation:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            data_drift_profile = Report([DataDriftPreset()])
-            data_drift_profile.run(reference_data=reference_df, current_data=current_df)
-
-            report = data_drift_profile.json()
-            json_report = json.loads(report)
-
-            write_yaml_file(
-                file_path=self.data_validation_config.drift_report_file_path,
-                content=json_report,
+            config = self.data_validation_config
+            if config.drift_engine == "evidently":
+                drift_result = self.run_evidently_drift_report(reference_df, current_df)
+            else:
+                drift_result = DataDriftDetector(
+                    drift_share=config.drift_share,
+                    n_jobs=config.drift_n_jobs,
+                ).run(reference_df, current_df)
+            write_json_file(
+                file_path=config.drift_report_file_path,
+                content=compact_drift_report(
+                    drift_result, engine=config.drift_engine, drift_share=config.drift_share
+                ),
             )
 
-            n_features = json_report["metrics"][0]["result"]["number_of_columns"]
-            n_drifted_features = json_report["metrics"][0]["result"]["number_of_drifted_columns"]
+            n_features = drift_result["number_of_columns"]
+            n_drifted_features = drift_result["number_of_drifted_columns"]
 
             logging.info(f"{n_drifted_features}/{n_features} drift detected.")
 
-            drift_status = json_report["metrics"][0]['result']['dataset_drift']
+            drift_status = drift_result["dataset_drift"]
             return drift_status
         except Exception as e:
             raise SensorFaultException(e, sys)
 
-    def initiate_data_validation(self) -> DataValidationArtifact:
+    def detect_dataset_drift_sample(
+        self,
+        reference_df: DataFrame,
+        current_df: DataFrame,
+        complete: Dict[str, bool],
+    ) -> bool:
         """
-        Method Name :   initiate_data_validation
-        Description :   This method initiates the data validation component for the pipeline
+        Method Name :   detect_dataset_drift_sample
+        Description :   This method runs the native drift tests on the train and test samples
+                        and adds the bootstrap interval of every drift score. The columns whose
+                        interval contains the drift threshold are tested again on the full
+                        train and test files, only these columns are read
 
         Output      :   Returns bool value based on validation results
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            validation_error_msg = ""
-            logging.info("Starting data validation")
-            train_df, test_df = (
-                DataValidation.read_data(
-                    file_path=self.data_ingestion_artifact.test_file_path
-                ),
-                DataValidation.read_data(
-                    file_path=self.data_ingestion_artifact.test_file_path
-                ),
+            config = self.data_validation_config
+            drift_detector = DataDriftDetector(drift_share=config.drift_share, n_jobs=config.drift_n_jobs)
+            drift_by_columns = add_drift_intervals(
+                reference_df,
+                current_df,
+                drift_detector.run(reference_df, current_df)["drift_by_columns"],
+                n_rounds=config.sample_bootstrap_rounds,
+                confidence=config.sample_confidence,
+                seed=config.sample_seed,
+                resample_reference=not complete["train"],
+                resample_current=not complete["test"],
+                n_jobs=config.drift_n_jobs,
             )
+            inconclusive_columns = [
+                column for column, drift in drift_by_columns.items() if drift["inconclusive"]
+            ]
+            if inconclusive_columns:
+                logging.info(
+                    f"Drift of {inconclusive_columns} inconclusive on the samples, "
+                    f"testing the full data"
+                )
+                full_drift_result = drift_detector.run(
+                    DataValidation.read_data(
+                        self.data_ingestion_artifact.trained_file_path, columns=inconclusive_columns
+                    ),
+                    DataValidation.read_data(
+                        self.data_ingestion_artifact.test_file_path, columns=inconclusive_columns
+                    ),
+                )
+                for column in inconclusive_columns:
+                    drift_by_columns[column] = {
+                        **full_drift_result["drift_by_columns"][column],
+                        "escalated": True,
+                    }
 
-            status = self.validate_number_of_columns(dataframe=train_df)
+            drift_result = drift_detector.summarize(drift_by_columns)
+            drift_result["validation_mode"] = "full" if all(complete.values()) else "sample"
+            write_json_file(
+                file_path=config.drift_report_file_path,
+                content=compact_drift_report(
+                    drift_result, engine="native", drift_share=config.drift_share
+                ),
+            )
             logging.info(
-                f"Total number of required columns present in training dataframe: {status}"
+                f"{drift_result['number_of_drifted_columns']}/{drift_result['number_of_columns']} "
+                f"drift detected."
+            )
+            return drift_result["dataset_drift"]
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def run_evidently_drift_report(
+        self,
+        reference_df: DataFrame,
+        current_df: DataFrame,
+    ) -> dict:
+        """
+        Method Name :   run_evidently_drift_report
+        Description :   This method runs the detailed evidently DataDriftPreset report
+
+        Output      :   Returns the dataset drift result of the report with the per column
+                        results (drift_by_columns) of its drift table
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            # evidently is heavy to import, only load it when it is selected
+            from evidently.metric_preset import DataDriftPreset
+            from evidently.report import Report
+
+            data_drift_profile = Report(
+                [DataDriftPreset(drift_share=self.data_validation_config.drift_share)]
             )
+            data_drift_profile.run(reference_data=reference_df, current_data=current_df)
+
+            report = data_drift_profile.json()
+            json_report = json.loads(report)
 
-            if not status:
-                validation_error_msg += f"Columns are missing in training dataframe."
+            drift_result = dict(json_report["metrics"][0]["result"])
+            for metric in json_report["metrics"][1:]:
+                if "drift_by_columns" in metric["result"]:
+                    drift_result["drift_by_columns"] = metric["result"]["drift_by_columns"]
+            return drift_result
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-            status = self.validate_number_of_columns(dataframe=test_df)
+    def save_reference_profile(self, reference_df: Optional[DataFrame] = None) -> None:
+        """
+        Method Name :   save_reference_profile
+        Description :   This method saves the compact profile of the training data that
+                        later drift checks compare new data against: of reference_df, the
+                        whole train file already in memory, or, when None (sample mode, where
+                        only samples were read), of the train file read a few columns at a
+                        time, never of a validation sample
 
+        Output      :   reference profile file is written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_validation_config
+            if reference_df is not None:
+                profile = ReferenceProfile.from_dataframe(
+                    reference_df, n_bins=config.reference_profile_n_bins
+                )
+            else:
+                file_path = self.data_ingestion_artifact.trained_file_path
+                columns = get_dataframe_columns(file_path)
+                step = config.reference_profile_columns_per_read
+                profile = ReferenceProfile.from_column_groups(
+                    (
+                        DataValidation.read_data(file_path, columns=columns[start: start + step])
+                        for start in range(0, len(columns), step)
+                    ),
+                    n_bins=config.reference_profile_n_bins,
+                )
+            profile.save(config.reference_profile_file_path)
             logging.info(
-                f"Total number of required columns present in testing dataframe: {status}"
+                f"Saved reference profile: {self.data_validation_config.reference_profile_file_path}"
             )
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def initiate_schema_validation(self) -> SchemaValidationArtifact:
+        """
+        Method Name :   initiate_schema_validation
+        Description :   This method checks the train and test data against the schema, on the
+                        whole files or on samples of them in sample mode
+
+        Output      :   Returns the schema validation status and its errors
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            validation_error_msg = ""
+            logging.info("Starting data validation")
+            sample_file_paths, complete = None, None
+            if self.data_validation_config.validation_mode == "sample":
+                samples, complete = self.get_validation_samples()
+                schema_report = self.validate_schema_sample(samples, complete)
+                # saved for the drift detection, which checks the same samples
+                sample_file_paths = self.get_sample_file_paths()
+                for name, sample in samples.items():
+                    write_dataframe(sample, sample_file_paths[name])
+            else:
+                schema_report = self.validate_schema()
+            for name, report in schema_report.items():
+                logging.info(
+                    f"Schema validation of {name} dataframe: {report['validation_status']}"
+                )
+                if not report["validation_status"]:
+                    validation_error_msg += f"{name} dataframe: {'; '.join(report['errors'])}. "
 
-            if not status:
-                validation_error_msg += f"Columns are missing in test dataframe."
+            schema_validation_artifact = SchemaValidationArtifact(
+                validation_status=len(validation_error_msg) == 0,
+                message=validation_error_msg,
+                schema_report_file_path=self.data_validation_config.schema_report_file_path,
+                sample_file_paths=sample_file_paths,
+                complete_samples=complete,
+            )
+            logging.info(f"Schema validation artifact: {schema_validation_artifact}")
+            return schema_validation_artifact
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
+    def initiate_drift_detection(
+        self, schema_validation_artifact: SchemaValidationArtifact
+    ) -> DataValidationArtifact:
+        """
+        Method Name :   initiate_drift_detection
+        Description :   This method detects the drift between the train and test data and saves
+                        the reference profile of the train data, when they passed the schema
+                        validation. The data transformation does not depend on it
 
-            validation_status = len(validation_error_msg) == 0
-            if validation_status:
-                drift_status = self.detect_dataset_drift(train_df, test_df)
+        Output      :   Returns the data validation artifact
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if schema_validation_artifact.validation_status:
+                if self.data_validation_config.validation_mode == "sample":
+                    sample_file_paths = schema_validation_artifact.sample_file_paths
+                    if sample_file_paths:
+                        samples = {
+                            name: read_dataframe(file_path)
+                            for name, file_path in sample_file_paths.items()
+                        }
+                        complete = schema_validation_artifact.complete_samples
+                    else:
+                        samples, complete = self.get_validation_samples()
+                    schema_dtypes = get_schema_dtypes()
+                    train_df = apply_schema_dtypes(samples["train"], schema_dtypes)
+                    test_df = apply_schema_dtypes(samples["test"], schema_dtypes)
+                    drift_status = self.detect_dataset_drift_sample(train_df, test_df, complete)
+                else:
+                    train_df, test_df = (
+                        DataValidation.read_data(
+                            file_path=self.data_ingestion_artifact.trained_file_path
+                        ),
+                        DataValidation.read_data(
+                            file_path=self.data_ingestion_artifact.test_file_path
+                        ),
+                    )
+                    drift_status = self.detect_dataset_drift(train_df, test_df)
                 if drift_status:
                     logging.info(f"Data Drift detected.")
+                self.save_reference_profile(
+                    None if self.data_validation_config.validation_mode == "sample" else train_df
+                )
             else:
-                logging.info(f"Validation_error: {validation_error_msg}")
+                logging.info(f"Validation_error: {schema_validation_artifact.message}")
 
             data_validation_artifact = DataValidationArtifact(
-                validation_status=validation_status,
-                message=validation_error_msg,
+                validation_status=schema_validation_artifact.validation_status,
+                message=schema_validation_artifact.message,
+                schema_report_file_path=schema_validation_artifact.schema_report_file_path,
                 drift_report_file_path=self.data_validation_config.drift_report_file_path,
+                reference_profile_file_path=self.data_validation_config.reference_profile_file_path,
             )
             logging.info(f"Data validation artifact: {data_validation_artifact}")
             return data_validation_artifact
         except Exception as e:
-            raise SensorFaultException(e, sys)
\ No newline at end of file
+            raise SensorFaultException(e, sys)
+
+    def initiate_data_validation(self) -> DataValidationArtifact:
+        """
+        Method Name :   initiate_data_validation
+        Description :   This method initiates the data validation component for the pipeline:
+                        the schema validation, then the drift detection
+
+        Output      :   Returns bool value based on validation results
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return self.initiate_drift_detection(self.initiate_schema_validation())
+        except Exception as e:
+            raise SensorFaultException(e, sys)
@@ -2,19 +2,26 @@ import sys
 from dataclasses import dataclass
 from typing import Optional
 
-import pandas as pd
 from sklearn.metrics import f1_score
+from sklearn.preprocessing import LabelEncoder
 
 from sensor_fault_detection.constant.training_pipeline import TARGET_COLUMN
 from sensor_fault_detection.entity.artifact_entity import (
     DataIngestionArtifact,
     ModelTrainerArtifact,
-    ModelEvaluationArtifact)
+    ModelEvaluationArtifact,
+    ProductionModelArtifact)
 
 from sensor_fault_detection.entity.config_entity import ModelEvaluationConfig
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
 from sensor_fault_detection.ml.s3_estimator import SensorFaultEstimator
+from sensor_fault_detection.utils.main_utils import (
+    get_schema_dtypes,
+    load_object,
+    read_dataframe,
+    save_object,
+)
 
 
 @dataclass
@@ -31,16 +38,20 @@ class ModelEvaluation:
         model_eval_config: ModelEvaluationConfig,
         data_ingestion_artifact: DataIngestionArtifact,
         model_trainer_artifact: ModelTrainerArtifact,
+        production_model_artifact: Optional[ProductionModelArtifact] = None,
     ):
         """
         :param model_evaluation_config: Output reference of data evaluation artifact stage
         :param data_ingestion_artifact: Output reference of data ingestion artifact stage
         :param model_trainer_artifact: Output reference of model_trainer_artifact stage
+        :param production_model_artifact: Production model fetched beforehand by
+            fetch_production_model, it is read from s3 when None
         """
         try:
             self.model_eval_config = model_eval_config
             self.data_ingestion_artifact = data_ingestion_artifact
             self.model_trainer_artifact = model_trainer_artifact
+            self.production_model_artifact = production_model_artifact
         except Exception as e:
             raise SensorFaultException(e, sys)
     
@@ -63,7 +74,40 @@ class ModelEvaluation:
                 return heart_stroke_estimator
             return None
         except Exception as e:
-            raise HeartStrokeException(e, sys)
+            raise SensorFaultException(e, sys)
+
+    @staticmethod
+    def fetch_production_model(model_eval_config: ModelEvaluationConfig) -> ProductionModelArtifact:
+        """
+        Method Name :   fetch_production_model
+        Description :   This function checks for the model in production and downloads it to a
+                        local file, it depends on no other stage and runs while the new model
+                        trains
+
+        Output      :   Returns production model artifact
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            heart_stroke_estimator = SensorFaultEstimator(
+                bucket_name=model_eval_config.bucket_name,
+                model_path=model_eval_config.s3_model_key_path,
+            )
+            if not heart_stroke_estimator.is_model_present(
+                model_path=model_eval_config.s3_model_key_path
+            ):
+                logging.info("No model in production")
+                return ProductionModelArtifact(is_model_present=False)
+            save_object(
+                model_eval_config.production_model_file_path, heart_stroke_estimator.load_model()
+            )
+            production_model_artifact = ProductionModelArtifact(
+                is_model_present=True,
+                production_model_file_path=model_eval_config.production_model_file_path,
+            )
+            logging.info(f"Production model artifact: {production_model_artifact}")
+            return production_model_artifact
+        except Exception as e:
+            raise SensorFaultException(e, sys)
     
     def evaluate_model(self) -> EvaluateModelResponse:
         """
@@ -75,14 +119,24 @@ class ModelEvaluation:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
-            x, y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
+            test_df = read_dataframe(
+                self.data_ingestion_artifact.test_file_path, dtype=get_schema_dtypes()
+            )
+            # encoded like the training target, the models predict the encoded classes
+            x, y = test_df.drop(TARGET_COLUMN, axis=1), LabelEncoder().fit_transform(
+                test_df[TARGET_COLUMN]
+            )
             trained_model_f1_score = (
                 self.model_trainer_artifact.metric_artifact.f1_score
             )
 
             best_model_f1_score = None
-            best_model = self.get_best_model()
+            if self.production_model_artifact is None:
+                best_model = self.get_best_model()
+            elif self.production_model_artifact.is_model_present:
+                best_model = load_object(self.production_model_artifact.production_model_file_path)
+            else:
+                best_model = None
             if best_model is not None:
                 y_hat_best_model = best_model.predict(x)
                 best_model_f1_score = f1_score(y, y_hat_best_model)
@@ -1,11 +1,14 @@
+import os
 import sys
+from typing import Optional
 
 from sensor_fault_detection.entity.artifact_entity import (
+    DataValidationArtifact,
     ModelTrainerArtifact,
     ModelPusherArtifact,
 )
 from sensor_fault_detection.entity.config_entity import ModelPusherConfig
-from sensor_fault_detection.ml.s3_estimator import SensorFaultModel
+from sensor_fault_detection.ml.s3_estimator import SensorFaultEstimator
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
 
@@ -15,11 +18,13 @@ class ModelPusher:
         self,
         model_trainer_artifact: ModelTrainerArtifact,
         model_pusher_config: ModelPusherConfig,
+        data_validation_artifact: Optional[DataValidationArtifact] = None,
     ):
 
         self.model_trainer_artifact = model_trainer_artifact
         self.model_pusher_config = model_pusher_config
-        self.stroke_estimator = SensorFaultModel(
+        self.data_validation_artifact = data_validation_artifact
+        self.stroke_estimator = SensorFaultEstimator(
             bucket_name=model_pusher_config.bucket_name,
             model_path=model_pusher_config.s3_model_key_path,
         )
@@ -38,6 +43,7 @@ class ModelPusher:
             self.stroke_estimator.save_model(
                 from_file=self.model_trainer_artifact.trained_model_file_path
             )
+            self.push_reference_profile()
             model_pusher_artifact = ModelPusherArtifact(
                 bucket_name=self.model_pusher_config.bucket_name,
                 s3_model_path=self.model_pusher_config.s3_model_key_path,
@@ -49,3 +55,28 @@ class ModelPusher:
 
         except Exception as e:
             raise SensorFaultException(e, sys) from e
+
+    def push_reference_profile(self) -> None:
+        """
+        Method Name :   push_reference_profile
+        Description :   This function uploads the reference profile of the training data
+                        next to the model, for drift checks of the data the model serves
+
+        Output      :   Reference profile is uploaded to the s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if self.data_validation_artifact is None:
+                return
+            reference_profile_file_path = self.data_validation_artifact.reference_profile_file_path
+            if not os.path.exists(reference_profile_file_path):
+                logging.info(f"No reference profile at {reference_profile_file_path}, not uploaded")
+                return
+            self.stroke_estimator.s3.upload_file(
+                reference_profile_file_path,
+                to_filename=self.model_pusher_config.s3_reference_profile_key_path,
+                bucket_name=self.model_pusher_config.bucket_name,
+                remove=False,
+            )
+        except Exception as e:
+            raise SensorFaultException(e, sys) from e
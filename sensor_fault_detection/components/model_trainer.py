@@ -1,9 +1,8 @@
 import sys
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
-import numpy as np
-from neuro_mf import ModelFactory
-from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from neuro_mf import GridSearchedBestModel, ModelFactory
+from sklearn.metrics import f1_score, precision_score, recall_score
 
 from sensor_fault_detection.entity.artifact_entity import (
     ClassificationMetricArtifact,
@@ -12,13 +11,18 @@ from sensor_fault_detection.entity.artifact_entity import (
 )
 
 from sensor_fault_detection.ml.estimator import SensorFaultModel
+from sensor_fault_detection.ml.model_search import ModelSearch, resolve_n_jobs
+from sensor_fault_detection.ml.resampling import Resampler
+from sensor_fault_detection.ml.schema_validation import SchemaValidator
 from sensor_fault_detection.entity.config_entity import ModelTrainerConfig
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
 from sensor_fault_detection.utils.main_utils import (
     load_numpy_array_data,
     load_object,
-    save_object
+    read_yaml_file,
+    save_object,
+    write_json_file,
 )
 
 class ModelTrainer:
@@ -34,47 +38,268 @@ class ModelTrainer:
         self.data_transformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
 
-    def get_model_object_and_report(
-        self, train: np.array, test: np.array
-    ) -> Tuple[object, object]:
+    def get_search_config(self) -> dict:
         """
-        Method Name :   get_model_object_and_report
-        Description :   This function uses neuro_mf to get the best model object and report of the best model
+        Method Name :   get_search_config
+        Description :   This function reads the search section of the model config file, the
+                        candidates are searched exhaustively when there is none
 
-        Output      :   Returns metric artifact object and best model object
+        Output      :   search strategy and its settings
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            logging.info("Using neuro_mf to get best model object and report")
-            model_factory = ModelFactory(
-                model_config_path=self.model_trainer_config.model_config_file_path
+            model_config = read_yaml_file(self.model_trainer_config.model_config_file_path)
+            return dict(model_config.get("search") or {"strategy": "grid"})
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_model_inputs(self) -> Dict[str, str]:
+        """
+        Method Name :   get_model_inputs
+        Description :   This function reads the input of every candidate model of the model
+                        config file: the float features, or the binned features for histogram
+                        based models
+
+        Output      :   input ("features" or "binned") per model serial number
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            model_config = read_yaml_file(self.model_trainer_config.model_config_file_path)
+            return {
+                model_serial_number: module.get("input", "features")
+                for model_serial_number, module in model_config["model_selection"].items()
+            }
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_input_file_paths(self, model_input: str) -> Tuple[str, str, str, str]:
+        """
+        Method Name :   get_input_file_paths
+        Description :   This function returns the .npy files of a model input
+
+        Output      :   train features, train target, test features and test target file paths
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            artifact = self.data_transformation_artifact
+            if model_input == "binned":
+                return (
+                    artifact.binned_train_features_file_path,
+                    artifact.binned_train_target_file_path,
+                    artifact.binned_test_features_file_path,
+                    artifact.binned_test_target_file_path,
+                )
+            return (
+                artifact.transformed_train_features_file_path,
+                artifact.transformed_train_target_file_path,
+                artifact.transformed_test_features_file_path,
+                artifact.transformed_test_target_file_path,
             )
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_resampler(self, model_input: str) -> Optional[Resampler]:
+        """
+        Method Name :   get_resampler
+        Description :   This function loads the resampler of the training set of a model input,
+                        the binned features and the class_weight strategy are not resampled
+
+        Output      :   Returns the resampler, None when the training set is used as is
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if (
+                model_input == "binned"
+                or self.data_transformation_artifact.resampling_strategy == "class_weight"
+            ):
+                return None
+            return load_object(self.data_transformation_artifact.resampler_object_file_path)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def refit_and_score(
+        self, grid_searched_best_model: GridSearchedBestModel, model_input: str
+    ) -> Tuple[ClassificationMetricArtifact, dict]:
+        """
+        Method Name :   refit_and_score
+        Description :   This function refits the best model of a searched candidate on the whole
+                        training set of its input, resampled like the training folds of the
+                        search, and scores it on the test set of that input
+
+        Output      :   Returns the metric artifact of the model on the test set and the
+                        resampling report of the training set
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            model_obj = grid_searched_best_model.best_model
 
+            # memory mapped read only, the models only page in the data they touch
             x_train, y_train, x_test, y_test = (
-                train[:, :-1],
-                train[:, -1],
-                test[:, :-1],
-                test[:, -1],
+                load_numpy_array_data(file_path=file_path, mmap_mode="r")
+                for file_path in self.get_input_file_paths(model_input)
             )
+            resampler = self.get_resampler(model_input)
+            resampling_report = {}
+            if resampler is not None:
+                x_train, y_train = resampler.fit_resample(x_train, y_train)
+                resampling_report = resampler.report
 
-            best_model_detail = model_factory.get_best_model(
-                X=x_train,
-                y=y_train,
-                base_accuracy=self.model_trainer_config.expected_accuracy,
-            )
-            model_obj = best_model_detail.best_model
+            # refit like GridSearchCV(refit=True), on every search process, the saved model
+            # keeps its own n_jobs
+            if "n_jobs" in model_obj.get_params():
+                n_jobs = model_obj.n_jobs
+                model_obj.set_params(n_jobs=resolve_n_jobs(self.model_trainer_config.search_n_jobs))
+                model_obj.fit(x_train, y_train)
+                model_obj.set_params(n_jobs=n_jobs)
+            else:
+                model_obj.fit(x_train, y_train)
+            logging.info(f"Refitted {model_obj} on the {model_input} training set")
 
             y_pred = model_obj.predict(x_test)
 
-            accuracy = accuracy_score(y_test, y_pred)
             f1 = f1_score(y_test, y_pred)
             precision = precision_score(y_test, y_pred)
             recall = recall_score(y_test, y_pred)
             metric_artifact = ClassificationMetricArtifact(
                 f1_score=f1, precision_score=precision, recall_score=recall
             )
+            return metric_artifact, resampling_report
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def select_best_model(
+        self,
+        grid_searched_best_model_list: List[GridSearchedBestModel],
+        model_inputs: Dict[str, str],
+    ) -> Tuple[GridSearchedBestModel, List[dict]]:
+        """
+        Method Name :   select_best_model
+        Description :   This function picks the searched candidate with the best cross
+                        validation score above the expected accuracy. The scores of every
+                        input are taken on the same folds of the real training rows, only the
+                        training part of the folds is resampled, so they are compared as they
+                        are. The test set is left for the metrics of the selected model
+
+        Output      :   Returns the best candidate and the score of every candidate
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            base_accuracy = self.model_trainer_config.expected_accuracy
+            selection = [
+                {
+                    "model_serial_number": grid_searched_best_model.model_serial_number,
+                    "model": type(grid_searched_best_model.best_model).__name__,
+                    "input": model_inputs[grid_searched_best_model.model_serial_number],
+                    "cv_score": grid_searched_best_model.best_score,
+                }
+                for grid_searched_best_model in grid_searched_best_model_list
+            ]
+            candidates = [
+                grid_searched_best_model
+                for grid_searched_best_model in grid_searched_best_model_list
+                if grid_searched_best_model.best_score > base_accuracy
+            ]
+            if not candidates:
+                raise Exception(f"None of Model has base accuracy: {base_accuracy}")
+
+            best = max(candidates, key=lambda candidate: candidate.best_score)
+            logging.info(f"Selected {best.best_model} by cross validation score among {selection}")
+            return best, selection
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_model_object_and_report(self) -> Tuple[object, object, str]:
+        """
+        Method Name :   get_model_object_and_report
+        Description :   This function reads the candidate models and parameter grids with neuro_mf,
+                        searches them with ModelSearch on a process pool, each on its input,
+                        keeps the best cross validation score and refits it on the whole
+                        training set
+
+        Output      :   Returns best model detail, metric artifact object and input of the best model
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            logging.info("Using neuro_mf to get best model object and report")
+            model_factory = ModelFactory(
+                model_config_path=self.model_trainer_config.model_config_file_path
+            )
+
+            model_inputs = self.get_model_inputs()
+            initialized_model_list = []
+            for initialized_model in model_factory.get_initialized_model_list():
+                model_input = model_inputs[initialized_model.model_serial_number]
+                if (
+                    model_input == "binned"
+                    and self.data_transformation_artifact.binned_train_features_file_path is None
+                ):
+                    logging.info(
+                        f"{initialized_model.model_name} is trained on binned features, "
+                        "data transformation did not emit them, it is skipped"
+                    )
+                    continue
+                initialized_model_list.append(initialized_model)
+                if (
+                    self.data_transformation_artifact.resampling_strategy == "class_weight"
+                    or model_input == "binned"
+                ):
+                    # the training set is not resampled, the models weight the classes instead
+                    if "class_weight" in initialized_model.model.get_params():
+                        initialized_model.model.set_params(class_weight="balanced")
+                    else:
+                        logging.info(
+                            f"{initialized_model.model_name} has no class_weight, "
+                            "it is trained on the imbalanced training set"
+                        )
+            search_config = self.get_search_config()
+            model_search = ModelSearch(
+                strategy=search_config.get("strategy", "grid"),
+                cv=model_factory.grid_search_property_data.get("cv", 5),
+                scoring=model_factory.grid_search_property_data.get("scoring"),
+                n_jobs=self.model_trainer_config.search_n_jobs,
+                candidate_time_budget=self.model_trainer_config.candidate_time_budget,
+                factor=search_config.get("factor", 3),
+                resource=search_config.get("resource", "n_samples"),
+                n_iter=search_config.get("n_iter", 10),
+                random_state=search_config.get("random_state", 42),
+            )
+            grid_searched_best_model_list = model_search.search(
+                initialized_model_list,
+                x_file_path=self.data_transformation_artifact.transformed_train_features_file_path,
+                y_file_path=self.data_transformation_artifact.transformed_train_target_file_path,
+                data_file_paths={
+                    initialized_model.model_serial_number: self.get_input_file_paths(
+                        model_inputs[initialized_model.model_serial_number]
+                    )[:2]
+                    for initialized_model in initialized_model_list
+                },
+                resamplers={
+                    initialized_model.model_serial_number: resampler
+                    for initialized_model in initialized_model_list
+                    for resampler in [
+                        self.get_resampler(model_inputs[initialized_model.model_serial_number])
+                    ]
+                    if resampler is not None
+                },
+            )
+            best_model_detail, selection = self.select_best_model(
+                grid_searched_best_model_list, model_inputs
+            )
+            model_input = model_inputs[best_model_detail.model_serial_number]
+            metric_artifact, resampling_report = self.refit_and_score(
+                best_model_detail, model_input
+            )
+            write_json_file(
+                self.model_trainer_config.search_report_file_path,
+                {
+                    "strategy": model_search.strategy,
+                    "candidates": model_search.results,
+                    "selection": selection,
+                    "resampling": resampling_report,
+                },
+            )
 
-            return best_model_detail, metric_artifact
+            return best_model_detail, metric_artifact, model_input
 
         except Exception as e:
             raise SensorFaultException(e, sys)
@@ -91,19 +316,13 @@ class ModelTrainer:
         """
         logging.info("Entered initiate_model_trainer method of ModelTrainer class")
         try:
-            train_arr = load_numpy_array_data(
-                file_path=self.data_transformation_artifact.transformed_train_file_path
-            )
-            test_arr = load_numpy_array_data(
-                file_path=self.data_transformation_artifact.transformed_test_file_path
-            )
-
-            best_model_detail, metric_artifact = self.get_model_object_and_report(
-                train=train_arr, test=test_arr
-            )
+            best_model_detail, metric_artifact, model_input = self.get_model_object_and_report()
 
+            # a model fitted on binned features predicts on the codes of the binner
             preprocessing_obj = load_object(
-                file_path=self.data_transformation_artifact.transformer_object_file_path
+                file_path=self.data_transformation_artifact.binner_object_file_path
+                if model_input == "binned"
+                else self.data_transformation_artifact.transformer_object_file_path
             )
 
             if (
@@ -116,6 +335,9 @@ class ModelTrainer:
             heart_stroke_model = SensorFaultModel(
                 preprocessing_object=preprocessing_obj,
                 trained_model_object=best_model_detail.best_model,
+                schema_validator=SchemaValidator.from_schema_file()
+                if self.model_trainer_config.validate_prediction_schema
+                else None,
             )
             logging.info("Created Heart Stroke object with preprocessor and model")
             logging.info("Created best model file path.")
@@ -126,6 +348,8 @@ class ModelTrainer:
             model_trainer_artifact = ModelTrainerArtifact(
                 trained_model_file_path=self.model_trainer_config.trained_model_file_path,
                 metric_artifact=metric_artifact,
+                search_strategy=self.get_search_config().get("strategy", "grid"),
+                search_report_file_path=self.model_trainer_config.search_report_file_path,
             )
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
             return model_trainer_artifact
@@ -1,5 +1,6 @@
 import os
 import sys
+from typing import Dict, Optional, Tuple
 
 import certifi
 import pymongo
@@ -12,26 +13,56 @@ ca = certifi.where()
 
 class MongoDBClient:
     """
-    Class Name :   export_data_into_feature_store
-    Description :   This method exports the dataframe from mongodb feature store as dataframe
+    Class Name  :   MongoDBClient
+    Description :   This class connects to the database_name database of the MONGODB_URL
+                    server. The pymongo clients are cached in MongoDBClient.clients, keyed by
+                    the compressor tuple of get_client_key ("zstd, snappy" and "zstd,snappy"
+                    share a client, no compression is the empty tuple). The first instance
+                    with a given key creates its client, every later instance with that key
+                    reuses it, whatever its database, and the client stays open for the life
+                    of the process
 
     Output      :   connection to mongodb database
     On Failure  :   raises an exception
     """
 
-    client = None
+    # a client keeps the wire compressors it was created with, so there is one per tuple
+    clients: Dict[Tuple[str, ...], pymongo.MongoClient] = {}
 
-    def __init__(self, database_name=DATABASE_NAME) -> None:
+    def __init__(self, database_name=DATABASE_NAME, compressors: Optional[str] = None) -> None:
         try:
-            if MongoDBClient.client is None:
-                mongo_db_url = os.getenv(MONGODB_URL_KEY)
-                if mongo_db_url is None:
-                    raise Exception(f"Environment key: {MONGODB_URL_KEY} is not set.")
-                MongoDBClient.client = pymongo.MongoClient(mongo_db_url, tlsCAFile=ca)
-            self.client = MongoDBClient.client
+            client_key = MongoDBClient.get_client_key(compressors)
+            if client_key not in MongoDBClient.clients:
+                MongoDBClient.clients[client_key] = MongoDBClient.create_client(
+                    compressors=",".join(client_key)
+                )
+            self.client = MongoDBClient.clients[client_key]
             self.database = self.client[database_name]
             self.database_name = database_name
         except Exception as e:
             raise SensorFaultException(e, sys)
 
+    @staticmethod
+    def get_client_key(compressors: Optional[str] = None) -> Tuple[str, ...]:
+        """
+        compressor names in order of preference, empty without compression
+        """
+        if not compressors:
+            return ()
+        return tuple(
+            compressor.strip() for compressor in compressors.split(",") if compressor.strip()
+        )
 
+    @staticmethod
+    def create_client(compressors: Optional[str] = None) -> pymongo.MongoClient:
+        """
+        create a new MongoClient from the environment,
+        compressors is a comma separated list of wire compressors (e.g. "zstd,snappy")
+        """
+        mongo_db_url = os.getenv(MONGODB_URL_KEY)
+        if mongo_db_url is None:
+            raise Exception(f"Environment key: {MONGODB_URL_KEY} is not set.")
+        client_options = {"tlsCAFile": ca}
+        if compressors:
+            client_options["compressors"] = compressors
+        return pymongo.MongoClient(mongo_db_url, **client_options)
@@ -1,2 +1,9 @@
 DATABASE_NAME = "sensor_fault_db"
-COLLECTION_NAME = "sensor_fault"
\ No newline at end of file
+COLLECTION_NAME = "sensor_fault"
+
+"""Bulk loader related constants"""
+BULK_LOAD_CHUNK_SIZE: int = 50000
+BULK_LOAD_BATCH_SIZE: int = 5000
+BULK_LOAD_WRITERS: int = 4
+BULK_LOAD_MAX_RETRIES: int = 3
+DUPLICATE_KEY_ERROR_CODE: int = 11000
@@ -4,31 +4,145 @@ from sensor_fault_detection.constant.s3_bucket import TRAINING_BUCKET_NAME
 TARGET_COLUMN = "class"
 PIPELINE_NAME: str = "sensor_fault"
 ARTIFACT_DIR: str = "artifact"
+# every run writes its artifacts under ARTIFACT_DIR/<timestamp>
+ARTIFACT_TIMESTAMP_FORMAT: str = "%m_%d_%Y_%H_%M_%S"
+# every stage of a run records its manifest in ARTIFACT_DIR/<run>/<manifest dir>/<stage>.json,
+# TrainPipeline(run_name=<run>) resumes the run from the first stage that is not up to date
+TRAINING_PIPELINE_MANIFEST_DIR_NAME: str = "manifests"
+# fingerprint the stage files by content (sha256) instead of size and modification time
+TRAINING_PIPELINE_MANIFEST_CHECKSUM: bool = False
+# threads running the independent stages of the pipeline graph at the same time, 1 runs the
+# stages one after the other
+TRAINING_PIPELINE_MAX_WORKERS: int = 4
+# start, end and slack of every stage of the run and its critical path
+TRAINING_PIPELINE_REPORT_FILE_NAME: str = "pipeline_report.json"
 
-FILE_NAME: str = "sensor_fault.csv"
-TRAIN_FILE_NAME: str = "train.csv"
-TEST_FILE_NAME: str = "test.csv"
+FILE_NAME: str = "sensor_fault"
+TRAIN_FILE_NAME: str = "train"
+TEST_FILE_NAME: str = "test"
 PREPROCESSING_OBJECT_FILE_NAME: str = "preprocessing.pkl"
 LABEL_ENCODER_OBJECT_FILE_NAME: str = "target_encoder.pkl"
+BINNER_OBJECT_FILE_NAME: str = "binner.pkl"
+RESAMPLER_OBJECT_FILE_NAME: str = "resampler.pkl"
 MODEL_FILE_NAME = "model.pkl"
 SCHEMA_FILE_PATH = os.path.join("config", "schema.yaml")
 
+"""Artifact file format related constants"""
+# csv, parquet or feather, parquet and feather keep the dtypes and are compressed
+ARTIFACT_FILE_FORMAT: str = "parquet"
+ARTIFACT_FILE_COMPRESSION: str = "zstd"
+
 """Data Ingestion realted constants"""
 DATA_INGESTION_COLLECTION_NAME: str = "sensor_fault"
 DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_store"
+DATA_INGESTION_FEATURE_STORE_PARTITION_DIR: str = "partitions"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float = 0.2
+DATA_INGESTION_EXPORT_BATCH_SIZE: int = 10000
+# rows read at a time by the streaming train/test split
+DATA_INGESTION_SPLIT_CHUNK_SIZE: int = 50000
+# number of worker processes exporting _id range partitions, 1 streams over a single cursor
+DATA_INGESTION_EXPORT_WORKERS: int = 1
+# comma separated mongodb wire compressors e.g. "zstd,snappy", empty disables compression
+DATA_INGESTION_MONGO_COMPRESSORS: str = ""
+# "full" re-exports the whole collection, "incremental" only fetches documents above the
+# watermark of the previous run and appends them to the persistent feature store
+DATA_INGESTION_MODE: str = "full"
+DATA_INGESTION_WATERMARK_FIELD: str = "_id"
+DATA_INGESTION_WATERMARK_FILE_NAME: str = "watermark.yaml"
+# delta partitions carry this prefix, outside of the part-* files, until the watermark is saved
+DATA_INGESTION_PENDING_PARTITION_PREFIX: str = "pending-"
+# a run whose source fingerprint matches the last successful one reuses its artifacts,
+# the checksum (mongodb dbHash) also catches in place updates but reads the whole collection
+DATA_INGESTION_FINGERPRINT_FILE_NAME: str = "fingerprint.yaml"
+DATA_INGESTION_FINGERPRINT_CHECKSUM: bool = False
 
 """Data Validation related constants"""
 DATA_VALIDATION_DIR_NAME: str = "data_validation"
 DATA_VALIDATION_DRIFT_REPORT_DIR: str = "drift_report"
-DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.yaml"
+# compact json: dataset summary and per column table, see ml.drift.load_drift_history
+DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.json"
+# per column report of the checks of the validation section of the schema file
+DATA_VALIDATION_SCHEMA_REPORT_FILE_NAME: str = "schema_report.json"
+# rows checked at a time by the schema validation
+DATA_VALIDATION_SCHEMA_CHUNK_SIZE: int = 50000
+# "full" checks every row, "sample" checks a stratified sample of the train and test data
+# and only reads the full data for the columns whose sample statistics are inconclusive
+DATA_VALIDATION_MODE: str = "full"
+# "feature_store" samples the train and test files, "mongodb" draws the sample server side
+# with $sample and splits it like the ingestion does
+DATA_VALIDATION_SAMPLE_SOURCE: str = "feature_store"
+# rows sampled from each of the train and test files, from the whole collection with mongodb
+DATA_VALIDATION_SAMPLE_SIZE: int = 10000
+DATA_VALIDATION_SAMPLE_CONFIDENCE: float = 0.95
+DATA_VALIDATION_SAMPLE_BOOTSTRAP_ROUNDS: int = 30
+DATA_VALIDATION_SAMPLE_SEED: int = 42
+# the samples of the schema validation are saved here, the drift detection reads them back
+DATA_VALIDATION_SAMPLE_DIR: str = "samples"
+# "native" runs the built in numpy drift tests, "evidently" the evidently DataDriftPreset report
+DATA_VALIDATION_DRIFT_ENGINE: str = "native"
+DATA_VALIDATION_DRIFT_SHARE: float = 0.5
+DATA_VALIDATION_DRIFT_N_JOBS: int = 4
+# histograms, null ratios and moments of the training data, shipped next to the model
+# so that new data can be checked for drift without the training data
+DATA_VALIDATION_REFERENCE_PROFILE_FILE_NAME: str = "reference_profile.json"
+DATA_VALIDATION_REFERENCE_PROFILE_N_BINS: int = 50
+# the profile is built from the whole train file, this many columns read at a time
+DATA_VALIDATION_REFERENCE_PROFILE_COLUMNS_PER_READ: int = 32
 
 """Data Transformation related constants"""
 DATA_TRANSFORMATION_DIR_NAME: str = "data_transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR: str = "transformed"
 DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR: str = "transformer_object"
+# features (float32) and encoded target (int8) are separate .npy files, memory mapped on load
+DATA_TRANSFORMATION_FEATURES_FILE_NAME: str = "features.npy"
+DATA_TRANSFORMATION_TARGET_FILE_NAME: str = "target.npy"
+# fitted preprocessing and target encoder objects shared by every run under
+# ARTIFACT_DIR/<cache dir>/<key>, the key hashes the train file, the schema, the transformer
+# parameters and the library versions so that unchanged data is transformed without a refit
+DATA_TRANSFORMATION_PREPROCESSOR_CACHE_DIR: str = "preprocessor_cache"
+DATA_TRANSFORMATION_USE_PREPROCESSOR_CACHE: bool = True
+# "memory" fits the preprocessor on the whole train frame, "chunked" streams the train file:
+# the scaler quantiles come from mergeable sketches (ml.streaming_preprocessing) and the
+# features are transformed chunk by chunk into memory mapped .npy files
+DATA_TRANSFORMATION_FIT_MODE: str = "memory"
+DATA_TRANSFORMATION_CHUNK_SIZE: int = 20000
+# points per column of the quantile sketches, the median and quartile ranks are within
+# (log2(chunks) + 1) / size of the exact ones
+DATA_TRANSFORMATION_QUANTILE_SKETCH_SIZE: int = 2048
+DATA_TRANSFORMATION_N_JOBS: int = 2
+# class balancing of the training set, one of ml.resampling.RESAMPLING_STRATEGIES: "smote_tomek",
+# "smote" (neighbours among the minority rows), "smote_batched" (batched float32 neighbour
+# search) or "class_weight" (no resampling, the models weight the classes). The transformed
+# training set is saved as is, the model trainer resamples the training part of every cross
+# validation fold and the training set of the final fit with the saved resampler
+DATA_TRANSFORMATION_RESAMPLING_STRATEGY: str = "smote_tomek"
+DATA_TRANSFORMATION_RESAMPLING_K_NEIGHBORS: int = 5
+# rows per batch of the smote_batched neighbour search and synthetic rows generation
+DATA_TRANSFORMATION_RESAMPLING_BATCH_SIZE: int = 4096
+# the test set keeps the real class balance unless this is set
+DATA_TRANSFORMATION_RESAMPLE_TEST_SET: bool = False
+# wall time and class counts of the resampling
+DATA_TRANSFORMATION_RESAMPLING_REPORT_FILE_NAME: str = "resampling_report.json"
+# feature pruning before resampling (ml.feature_pruning), opt in: columns mostly missing in the
+# raw data, constant once transformed or near duplicates of an earlier column are dropped, the
+# kept columns are the only ones the saved preprocessor and the model read
+DATA_TRANSFORMATION_PRUNE_FEATURES: bool = False
+DATA_TRANSFORMATION_MAX_MISSING_RATIO: float = 0.7
+DATA_TRANSFORMATION_MIN_VARIANCE: float = 0.0
+DATA_TRANSFORMATION_MAX_CORRELATION: float = 0.99
+# keep only this many columns by extra trees importance, 0 keeps every column left
+DATA_TRANSFORMATION_IMPORTANCE_TOP_K: int = 0
+# kept columns and dropped columns with the value of the criterion they were dropped for
+DATA_TRANSFORMATION_FEATURE_PRUNING_REPORT_FILE_NAME: str = "feature_pruning_report.json"
+# uint8 quantile bin codes of the raw (not imputed, not resampled) features and their target,
+# consumed by the model.yaml candidates with input: binned (histogram based models), cached
+# with the fitted binner in the preprocessor cache directory. Opt in, without them the
+# binned candidates are skipped
+DATA_TRANSFORMATION_EMIT_BINNED_FEATURES: bool = False
+DATA_TRANSFORMATION_BINNED_FEATURES_FILE_NAME: str = "binned_features.npy"
+DATA_TRANSFORMATION_BINNED_TARGET_FILE_NAME: str = "binned_target.npy"
 
 """Model Trainer related constants"""
 MODEL_TRAINER_DIR_NAME: str = "model_trainer"
@@ -36,9 +150,23 @@ MODEL_TRAINER_TRAINED_MODEL_DIR: str = "trained_model"
 MODEL_TRAINER_TRAINED_MODEL_NAME: str = "model.pkl"
 MODEL_TRAINER_EXPECTED_SCORE: float = 0.6
 MODEL_TRAINER_MODEL_CONFIG_FILE_PATH: str = os.path.join("config", "model.yaml")
+# processes of the parameter search (ml.model_search), one fit of a candidate on a fold each,
+# negative values count back from the number of cpus (-1 is every cpu)
+MODEL_TRAINER_SEARCH_N_JOBS: int = -1
+# seconds a fit of a candidate on a fold may run before it is killed and the candidate dropped
+MODEL_TRAINER_CANDIDATE_TIME_BUDGET: float = 900.0
+# scores, fit and score times of every candidate of the search
+MODEL_TRAINER_SEARCH_REPORT_FILE_NAME: str = "search_report.json"
+# the saved model validates every prediction batch against the schema (ml.schema_validation)
+# before predicting and raises on an invalid one
+MODEL_TRAINER_VALIDATE_PREDICTION_SCHEMA: bool = False
 
 """Model Evaluation related constants"""
 MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE: float = 0.02
+MODEL_EVALUATION_DIR_NAME: str = "model_evaluation"
+# local copy of the production model, downloaded while the new model trains
+MODEL_EVALUATION_PRODUCTION_MODEL_FILE_NAME: str = "production_model.pkl"
 
 MODEL_PUSHER_BUCKET_NAME = TRAINING_BUCKET_NAME
-MODEL_PUSHER_S3_KEY = "model-registry"
\ No newline at end of file
+MODEL_PUSHER_S3_KEY = "model-registry"
+MODEL_PUSHER_S3_REFERENCE_PROFILE_KEY = "sensor-fault-reference-profile.json"
\ No newline at end of file
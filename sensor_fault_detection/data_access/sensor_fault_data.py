@@ -1,44 +1,329 @@
 import os
 import sys
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+from typing import Any, Dict, Iterator, List, Optional
 
-import numpy as np
 import pandas as pd
 
 from sensor_fault_detection.configuration.mongo_db_connection import MongoDBClient
 from sensor_fault_detection.constant.database import DATABASE_NAME
+from sensor_fault_detection.constant.training_pipeline import (
+    ARTIFACT_FILE_FORMAT,
+    DATA_INGESTION_EXPORT_BATCH_SIZE,
+)
 from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.logger import logging
+from sensor_fault_detection.utils.main_utils import DataFrameWriter, apply_schema_dtypes
 
 class SensorData:
     """
     This class help to export entire mongo db record as pandas dataframe
     """
 
-    def __init__(self):
-        """ """
+    def __init__(self, compressors: Optional[str] = None):
+        """
+        :param compressors: wire compressors for the mongodb connection, e.g. "zstd,snappy"
+        """
         try:
-            self.mongo_client = MongoDBClient(database_name=DATABASE_NAME)
+            self.compressors = compressors
+            self.mongo_client = MongoDBClient(
+                database_name=DATABASE_NAME, compressors=compressors
+            )
 
         except Exception as e:
             raise SensorFaultException(e, sys) from e
 
+    def get_collection(self, collection_name: str, database_name: Optional[str] = None):
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
+    @staticmethod
+    def documents_to_dataframe(
+        documents: List[dict], columns: List[str], dtypes: Optional[Dict[str, str]] = None
+    ) -> pd.DataFrame:
+        """
+        build one typed dataframe chunk from a batch of documents, pandas
+        converts the records straight into per-column numpy arrays.
+        Columns listed in dtypes are cast to the declared dtype, values that
+        cannot be parsed (e.g. "na" markers) become NaN
+        """
+        dataframe = pd.DataFrame.from_records(documents, columns=columns)
+        if dtypes:
+            apply_schema_dtypes(dataframe, dtypes)
+        return dataframe
+
+    @staticmethod
+    def cursor_to_chunks(
+        cursor,
+        batch_size: int,
+        columns: Optional[List[str]] = None,
+        dtypes: Optional[Dict[str, str]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        consume a cursor batch_size documents at a time and yield each batch as a dataframe,
+        when columns is None the column order is taken from the first document
+        """
+        while True:
+            documents = list(islice(cursor, batch_size))
+            if not documents:
+                break
+            if columns is None:
+                columns = [column for column in documents[0] if column != "_id"]
+            yield SensorData.documents_to_dataframe(documents, columns, dtypes)
+
+    def export_collection_as_chunks(
+        self,
+        collection_name: str,
+        database_name: Optional[str] = None,
+        batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE,
+        projection: Optional[Dict[str, int]] = None,
+        dtypes: Optional[Dict[str, str]] = None,
+        query: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        stream collection as dataframe chunks of at most batch_size rows:
+        the cursor is consumed one batch at a time, so peak memory is bounded
+        by batch_size and not by the size of the collection.
+        query and projection are applied by the server, so neither filtered documents
+        nor excluded fields are sent. Column order is taken from the first document.
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            cursor = collection.find(query, projection=projection, batch_size=batch_size)
+            yield from SensorData.cursor_to_chunks(cursor, batch_size, dtypes=dtypes)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
     def export_collection_as_dataframe(
-        self, collection_name: str, database_name: Optional[str] = None
+        self,
+        collection_name: str,
+        database_name: Optional[str] = None,
+        batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE,
+        projection: Optional[Dict[str, int]] = None,
+        dtypes: Optional[Dict[str, str]] = None,
+        query: Optional[Dict[str, Any]] = None,
     ) -> pd.DataFrame:
+        """
+        export entire collection as one dataframe: thin wrapper concatenating the chunks of
+        export_collection_as_chunks, same arguments. It materializes the whole collection in
+        memory, use it for collections known to fit (notebooks, tests), the ingestion streams
+        the chunks into the feature store instead
+        """
         try:
-            """
-            export entire collection as dataframe:
-            return pd.DataFrame of collection
-            """
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
+            chunks = list(
+                self.export_collection_as_chunks(
+                    collection_name=collection_name,
+                    database_name=database_name,
+                    batch_size=batch_size,
+                    projection=projection,
+                    dtypes=dtypes,
+                    query=query,
+                )
+            )
+            if len(chunks) == 0:
+                return pd.DataFrame()
+            return pd.concat(chunks, ignore_index=True)
+
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def sample_collection_as_dataframe(
+        self,
+        collection_name: str,
+        sample_size: int,
+        stratify_field: Optional[str] = None,
+        strata: Optional[List[Any]] = None,
+        database_name: Optional[str] = None,
+        projection: Optional[Dict[str, int]] = None,
+        dtypes: Optional[Dict[str, str]] = None,
+    ) -> pd.DataFrame:
+        """
+        random sample of about sample_size documents drawn by the server with $sample, so
+        that only the sampled documents are sent. With stratify_field every value of strata
+        gets its share of the sample (at least one document), the share is taken from
+        count_documents which an index on stratify_field answers without a scan
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            if stratify_field is None:
+                queries = [({}, sample_size)]
             else:
-                collection = self.mongo_client[database_name][collection_name]
-            df = pd.DataFrame(list(collection.find()))
-            if "_id" in df.columns.to_list():
-                df = df.drop(columns=["_id"], axis=1)
-            return df
+                counts = [collection.count_documents({stratify_field: value}) for value in strata]
+                total = sum(counts)
+                queries = [
+                    ({stratify_field: value}, min(count, max(round(count * sample_size / total), 1)))
+                    for value, count in zip(strata, counts)
+                    if count > 0
+                ]
+            pipeline_projection = [{"$project": projection}] if projection else []
+            chunks = []
+            for query, size in queries:
+                cursor = collection.aggregate(
+                    [{"$match": query}, {"$sample": {"size": size}}] + pipeline_projection,
+                    allowDiskUse=True,
+                )
+                chunks.extend(SensorData.cursor_to_chunks(cursor, size, dtypes=dtypes))
+            if len(chunks) == 0:
+                return pd.DataFrame()
+            return pd.concat(chunks, ignore_index=True)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
+    def get_max_value(
+        self,
+        collection_name: str,
+        field: str,
+        query: Optional[Dict[str, Any]] = None,
+        database_name: Optional[str] = None,
+    ) -> Any:
+        """
+        highest value of field among the documents matching query, None for no document
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            documents = list(
+                collection.find(query, projection={field: 1}).sort(field, -1).limit(1)
+            )
+            if len(documents) == 0:
+                return None
+            return documents[0].get(field)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_collection_fingerprint(
+        self,
+        collection_name: str,
+        database_name: Optional[str] = None,
+        checksum: bool = False,
+    ) -> Dict[str, str]:
+        """
+        cheap summary of the collection content: the document count from the collection
+        metadata and the highest _id, both answered without scanning the documents.
+        That catches inserts and deletes but not in place updates; checksum adds the
+        dbHash md5 of the collection which does, at the cost of a full read under a lock
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            fingerprint = {
+                "count": str(collection.estimated_document_count()),
+                "max_id": str(self.get_max_value(collection_name, "_id", database_name=database_name)),
+            }
+            if checksum:
+                db_hash = collection.database.command("dbHash", collections=[collection_name])
+                fingerprint["checksum"] = db_hash["collections"].get(collection_name, "")
+            return fingerprint
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_id_partitions(
+        self, collection_name: str, n_partitions: int, database_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        split the collection into at most n_partitions contiguous _id ranges of
+        roughly equal size with $bucketAuto, returned as _id filters in _id order
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            buckets = list(
+                collection.aggregate(
+                    [{"$bucketAuto": {"groupBy": "$_id", "buckets": n_partitions}}],
+                    allowDiskUse=True,
+                )
+            )
+            id_filters = []
+            for index, bucket in enumerate(buckets):
+                # $bucketAuto upper bounds are exclusive except for the last bucket
+                upper_operator = "$lte" if index == len(buckets) - 1 else "$lt"
+                id_filters.append(
+                    {"$gte": bucket["_id"]["min"], upper_operator: bucket["_id"]["max"]}
+                )
+            return id_filters
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def export_collection_in_partitions(
+        self,
+        collection_name: str,
+        output_dir: str,
+        n_workers: int,
+        database_name: Optional[str] = None,
+        batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE,
+        projection: Optional[Dict[str, int]] = None,
+        dtypes: Optional[Dict[str, str]] = None,
+        file_format: str = ARTIFACT_FILE_FORMAT,
+    ) -> List[str]:
+        """
+        export the collection as n_workers _id range partitions, each one streamed into
+        a file_format file under output_dir by its own worker process with its own MongoClient.
+        Returns the non empty partition file paths in _id order, all sharing the same columns
+        """
+        try:
+            database_name = database_name or self.mongo_client.database_name
+            collection = self.get_collection(collection_name, database_name)
+            first_document = collection.find_one(projection=projection)
+            if first_document is None:
+                return []
+            columns = [column for column in first_document if column != "_id"]
+            id_filters = self.get_id_partitions(collection_name, n_workers, database_name)
+            os.makedirs(output_dir, exist_ok=True)
+            file_paths = [
+                os.path.join(output_dir, f"part-{index:05d}.{file_format}")
+                for index in range(len(id_filters))
+            ]
+            # spawn, so that no worker inherits the parent's MongoClient which is not fork-safe
+            with ProcessPoolExecutor(
+                max_workers=len(id_filters), mp_context=get_context("spawn")
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        export_partition,
+                        collection_name,
+                        database_name,
+                        id_filter,
+                        file_path,
+                        columns,
+                        batch_size,
+                        projection,
+                        dtypes,
+                        self.compressors,
+                    )
+                    for id_filter, file_path in zip(id_filters, file_paths)
+                ]
+                partition_rows = [future.result() for future in futures]
+            logging.info(f"Exported {sum(partition_rows)} rows in {len(file_paths)} partitions")
+            return [
+                file_path for file_path, rows in zip(file_paths, partition_rows) if rows > 0
+            ]
         except Exception as e:
             raise SensorFaultException(e, sys)
 
+
+def export_partition(
+    collection_name: str,
+    database_name: str,
+    id_filter: Dict[str, Any],
+    file_path: str,
+    columns: List[str],
+    batch_size: int,
+    projection: Optional[Dict[str, int]],
+    dtypes: Optional[Dict[str, str]],
+    compressors: Optional[str],
+) -> int:
+    """
+    worker of SensorData.export_collection_in_partitions:
+    streams the documents matching id_filter into file_path and returns the number of rows
+    """
+    client = MongoDBClient.create_client(compressors=compressors)
+    try:
+        cursor = client[database_name][collection_name].find(
+            {"_id": id_filter}, projection=projection, batch_size=batch_size
+        )
+        with DataFrameWriter(file_path) as writer:
+            for chunk in SensorData.cursor_to_chunks(cursor, batch_size, columns, dtypes):
+                writer.write(chunk)
+        return writer.rows
+    finally:
+        client.close()
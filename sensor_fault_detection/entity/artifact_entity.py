@@ -1,22 +1,47 @@
 from dataclasses import dataclass
+from typing import Dict, Optional
 
 @dataclass
 class DataIngestionArtifact:
     trained_file_path: str
     test_file_path: str
 
+@dataclass
+class SchemaValidationArtifact:
+    validation_status: bool
+    message: str
+    schema_report_file_path: str
+    # sample mode: the train and test samples and whether each holds all the rows of its file
+    sample_file_paths: Optional[Dict[str, str]] = None
+    complete_samples: Optional[Dict[str, bool]] = None
+
 @dataclass
 class DataValidationArtifact:
     validation_status : bool
     message: str
+    schema_report_file_path: str
     drift_report_file_path: str
+    reference_profile_file_path: str
 
 @dataclass
 class DataTransformationArtifact:
     transformer_object_file_path: str
     label_encoder_object_file_path: str
-    transformed_train_file_path: str
-    transformed_test_file_path: str
+    transformed_train_features_file_path: str
+    transformed_train_target_file_path: str
+    transformed_test_features_file_path: str
+    transformed_test_target_file_path: str
+    resampling_strategy: str
+    # unfitted resampler of the training folds and of the final training set
+    resampler_object_file_path: str
+    resampling_report_file_path: str
+    feature_pruning_report_file_path: str
+    # binned features of the histogram based candidates, None when they are not emitted
+    binner_object_file_path: Optional[str] = None
+    binned_train_features_file_path: Optional[str] = None
+    binned_train_target_file_path: Optional[str] = None
+    binned_test_features_file_path: Optional[str] = None
+    binned_test_target_file_path: Optional[str] = None
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -28,6 +53,14 @@ class ClassificationMetricArtifact:
 class ModelTrainerArtifact:
     trained_model_file_path: str
     metric_artifact: ClassificationMetricArtifact
+    search_strategy: str
+    search_report_file_path: str
+
+@dataclass
+class ProductionModelArtifact:
+    is_model_present: bool
+    # local copy of the production model, None when there is none
+    production_model_file_path: Optional[str] = None
 
 @dataclass
 class ModelEvaluationArtifact:
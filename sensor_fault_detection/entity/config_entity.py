@@ -1,35 +1,87 @@
 import os
 from sensor_fault_detection.constant.training_pipeline import *
 from sensor_fault_detection.constant.s3_bucket import TRAINING_BUCKET_NAME
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, replace
 from datetime import datetime
+from typing import Optional
 
-TIMESTAMP: str = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
+TIMESTAMP: str = datetime.now().strftime(ARTIFACT_TIMESTAMP_FORMAT)
 
 @dataclass
 class TrainingPipelineConfig:
     pipeline_name: str = PIPELINE_NAME
     artifact_dir: str = os.path.join(ARTIFACT_DIR, TIMESTAMP)
     timestamp: str = TIMESTAMP
+    manifest_dir: str = os.path.join(artifact_dir, TRAINING_PIPELINE_MANIFEST_DIR_NAME)
+    manifest_checksum: bool = TRAINING_PIPELINE_MANIFEST_CHECKSUM
+    max_workers: int = TRAINING_PIPELINE_MAX_WORKERS
+    pipeline_report_file_path: str = os.path.join(artifact_dir, TRAINING_PIPELINE_REPORT_FILE_NAME)
 
 training_pipeline_config: TrainingPipelineConfig = TrainingPipelineConfig()
 
+def rebase_config(config, artifact_dir: str):
+    """
+    Copy of a config whose paths under the artifact directory of this process are moved under
+    artifact_dir, the directories shared by every run stay where they are
+    """
+    prefix = training_pipeline_config.artifact_dir
+    changes = {}
+    for field in fields(config):
+        value = getattr(config, field.name)
+        if isinstance(value, str) and (value == prefix or value.startswith(prefix + os.sep)):
+            changes[field.name] = artifact_dir + value[len(prefix):]
+    return replace(config, **changes)
+
 @dataclass
 class DataIngestionConfig:
     data_ingestion_dir: str = os.path.join(
         training_pipeline_config.artifact_dir, DATA_INGESTION_DIR_NAME
     )
     feature_store_file_path: str = os.path.join(
-        data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR, FILE_NAME
+        data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR, f"{FILE_NAME}.{ARTIFACT_FILE_FORMAT}"
+    )
+    feature_store_partition_dir: str = os.path.join(
+        data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR, DATA_INGESTION_FEATURE_STORE_PARTITION_DIR
     )
     training_file_path: str = os.path.join(
-        data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TRAIN_FILE_NAME
+        data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, f"{TRAIN_FILE_NAME}.{ARTIFACT_FILE_FORMAT}"
     )
     testing_file_path: str = os.path.join(
-        data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME
+        data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, f"{TEST_FILE_NAME}.{ARTIFACT_FILE_FORMAT}"
     )
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
     collection_name: str = DATA_INGESTION_COLLECTION_NAME
+    export_batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE
+    split_chunk_size: int = DATA_INGESTION_SPLIT_CHUNK_SIZE
+    mongo_compressors: str = DATA_INGESTION_MONGO_COMPRESSORS
+    export_workers: int = DATA_INGESTION_EXPORT_WORKERS
+    file_format: str = ARTIFACT_FILE_FORMAT
+    ingestion_mode: str = DATA_INGESTION_MODE
+    watermark_field: str = DATA_INGESTION_WATERMARK_FIELD
+    # shared by every run, unlike the timestamped artifact directory, one per collection,
+    # the paths left unset are derived from the configured collection name
+    persistent_feature_store_dir: Optional[str] = None
+    watermark_file_path: Optional[str] = None
+    fingerprint_file_path: Optional[str] = None
+    fingerprint_checksum: bool = DATA_INGESTION_FINGERPRINT_CHECKSUM
+
+    def __post_init__(self):
+        # the artifact paths carry the extension of the configured file format
+        for field_name in ("feature_store_file_path", "training_file_path", "testing_file_path"):
+            file_path = getattr(self, field_name)
+            setattr(self, field_name, f"{os.path.splitext(file_path)[0]}.{self.file_format}")
+        if self.persistent_feature_store_dir is None:
+            self.persistent_feature_store_dir = os.path.join(
+                ARTIFACT_DIR, DATA_INGESTION_FEATURE_STORE_DIR, self.collection_name
+            )
+        if self.watermark_file_path is None:
+            self.watermark_file_path = os.path.join(
+                self.persistent_feature_store_dir, DATA_INGESTION_WATERMARK_FILE_NAME
+            )
+        if self.fingerprint_file_path is None:
+            self.fingerprint_file_path = os.path.join(
+                self.persistent_feature_store_dir, DATA_INGESTION_FINGERPRINT_FILE_NAME
+            )
 
 @dataclass
 class DataValidationConfig:
@@ -41,21 +93,58 @@ class DataValidationConfig:
         DATA_VALIDATION_DRIFT_REPORT_DIR,
         DATA_VALIDATION_DRIFT_REPORT_FILE_NAME,
     )
+    schema_report_file_path: str = os.path.join(
+        data_validation_dir, DATA_VALIDATION_SCHEMA_REPORT_FILE_NAME
+    )
+    schema_chunk_size: int = DATA_VALIDATION_SCHEMA_CHUNK_SIZE
+    validation_mode: str = DATA_VALIDATION_MODE
+    sample_source: str = DATA_VALIDATION_SAMPLE_SOURCE
+    sample_size: int = DATA_VALIDATION_SAMPLE_SIZE
+    sample_confidence: float = DATA_VALIDATION_SAMPLE_CONFIDENCE
+    sample_bootstrap_rounds: int = DATA_VALIDATION_SAMPLE_BOOTSTRAP_ROUNDS
+    sample_seed: int = DATA_VALIDATION_SAMPLE_SEED
+    train_sample_file_path: str = os.path.join(
+        data_validation_dir, DATA_VALIDATION_SAMPLE_DIR, f"{TRAIN_FILE_NAME}.{ARTIFACT_FILE_FORMAT}"
+    )
+    test_sample_file_path: str = os.path.join(
+        data_validation_dir, DATA_VALIDATION_SAMPLE_DIR, f"{TEST_FILE_NAME}.{ARTIFACT_FILE_FORMAT}"
+    )
+    sample_collection_name: str = DATA_INGESTION_COLLECTION_NAME
+    sample_mongo_compressors: str = DATA_INGESTION_MONGO_COMPRESSORS
+    sample_test_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
+    drift_engine: str = DATA_VALIDATION_DRIFT_ENGINE
+    drift_share: float = DATA_VALIDATION_DRIFT_SHARE
+    drift_n_jobs: int = DATA_VALIDATION_DRIFT_N_JOBS
+    reference_profile_file_path: str = os.path.join(
+        data_validation_dir, DATA_VALIDATION_REFERENCE_PROFILE_FILE_NAME
+    )
+    reference_profile_n_bins: int = DATA_VALIDATION_REFERENCE_PROFILE_N_BINS
+    reference_profile_columns_per_read: int = DATA_VALIDATION_REFERENCE_PROFILE_COLUMNS_PER_READ
 
 @dataclass
 class DataTransformationConfig:
     data_transformation_dir: str = os.path.join(
         training_pipeline_config.artifact_dir, DATA_TRANSFORMATION_DIR_NAME
     )
-    transformed_train_file_path: str = os.path.join(
+    transformed_train_features_file_path: str = os.path.join(
+        data_transformation_dir,
+        DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+        f"{TRAIN_FILE_NAME}_{DATA_TRANSFORMATION_FEATURES_FILE_NAME}",
+    )
+    transformed_train_target_file_path: str = os.path.join(
         data_transformation_dir,
         DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-        TRAIN_FILE_NAME.replace("csv", "npy"),
+        f"{TRAIN_FILE_NAME}_{DATA_TRANSFORMATION_TARGET_FILE_NAME}",
     )
-    transformed_test_file_path: str = os.path.join(
+    transformed_test_features_file_path: str = os.path.join(
         data_transformation_dir,
         DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-        TEST_FILE_NAME.replace("csv", "npy"),
+        f"{TEST_FILE_NAME}_{DATA_TRANSFORMATION_FEATURES_FILE_NAME}",
+    )
+    transformed_test_target_file_path: str = os.path.join(
+        data_transformation_dir,
+        DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+        f"{TEST_FILE_NAME}_{DATA_TRANSFORMATION_TARGET_FILE_NAME}",
     )
     transformer_object_file_path: str = os.path.join(
         data_transformation_dir,
@@ -68,6 +157,61 @@ class DataTransformationConfig:
         DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
         LABEL_ENCODER_OBJECT_FILE_NAME,
     )
+    # shared by every run, unlike the timestamped artifact directory
+    preprocessor_cache_dir: str = os.path.join(
+        ARTIFACT_DIR, DATA_TRANSFORMATION_PREPROCESSOR_CACHE_DIR
+    )
+    use_preprocessor_cache: bool = DATA_TRANSFORMATION_USE_PREPROCESSOR_CACHE
+    fit_mode: str = DATA_TRANSFORMATION_FIT_MODE
+    chunk_size: int = DATA_TRANSFORMATION_CHUNK_SIZE
+    quantile_sketch_size: int = DATA_TRANSFORMATION_QUANTILE_SKETCH_SIZE
+    n_jobs: int = DATA_TRANSFORMATION_N_JOBS
+    resampling_strategy: str = DATA_TRANSFORMATION_RESAMPLING_STRATEGY
+    resampling_k_neighbors: int = DATA_TRANSFORMATION_RESAMPLING_K_NEIGHBORS
+    resampling_batch_size: int = DATA_TRANSFORMATION_RESAMPLING_BATCH_SIZE
+    resample_test_set: bool = DATA_TRANSFORMATION_RESAMPLE_TEST_SET
+    resampler_object_file_path: str = os.path.join(
+        data_transformation_dir,
+        DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
+        RESAMPLER_OBJECT_FILE_NAME,
+    )
+    resampling_report_file_path: str = os.path.join(
+        data_transformation_dir, DATA_TRANSFORMATION_RESAMPLING_REPORT_FILE_NAME
+    )
+    prune_features: bool = DATA_TRANSFORMATION_PRUNE_FEATURES
+    max_missing_ratio: float = DATA_TRANSFORMATION_MAX_MISSING_RATIO
+    min_variance: float = DATA_TRANSFORMATION_MIN_VARIANCE
+    max_correlation: float = DATA_TRANSFORMATION_MAX_CORRELATION
+    importance_top_k: int = DATA_TRANSFORMATION_IMPORTANCE_TOP_K
+    feature_pruning_report_file_path: str = os.path.join(
+        data_transformation_dir, DATA_TRANSFORMATION_FEATURE_PRUNING_REPORT_FILE_NAME
+    )
+    emit_binned_features: bool = DATA_TRANSFORMATION_EMIT_BINNED_FEATURES
+    binner_object_file_path: str = os.path.join(
+        data_transformation_dir,
+        DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
+        BINNER_OBJECT_FILE_NAME,
+    )
+    binned_train_features_file_path: str = os.path.join(
+        data_transformation_dir,
+        DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+        f"{TRAIN_FILE_NAME}_{DATA_TRANSFORMATION_BINNED_FEATURES_FILE_NAME}",
+    )
+    binned_train_target_file_path: str = os.path.join(
+        data_transformation_dir,
+        DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+        f"{TRAIN_FILE_NAME}_{DATA_TRANSFORMATION_BINNED_TARGET_FILE_NAME}",
+    )
+    binned_test_features_file_path: str = os.path.join(
+        data_transformation_dir,
+        DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+        f"{TEST_FILE_NAME}_{DATA_TRANSFORMATION_BINNED_FEATURES_FILE_NAME}",
+    )
+    binned_test_target_file_path: str = os.path.join(
+        data_transformation_dir,
+        DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+        f"{TEST_FILE_NAME}_{DATA_TRANSFORMATION_BINNED_TARGET_FILE_NAME}",
+    )
 
 @dataclass
 class ModelTrainerConfig:
@@ -79,9 +223,21 @@ class ModelTrainerConfig:
     )
     expected_accuracy: float = MODEL_TRAINER_EXPECTED_SCORE
     model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    search_n_jobs: int = MODEL_TRAINER_SEARCH_N_JOBS
+    candidate_time_budget: float = MODEL_TRAINER_CANDIDATE_TIME_BUDGET
+    search_report_file_path: str = os.path.join(
+        model_trainer_dir, MODEL_TRAINER_SEARCH_REPORT_FILE_NAME
+    )
+    validate_prediction_schema: bool = MODEL_TRAINER_VALIDATE_PREDICTION_SCHEMA
 
 @dataclass
 class ModelEvaluationConfig:
+    model_evaluation_dir: str = os.path.join(
+        training_pipeline_config.artifact_dir, MODEL_EVALUATION_DIR_NAME
+    )
+    production_model_file_path: str = os.path.join(
+        model_evaluation_dir, MODEL_EVALUATION_PRODUCTION_MODEL_FILE_NAME
+    )
     changed_threshold_score: float = MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE
     bucket_name: str = MODEL_PUSHER_BUCKET_NAME
     s3_model_key_path: str = "sensor-fault-model.pkl"
@@ -90,6 +246,7 @@ class ModelEvaluationConfig:
 class ModelPusherConfig:
     bucket_name: str = MODEL_PUSHER_BUCKET_NAME
     s3_model_key_path: str = "sensor-fault-model.pkl"
+    s3_reference_profile_key_path: str = MODEL_PUSHER_S3_REFERENCE_PROFILE_KEY
 
 @dataclass
 class FaultPredictionConfig:
@@ -0,0 +1,717 @@
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from scipy import stats
+from scipy.spatial import distance
+
+from sensor_fault_detection.constant.training_pipeline import (
+    ARTIFACT_DIR,
+    ARTIFACT_TIMESTAMP_FORMAT,
+    DATA_VALIDATION_DIR_NAME,
+    DATA_VALIDATION_DRIFT_REPORT_DIR,
+    DATA_VALIDATION_DRIFT_REPORT_FILE_NAME,
+)
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.logger import logging
+from sensor_fault_detection.utils.main_utils import read_json_file
+
+# the defaults of the evidently DataDriftPreset, so that both engines take the same decisions
+NUMBER_UNIQUE_AS_CATEGORICAL = 5
+SMALL_SAMPLE_SIZE = 1000
+P_VALUE_THRESHOLD = 0.05
+DISTANCE_THRESHOLD = 0.1
+MIN_NORMALIZATION_STD = 0.001
+PSI_N_BINS = 10
+PSI_MIN_PERCENT = 0.0001
+PROFILE_N_BINS = 50
+
+
+def get_column_type(reference: pd.Series, current: pd.Series) -> str:
+    """
+    "num" or "cat": booleans, strings and integers with at most
+    NUMBER_UNIQUE_AS_CATEGORICAL distinct values are categorical
+    """
+    dtype = current.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "cat"
+    if pd.api.types.is_integer_dtype(dtype):
+        n_unique = reference.nunique() or current.nunique()
+        return "cat" if n_unique <= NUMBER_UNIQUE_AS_CATEGORICAL else "num"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "num"
+    return "cat"
+
+
+def numerical_drift_statistics(
+    reference: np.ndarray, current: np.ndarray, n_bins: int = PSI_N_BINS
+) -> Dict[str, np.ndarray]:
+    """
+    KS statistic, normed Wasserstein distance and PSI of every column of a block.
+    reference and current are (rows, columns) float arrays where NaN marks a missing value.
+
+    Only the sort covers the whole block: the reference and current values of all the
+    columns are sorted with one call each (NaNs sort last). The merge and the statistics
+    then run column by column in a python loop over the sorted rows, every column merging
+    its two sorted samples with np.searchsorted: the running sum of +1/n_reference and
+    -1/n_current steps along the merged values is the difference of the two empirical CDFs,
+    its largest absolute value between distinct values is the KS statistic and its integral
+    over the gaps between consecutive values is the Wasserstein distance. PSI uses n_bins
+    reference quantile bins, counted in the sorted values too. A padded 2-D merge of the
+    whole block (one stable argsort along axis 1) gives the same numbers but is slower: the
+    work is memory bound and one column at a time stays in the cpu cache.
+    """
+    # columns are laid out as contiguous rows so that every column is sorted in place,
+    # infinite values are ignored like missing ones
+    reference = np.array(reference.T, dtype=np.float64, order="C")
+    current = np.array(current.T, dtype=np.float64, order="C")
+    reference[np.isinf(reference)] = np.nan
+    current[np.isinf(current)] = np.nan
+    n_reference = np.count_nonzero(~np.isnan(reference), axis=1)
+    n_current = np.count_nonzero(~np.isnan(current), axis=1)
+    reference.sort(axis=1)
+    current.sort(axis=1)
+
+    n_columns = len(reference)
+    statistics = {
+        "n_reference": n_reference,
+        "n_current": n_current,
+        "n_unique": np.zeros(n_columns, dtype=np.int64),
+        "ks_statistic": np.zeros(n_columns),
+        "wasserstein_distance_norm": np.zeros(n_columns),
+        "psi": np.zeros(n_columns),
+    }
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    for index in range(n_columns):
+        reference_values = reference[index, : n_reference[index]]
+        current_values = current[index, : n_current[index]]
+        if len(reference_values) == 0 or len(current_values) == 0:
+            continue
+        # positions of both samples in their merge, ties keep the reference values first
+        merged = np.empty(len(reference_values) + len(current_values))
+        steps = np.empty(len(merged))
+        reference_positions = np.arange(len(reference_values)) + np.searchsorted(
+            current_values, reference_values, side="left"
+        )
+        current_positions = np.arange(len(current_values)) + np.searchsorted(
+            reference_values, current_values, side="right"
+        )
+        merged[reference_positions] = reference_values
+        merged[current_positions] = current_values
+        steps[reference_positions] = 1.0 / len(reference_values)
+        steps[current_positions] = -1.0 / len(current_values)
+        cdf_difference = np.abs(np.cumsum(steps)[:-1])
+        gaps = np.diff(merged)
+
+        statistics["n_unique"][index] = len(merged) - np.count_nonzero(gaps == 0)
+        statistics["ks_statistic"][index] = np.max(cdf_difference[gaps > 0], initial=0.0)
+        statistics["wasserstein_distance_norm"][index] = np.dot(cdf_difference, gaps) / max(
+            reference_values.std(), MIN_NORMALIZATION_STD
+        )
+
+        edges = sorted_quantiles(reference_values, quantiles)
+        reference_percents = bin_percents(reference_values, edges)
+        current_percents = bin_percents(current_values, edges)
+        statistics["psi"][index] = np.sum(
+            (current_percents - reference_percents) * np.log(current_percents / reference_percents)
+        )
+    return statistics
+
+
+def sorted_quantiles(sorted_values: np.ndarray, quantiles: np.ndarray) -> np.ndarray:
+    """
+    linearly interpolated quantiles of already sorted values, like np.quantile without the sort
+    """
+    positions = quantiles * (len(sorted_values) - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (positions - lower)
+
+
+def bin_percents(sorted_values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    share of sorted_values in each bin delimited by the interior edges, a value equal
+    to an edge falls in the upper bin, floored at PSI_MIN_PERCENT
+    """
+    bounds = np.concatenate([[0], np.searchsorted(sorted_values, edges, side="left"), [len(sorted_values)]])
+    return np.maximum(np.diff(bounds) / len(sorted_values), PSI_MIN_PERCENT)
+
+
+def value_counts(reference: pd.Series, current: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    keys = list(set(reference.unique()) | set(current.unique()))
+    return (
+        reference.value_counts().reindex(keys, fill_value=0).to_numpy(dtype=np.float64),
+        current.value_counts().reindex(keys, fill_value=0).to_numpy(dtype=np.float64),
+    )
+
+
+def chi_square_test(reference: pd.Series, current: pd.Series) -> Tuple[float, bool]:
+    reference_counts, current_counts = value_counts(reference, current)
+    expected = reference_counts * len(current) / len(reference)
+    p_value = stats.chisquare(current_counts, expected)[1]
+    return p_value, p_value < P_VALUE_THRESHOLD
+
+
+def z_test(reference: pd.Series, current: pd.Series) -> Tuple[float, bool]:
+    keys = sorted(set(reference.unique()) | set(current.unique()))
+    if len(keys) == 1:
+        return 1.0, False
+    p_reference = np.mean(reference.to_numpy() != keys[0])
+    p_current = np.mean(current.to_numpy() != keys[0])
+    n_reference, n_current = len(reference), len(current)
+    pooled = (p_reference * n_reference + p_current * n_current) / (n_reference + n_current)
+    z_statistic = (p_reference - p_current) / np.sqrt(
+        pooled * (1 - pooled) * (1.0 / n_reference + 1.0 / n_current)
+    )
+    p_value = 2 * (1 - stats.norm.cdf(np.abs(z_statistic)))
+    return p_value, p_value < P_VALUE_THRESHOLD
+
+
+def jensenshannon_distance(reference: pd.Series, current: pd.Series) -> Tuple[float, bool]:
+    reference_counts, current_counts = value_counts(reference, current)
+    js_distance = distance.jensenshannon(
+        reference_counts / len(reference), current_counts / len(current)
+    )
+    return js_distance, js_distance >= DISTANCE_THRESHOLD
+
+
+class DataDriftDetector:
+    """
+    Native column drift detection, a lightweight alternative to the evidently DataDriftPreset.
+
+    Numerical columns are processed in blocks of column_block_size columns, every block
+    sorted at once then merged column by column into the KS, Wasserstein and PSI statistics
+    (numerical_drift_statistics), the blocks run on n_jobs threads (numpy sorts release the
+    GIL). The drift test of each column is
+    picked the way evidently does it, so the number of drifted columns and the dataset drift
+    decision are the same:
+        reference of at most 1000 values: KS p-value for numerical columns with more than
+        5 distinct values, chi-square (more than 2 values) or z-test otherwise
+        larger reference: normed Wasserstein distance for numerical columns with more than
+        5 distinct values, Jensen-Shannon distance otherwise
+    """
+
+    def __init__(self, drift_share: float = 0.5, column_block_size: int = 32, n_jobs: int = 1):
+        """
+        :param drift_share: share of drifted columns from which the dataset is drifted
+        :param column_block_size: number of numerical columns processed together
+        :param n_jobs: number of threads processing column blocks
+        """
+        self.drift_share = drift_share
+        self.column_block_size = column_block_size
+        self.n_jobs = n_jobs
+
+    def _numerical_block_drift(
+        self, reference_df: DataFrame, current_df: DataFrame, columns: List[str]
+    ) -> Dict[str, dict]:
+        statistics = numerical_drift_statistics(
+            reference_df[columns].to_numpy(dtype=np.float64, na_value=np.nan),
+            current_df[columns].to_numpy(dtype=np.float64, na_value=np.nan),
+        )
+        drift_by_columns = {}
+        for index, column in enumerate(columns):
+            column_statistics = {name: values[index].item() for name, values in statistics.items()}
+            drift_by_columns[column] = self._numerical_column_drift(
+                reference_df[column], current_df[column], column_statistics
+            )
+        return drift_by_columns
+
+    @staticmethod
+    def _numerical_column_drift(
+        reference: pd.Series, current: pd.Series, column_statistics: dict
+    ) -> dict:
+        n_reference = column_statistics.pop("n_reference")
+        n_current = column_statistics.pop("n_current")
+        n_unique = column_statistics.pop("n_unique")
+        result = {"column_type": "num", **column_statistics}
+        if n_reference == 0 or n_current == 0:
+            logging.warning(f"Column [{reference.name}] is empty, skipping its drift test")
+            return {**result, "stattest_name": None, "drift_score": None, "drift_detected": False}
+
+        if n_reference <= SMALL_SAMPLE_SIZE or n_unique <= NUMBER_UNIQUE_AS_CATEGORICAL:
+            reference, current = DataDriftDetector._finite(reference), DataDriftDetector._finite(current)
+        if n_reference <= SMALL_SAMPLE_SIZE:
+            if n_unique > NUMBER_UNIQUE_AS_CATEGORICAL:
+                stattest_name = "ks"
+                drift_score = stats.ks_2samp(reference, current)[1]
+                drift_detected = drift_score <= P_VALUE_THRESHOLD
+            elif n_unique > 2:
+                stattest_name = "chisquare"
+                drift_score, drift_detected = chi_square_test(reference, current)
+            else:
+                stattest_name = "z"
+                drift_score, drift_detected = z_test(reference, current)
+        elif n_unique <= NUMBER_UNIQUE_AS_CATEGORICAL:
+            stattest_name = "jensenshannon"
+            drift_score, drift_detected = jensenshannon_distance(reference, current)
+        else:
+            stattest_name = "wasserstein"
+            drift_score = result["wasserstein_distance_norm"]
+            drift_detected = drift_score >= DISTANCE_THRESHOLD
+        return {
+            **result,
+            "stattest_name": stattest_name,
+            "drift_score": float(drift_score),
+            "drift_detected": bool(drift_detected),
+        }
+
+    @staticmethod
+    def _categorical_column_drift(reference: pd.Series, current: pd.Series) -> dict:
+        reference, current = DataDriftDetector._finite(reference), DataDriftDetector._finite(current)
+        if reference.empty or current.empty:
+            logging.warning(f"Column [{reference.name}] is empty, skipping its drift test")
+            return {"column_type": "cat", "stattest_name": None, "drift_score": None, "drift_detected": False}
+        n_unique = pd.concat([reference, current]).nunique()
+        if len(reference) <= SMALL_SAMPLE_SIZE:
+            if n_unique > 2:
+                stattest_name = "chisquare"
+                drift_score, drift_detected = chi_square_test(reference, current)
+            else:
+                stattest_name = "z"
+                drift_score, drift_detected = z_test(reference, current)
+        else:
+            stattest_name = "jensenshannon"
+            drift_score, drift_detected = jensenshannon_distance(reference, current)
+        return {
+            "column_type": "cat",
+            "stattest_name": stattest_name,
+            "drift_score": float(drift_score),
+            "drift_detected": bool(drift_detected),
+        }
+
+    @staticmethod
+    def _finite(column: pd.Series) -> pd.Series:
+        if pd.api.types.is_float_dtype(column.dtype):
+            return column[np.isfinite(column.to_numpy())]
+        return column.dropna()
+
+    def run(self, reference_df: DataFrame, current_df: DataFrame) -> dict:
+        """
+        test every column of reference_df for drift in current_df
+
+        return: dict with number_of_columns, number_of_drifted_columns,
+        share_of_drifted_columns, dataset_drift and the per column drift_by_columns
+        """
+        try:
+            columns = list(reference_df.columns)
+            missing_columns = [column for column in columns if column not in current_df.columns]
+            if missing_columns:
+                raise ValueError(f"Columns {missing_columns} are missing in the current dataset")
+
+            column_types = {
+                column: get_column_type(reference_df[column], current_df[column])
+                for column in columns
+            }
+            numerical_columns = [column for column in columns if column_types[column] == "num"]
+            blocks = [
+                numerical_columns[start: start + self.column_block_size]
+                for start in range(0, len(numerical_columns), self.column_block_size)
+            ]
+            drift_by_columns = {}
+            with ThreadPoolExecutor(max_workers=max(self.n_jobs, 1)) as executor:
+                for block_drift in executor.map(
+                    lambda block: self._numerical_block_drift(reference_df, current_df, block),
+                    blocks,
+                ):
+                    drift_by_columns.update(block_drift)
+            for column in columns:
+                if column_types[column] == "cat":
+                    drift_by_columns[column] = self._categorical_column_drift(
+                        reference_df[column], current_df[column]
+                    )
+
+            return self.summarize({column: drift_by_columns[column] for column in columns})
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def summarize(self, drift_by_columns: Dict[str, dict]) -> dict:
+        """
+        dataset drift result of the per column results drift_by_columns, see run
+        """
+        n_columns = len(drift_by_columns)
+        n_drifted_columns = sum(drift["drift_detected"] for drift in drift_by_columns.values())
+        share_of_drifted_columns = n_drifted_columns / n_columns if n_columns else 0.0
+        return {
+            "number_of_columns": n_columns,
+            "number_of_drifted_columns": n_drifted_columns,
+            "share_of_drifted_columns": share_of_drifted_columns,
+            "dataset_drift": n_columns > 0 and share_of_drifted_columns >= self.drift_share,
+            "drift_by_columns": drift_by_columns,
+        }
+
+
+class ReferenceProfile:
+    """
+    Compact summary of the reference (training) data that later drift checks compare new
+    data against, without reading the reference data again:
+        numerical columns: null ratio, moments, min/max and the counts of a histogram over
+        at most n_bins reference quantile bins, columns with at most
+        NUMBER_UNIQUE_AS_CATEGORICAL distinct values keep their value counts instead
+        categorical columns: null ratio and value counts
+    The bins are fixed by the reference, so the counts of new data add up batch after
+    batch and a drift check costs a single O(rows) pass over the new data (DriftMonitor).
+    """
+
+    def __init__(self, columns: Dict[str, dict], n_rows: int):
+        """
+        :param columns: profile of every column, see from_dataframe
+        :param n_rows: number of reference rows
+        """
+        self.columns = columns
+        self.n_rows = n_rows
+
+    @classmethod
+    def from_column_groups(
+        cls, dataframes: Iterable[DataFrame], n_bins: int = PROFILE_N_BINS
+    ) -> "ReferenceProfile":
+        """
+        profile of a dataframe given as frames of groups of its columns, all with the same rows,
+        the same as from_dataframe of the whole frame: every column is profiled on its own, so
+        only one group is in memory at a time
+        """
+        try:
+            columns, n_rows = {}, 0
+            for dataframe in dataframes:
+                profile = cls.from_dataframe(dataframe, n_bins)
+                columns.update(profile.columns)
+                n_rows = profile.n_rows
+            return cls(columns=columns, n_rows=n_rows)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    @classmethod
+    def from_dataframe(cls, dataframe: DataFrame, n_bins: int = PROFILE_N_BINS) -> "ReferenceProfile":
+        try:
+            columns = {}
+            for column in dataframe.columns:
+                series = dataframe[column]
+                profile = {
+                    "column_type": get_column_type(series, series),
+                    "null_ratio": float(series.isna().mean()) if len(series) else 0.0,
+                }
+                if profile["column_type"] == "num":
+                    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                    values = np.sort(values[np.isfinite(values)])
+                    profile["count"] = len(values)
+                    if len(values):
+                        profile.update(
+                            mean=float(values.mean()),
+                            std=float(values.std()),
+                            min=float(values[0]),
+                            max=float(values[-1]),
+                        )
+                        unique_values, unique_counts = np.unique(values, return_counts=True)
+                        if len(unique_values) <= NUMBER_UNIQUE_AS_CATEGORICAL:
+                            profile["values"] = unique_values.tolist()
+                            profile["counts"] = unique_counts.tolist()
+                        else:
+                            edges = np.unique(
+                                sorted_quantiles(values, np.linspace(0, 1, n_bins + 1))
+                            )
+                            counts, sums = histogram_counts(values, edges)
+                            profile["edges"] = edges.tolist()
+                            profile["counts"] = counts.tolist()
+                            profile["sums"] = sums.tolist()
+                else:
+                    counts = series.dropna().astype(str).value_counts()
+                    profile["count"] = int(counts.sum())
+                    profile["values"] = counts.index.tolist()
+                    profile["counts"] = counts.tolist()
+                columns[str(column)] = profile
+            return cls(columns=columns, n_rows=len(dataframe))
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def to_dict(self) -> dict:
+        return {"n_rows": self.n_rows, "columns": self.columns}
+
+    @classmethod
+    def from_dict(cls, profile: dict) -> "ReferenceProfile":
+        return cls(columns=profile["columns"], n_rows=profile["n_rows"])
+
+    def save(self, file_path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            with open(file_path, "w") as file_obj:
+                json.dump(self.to_dict(), file_obj, separators=(",", ":"))
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    @classmethod
+    def load(cls, file_path: str) -> "ReferenceProfile":
+        try:
+            with open(file_path) as file_obj:
+                return cls.from_dict(json.load(file_obj))
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def detect_drift(self, dataframe: DataFrame, drift_share: float = 0.5) -> dict:
+        """
+        drift of dataframe against the profile, see DriftMonitor.result
+        """
+        monitor = DriftMonitor(self, drift_share=drift_share)
+        monitor.update(dataframe)
+        return monitor.result()
+
+
+def histogram_counts(values: np.ndarray, edges: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    number and sum of the values below edges[0], in every [edges[i], edges[i + 1]) bin
+    and from edges[-1] on, len(edges) + 1 bins in total
+    """
+    bins = np.searchsorted(edges, values, side="right")
+    return (
+        np.bincount(bins, minlength=len(edges) + 1),
+        np.bincount(bins, weights=values, minlength=len(edges) + 1),
+    )
+
+
+def binned_cdf_integrals(edges: np.ndarray, counts: np.ndarray, sums: np.ndarray) -> np.ndarray:
+    """
+    integral of the empirical CDF F over every bin of histogram_counts, computed exactly
+    from the number and the sum of the values of the bin:
+    the integral of F over [a, b) is F(a) * (b - a) + sum(b - x for x in [a, b)) / n.
+    The unbounded first and last bins give the integral of F below edges[0] and of F - 1
+    above edges[-1]
+    """
+    n = counts.sum()
+    below = np.concatenate([[0.0], np.cumsum(counts)[:-1]]) / n
+    integrals = np.empty(len(counts))
+    integrals[0] = (edges[0] * counts[0] - sums[0]) / n
+    integrals[1:-1] = below[1:-1] * np.diff(edges) + (edges[1:] * counts[1:-1] - sums[1:-1]) / n
+    integrals[-1] = (edges[-1] * counts[-1] - sums[-1]) / n
+    return integrals
+
+
+class DriftMonitor:
+    """
+    Compare new data against a ReferenceProfile: update() bins every batch of new data
+    into the reference bins and result() tests the accumulated counts, so a stream of
+    serving traffic is checked batch by batch without keeping its rows.
+
+    Numerical columns are tested with the normed Wasserstein distance estimated from the
+    binned CDFs (the CDFs are interpolated linearly inside a bin), the other columns with
+    the Jensen-Shannon distance of their value frequencies: the tests DataDriftDetector
+    picks for large reference data, with the same thresholds.
+    """
+
+    def __init__(self, profile: ReferenceProfile, drift_share: float = 0.5):
+        self.profile = profile
+        self.drift_share = drift_share
+        self.n_rows = 0
+        self.statistics = {}
+        for column, reference in profile.columns.items():
+            statistics = {"n_missing": 0}
+            if "edges" in reference:
+                statistics["counts"] = np.zeros(len(reference["edges"]) + 1, dtype=np.int64)
+                statistics["sums"] = np.zeros(len(reference["edges"]) + 1)
+            else:
+                statistics["value_counts"] = {}
+            self.statistics[column] = statistics
+
+    def update(self, dataframe: DataFrame) -> None:
+        try:
+            missing_columns = [column for column in self.statistics if column not in dataframe.columns]
+            if missing_columns:
+                raise ValueError(f"Columns {missing_columns} are missing in the current dataset")
+            self.n_rows += len(dataframe)
+            for column, statistics in self.statistics.items():
+                reference = self.profile.columns[column]
+                series = dataframe[column]
+                if reference["column_type"] == "num":
+                    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                    finite = np.isfinite(values)
+                    statistics["n_missing"] += len(values) - int(np.count_nonzero(finite))
+                    values = values[finite]
+                    if "edges" in reference:
+                        counts, sums = histogram_counts(values, np.asarray(reference["edges"]))
+                        statistics["counts"] += counts
+                        statistics["sums"] += sums
+                        continue
+                    counts = pd.Series(values).value_counts()
+                else:
+                    statistics["n_missing"] += int(series.isna().sum())
+                    counts = series.dropna().astype(str).value_counts()
+                value_counts = statistics["value_counts"]
+                for value, count in counts.items():
+                    value_counts[value] = value_counts.get(value, 0) + int(count)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    @staticmethod
+    def _histogram_drift(reference: dict, statistics: dict) -> dict:
+        edges = np.asarray(reference["edges"])
+        reference_counts = np.asarray(reference["counts"], dtype=np.float64)
+        current_counts = statistics["counts"].astype(np.float64)
+        # |integral of Fr - Fc| per bin is the Wasserstein distance over the bin unless
+        # the CDFs cross inside it, the bins are reference quantiles so they are narrow
+        wasserstein = np.sum(
+            np.abs(
+                binned_cdf_integrals(edges, reference_counts, np.asarray(reference["sums"]))
+                - binned_cdf_integrals(edges, current_counts, statistics["sums"])
+            )
+        )
+        wasserstein_norm = wasserstein / max(reference["std"], MIN_NORMALIZATION_STD)
+
+        reference_percents = reference_counts / reference_counts.sum()
+        current_percents = current_counts / current_counts.sum()
+        # share of values below every edge
+        cdf_difference = np.abs(
+            np.cumsum(reference_percents)[: len(edges)] - np.cumsum(current_percents)[: len(edges)]
+        )
+        reference_percents = np.maximum(reference_percents, PSI_MIN_PERCENT)
+        current_percents = np.maximum(current_percents, PSI_MIN_PERCENT)
+        return {
+            "ks_statistic": float(cdf_difference.max()),
+            "wasserstein_distance_norm": float(wasserstein_norm),
+            "psi": float(
+                np.sum((current_percents - reference_percents) * np.log(current_percents / reference_percents))
+            ),
+            "stattest_name": "wasserstein",
+            "drift_score": float(wasserstein_norm),
+            "drift_detected": bool(wasserstein_norm >= DISTANCE_THRESHOLD),
+        }
+
+    @staticmethod
+    def _frequency_drift(reference: dict, statistics: dict) -> dict:
+        reference_counts = dict(zip(reference["values"], reference["counts"]))
+        current_counts = statistics["value_counts"]
+        keys = list(set(reference_counts) | set(current_counts))
+        reference_frequencies = np.array([reference_counts.get(key, 0) for key in keys], dtype=np.float64)
+        current_frequencies = np.array([current_counts.get(key, 0) for key in keys], dtype=np.float64)
+        js_distance = distance.jensenshannon(
+            reference_frequencies / reference_frequencies.sum(),
+            current_frequencies / current_frequencies.sum(),
+        )
+        return {
+            "stattest_name": "jensenshannon",
+            "drift_score": float(js_distance),
+            "drift_detected": bool(js_distance >= DISTANCE_THRESHOLD),
+        }
+
+    def result(self) -> dict:
+        """
+        return: dict with number_of_columns, number_of_drifted_columns,
+        share_of_drifted_columns, dataset_drift and the per column drift_by_columns,
+        like DataDriftDetector.run
+        """
+        try:
+            drift_by_columns = {}
+            for column, statistics in self.statistics.items():
+                reference = self.profile.columns[column]
+                drift = {
+                    "column_type": reference["column_type"],
+                    "reference_null_ratio": reference["null_ratio"],
+                    "null_ratio": statistics["n_missing"] / self.n_rows if self.n_rows else 0.0,
+                }
+                n_current = self.n_rows - statistics["n_missing"]
+                if reference["count"] == 0 or n_current == 0:
+                    logging.warning(f"Column [{column}] is empty, skipping its drift test")
+                    drift.update(stattest_name=None, drift_score=None, drift_detected=False)
+                elif "edges" in reference:
+                    drift.update(self._histogram_drift(reference, statistics))
+                else:
+                    drift.update(self._frequency_drift(reference, statistics))
+                drift_by_columns[column] = drift
+
+            n_drifted_columns = sum(drift["drift_detected"] for drift in drift_by_columns.values())
+            share_of_drifted_columns = (
+                n_drifted_columns / len(drift_by_columns) if drift_by_columns else 0.0
+            )
+            return {
+                "number_of_columns": len(drift_by_columns),
+                "number_of_drifted_columns": n_drifted_columns,
+                "share_of_drifted_columns": share_of_drifted_columns,
+                "dataset_drift": bool(drift_by_columns) and share_of_drifted_columns >= self.drift_share,
+                "drift_by_columns": drift_by_columns,
+            }
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+
+def compact_drift_report(drift_result: dict, **summary) -> dict:
+    """
+    compact drift report of a DataDriftDetector result or of an evidently DataDriftTable result:
+        summary: the dataset level fields of drift_result and the keyword arguments
+        columns: the per column results as a table stored column-wise ({field: [value of
+            every column]}, pd.DataFrame(report["columns"]) loads it), only the scalar and
+            interval fields are kept, nested fields like the evidently histograms are dropped
+    """
+    rows = [
+        {
+            "column": column,
+            **{
+                field: value
+                for field, value in drift.items()
+                if not isinstance(value, dict) and field != "column_name"
+            },
+        }
+        for column, drift in drift_result["drift_by_columns"].items()
+    ]
+    fields = list(dict.fromkeys(field for row in rows for field in row))
+    return {
+        "summary": {
+            **{
+                field: value
+                for field, value in drift_result.items()
+                if not isinstance(value, (dict, list))
+            },
+            **summary,
+        },
+        "columns": {field: [row.get(field) for row in rows] for field in fields},
+    }
+
+
+def load_drift_history(
+    artifact_dir: str = ARTIFACT_DIR, columns: Optional[List[str]] = None
+) -> Tuple[DataFrame, DataFrame]:
+    """
+    drift reports of every artifact_dir/<timestamp> run, oldest first:
+        a summary table with one row per run (run, run_time and the summary fields)
+        a column table with one row per run and column (run, run_time and the column
+        fields), restricted to columns when given
+    e.g. the drift score of a column over time:
+        summary, drift = load_drift_history()
+        drift.pivot(index="run_time", columns="column", values="drift_score")
+    """
+    try:
+        report_pattern = os.path.join(
+            artifact_dir,
+            "*",
+            DATA_VALIDATION_DIR_NAME,
+            DATA_VALIDATION_DRIFT_REPORT_DIR,
+            DATA_VALIDATION_DRIFT_REPORT_FILE_NAME,
+        )
+        summaries, column_tables = [], []
+        for file_path in glob.glob(report_pattern):
+            run = os.path.relpath(file_path, artifact_dir).split(os.sep)[0]
+            report = read_json_file(file_path)
+            summaries.append({"run": run, **report["summary"]})
+            column_table = pd.DataFrame(report["columns"])
+            if columns is not None:
+                column_table = column_table[column_table["column"].isin(columns)]
+            column_tables.append(column_table.assign(run=run))
+
+        summary = pd.DataFrame(summaries) if summaries else pd.DataFrame(columns=["run"])
+        drift = (
+            pd.concat(column_tables, ignore_index=True)
+            if column_tables
+            else pd.DataFrame(columns=["column", "run"])
+        )
+        run_times = pd.to_datetime(summary["run"], format=ARTIFACT_TIMESTAMP_FORMAT, errors="coerce")
+        summary.insert(1, "run_time", run_times)
+        drift.insert(0, "run_time", drift["run"].map(dict(zip(summary["run"], run_times))))
+        drift.insert(0, "run", drift.pop("run"))
+        order = ["run_time", "run"]
+        return (
+            summary.sort_values(order, ignore_index=True),
+            drift.sort_values(order, kind="stable", ignore_index=True),
+        )
+    except Exception as e:
+        raise SensorFaultException(e, sys)
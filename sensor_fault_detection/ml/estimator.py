@@ -1,37 +1,141 @@
 import sys
+from typing import Optional
 
+import numpy as np
 from pandas import DataFrame
 from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import RobustScaler
 
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
+from sensor_fault_detection.ml.feature_pruning import ColumnSelector, get_input_columns
+from sensor_fault_detection.ml.schema_validation import SchemaValidator
+
+
+class CompiledPreprocessor:
+    """
+    Fitted SimpleImputer + RobustScaler pipeline reduced to its fill, center and scale
+    vectors and the feature columns it was fitted on. transform gathers the feature
+    columns into one float32 array and imputes and scales it in place, with the same
+    operations (float64 vectors, float32 result) as the pipeline, so its output is the
+    pipeline output on the float32 features, bit for bit, without the sklearn validation
+    and intermediate copies.
+    """
+
+    def __init__(
+        self,
+        columns: Optional[np.ndarray],
+        fill: np.ndarray,
+        center: Optional[np.ndarray],
+        scale: Optional[np.ndarray],
+    ):
+        """
+        :param columns: feature names in the fitted order, None for a pipeline fitted on arrays
+        :param fill: (features,) value replacing the missing values of every feature
+        :param center: (features,) value subtracted from every feature, None for no centering
+        :param scale: (features,) value dividing every feature, None for no scaling
+        """
+        self.columns = columns
+        self.fill = fill.reshape(1, -1)
+        self.center = center
+        self.scale = scale
+
+    @classmethod
+    def from_pipeline(cls, preprocessor: Pipeline) -> Optional["CompiledPreprocessor"]:
+        """
+        compiled form of a fitted SimpleImputer + RobustScaler pipeline, optionally pruned
+        (led by a ColumnSelector), None for any other preprocessor, which then has to be
+        applied as it is
+        """
+        steps = [step for _, step in getattr(preprocessor, "steps", [])]
+        if steps and isinstance(steps[0], ColumnSelector):
+            steps = steps[1:]
+        if (
+            len(steps) != 2
+            or type(steps[0]) is not SimpleImputer
+            or type(steps[1]) is not RobustScaler
+            or steps[0].add_indicator
+            or not (isinstance(steps[0].missing_values, float) and np.isnan(steps[0].missing_values))
+            or len(steps[0].statistics_) != steps[1].n_features_in_
+        ):
+            return None
+        imputer, scaler = steps
+        return cls(
+            columns=getattr(imputer, "feature_names_in_", None),
+            fill=np.asarray(imputer.statistics_, dtype=np.float32),
+            center=scaler.center_,
+            scale=scaler.scale_,
+        )
+
+    def transform(self, dataframe: DataFrame) -> np.ndarray:
+        if self.columns is None:
+            x = dataframe.to_numpy(dtype=np.float32, copy=True)
+        else:
+            positions = dataframe.columns.get_indexer(self.columns)
+            if (positions < 0).any():
+                missing = [str(c) for c, p in zip(self.columns, positions) if p < 0]
+                raise KeyError(f"Missing feature columns: {missing}")
+            if len(positions) == dataframe.shape[1] and (np.diff(positions) == 1).all():
+                x = dataframe.to_numpy(dtype=np.float32, copy=True)
+            else:
+                x = dataframe.iloc[:, positions].to_numpy(dtype=np.float32, copy=True)
+        np.copyto(x, self.fill, where=np.isnan(x))
+        if self.center is not None:
+            x -= self.center
+        if self.scale is not None:
+            x /= self.scale
+        return x
+
 
 class SensorFaultModel:
 
     def __init__(
             self,
             preprocessing_object: ColumnTransformer,
-            trained_model_object: object
+            trained_model_object: object,
+            schema_validator: Optional[SchemaValidator] = None,
     ):
         """
         :param preprocessing_object: Input Object of preprocessor
         :param trained_model_object: Input object of trained model
+        :param schema_validator: validator of the serving batches, None to predict without
+            validating them
         """
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self.schema_validator = schema_validator
+        self.compiled_preprocessor = CompiledPreprocessor.from_pipeline(preprocessing_object)
+        # the only columns predict reads, the ones kept by the feature pruning
+        self.feature_columns = get_input_columns(preprocessing_object)
 
     def predict(self, dataframe: DataFrame) -> DataFrame:
         """ 
         Function accepts raw inputs and then transformed raw input using preprocessing_object
         which guarantees that the inputs are in the same format as the training data
         At last if performs prediction on transformed features.
+        The compiled preprocessor is used when there is one, models saved before it existed
+        fall back to preprocessing_object.
+        A model saved with a schema validator checks the batch against the schema first and
+        raises on the first invalid batch instead of predicting on it.
         """
         logging.info("Entered predict method of HeartStrokeModel class")
 
         try:
+            schema_validator = getattr(self, "schema_validator", None)
+            if schema_validator is not None:
+                report = schema_validator.validate(dataframe, serving=True)
+                if not report["validation_status"]:
+                    raise ValueError(f"Invalid prediction batch: {report['errors']}")
+
             logging.info("Using the trained model to get predictions")
 
-            transformed_feature = self.preprocessing_object.transform(dataframe)
+            compiled_preprocessor = getattr(self, "compiled_preprocessor", None)
+            if compiled_preprocessor is not None:
+                transformed_feature = compiled_preprocessor.transform(dataframe)
+            else:
+                transformed_feature = self.preprocessing_object.transform(dataframe)
 
             logging.info("Used the trained model to get predictions")
             return self.trained_model_object.predict(transformed_feature)
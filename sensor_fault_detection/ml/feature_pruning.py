@@ -0,0 +1,252 @@
+import sys
+from copy import deepcopy
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.ensemble import ExtraTreesClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import RobustScaler
+
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.logger import logging
+from sensor_fault_detection.ml.sampling import stratified_sample_indices
+
+# rows per batch of the column statistics
+STATISTICS_BATCH_SIZE = 20000
+# rows, stratified by class, the importance model is fitted on
+IMPORTANCE_SAMPLE_SIZE = 50000
+
+
+class ColumnSelector(BaseEstimator, TransformerMixin):
+    """
+    first step of a pruned preprocessor: keeps the columns of the input frame, in this order
+    """
+
+    def __init__(self, columns: Optional[List[str]] = None):
+        self.columns = columns
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        return X[list(self.columns)]
+
+    def __sklearn_is_fitted__(self) -> bool:
+        return True
+
+
+def get_input_columns(preprocessor: Pipeline) -> Optional[List[str]]:
+    """
+    columns a fitted preprocessor reads from its input frame, None when it was fitted on arrays
+    """
+    steps = getattr(preprocessor, "steps", [])
+    if steps and isinstance(steps[0][1], ColumnSelector):
+        return list(steps[0][1].columns)
+    columns = getattr(preprocessor, "feature_names_in_", None)
+    return None if columns is None else list(columns)
+
+
+def get_imputed_positions(imputer: SimpleImputer) -> np.ndarray:
+    """
+    positions of the input columns a fitted SimpleImputer outputs: unless keep_empty_features
+    is set it skips the columns without any observed value, their statistic is missing
+    """
+    return np.flatnonzero(~pd.isna(imputer.statistics_))
+
+
+def get_output_columns(preprocessor: Pipeline) -> Optional[List[str]]:
+    """
+    columns of the features a fitted SimpleImputer + RobustScaler pipeline (optionally pruned)
+    outputs, in order, None when it was fitted on arrays
+    """
+    columns = get_input_columns(preprocessor)
+    imputer = next((step for _, step in preprocessor.steps if isinstance(step, SimpleImputer)), None)
+    if columns is None or imputer is None:
+        return columns
+    return [columns[position] for position in get_imputed_positions(imputer)]
+
+
+def column_statistics(
+    x: np.ndarray, batch_size: int = STATISTICS_BATCH_SIZE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    variance and correlation matrix of the columns of a (rows, columns) array, accumulated in
+    float64 batch_size rows at a time, so that a memory mapped array is read once and never
+    copied whole. The columns are shifted by their first row: a constant column has a variance
+    of exactly 0 and a correlation of 0 with every column
+    """
+    shift = np.asarray(x[0], dtype=np.float64)
+    sums = np.zeros(x.shape[1])
+    products = np.zeros((x.shape[1], x.shape[1]))
+    for start in range(0, len(x), batch_size):
+        batch = np.asarray(x[start: start + batch_size], dtype=np.float64) - shift
+        sums += batch.sum(axis=0)
+        products += batch.T @ batch
+    means = sums / len(x)
+    covariance = products / len(x) - np.outer(means, means)
+    variance = np.maximum(np.diag(covariance), 0.0)
+    deviation = np.sqrt(variance)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / np.outer(deviation, deviation)
+    correlation[~np.isfinite(correlation)] = 0.0
+    return variance, correlation
+
+
+class FeaturePruner:
+    """
+    Select the feature columns worth training on, criteria applied in this order:
+        missing ratio   columns with more than max_missing_ratio missing values in the raw data,
+                        and the columns without any observed value, which the imputer skips
+        variance        columns whose transformed values have a variance of at most min_variance
+        correlation     columns whose absolute correlation with an earlier kept column is above
+                        max_correlation, the earlier column carries the same information
+        importance      when importance_top_k > 0, the importance_top_k remaining columns with the
+                        highest extra trees impurity importance, fitted on a stratified sample
+    The missing ratio only needs the raw data: select_missing_ratio applies it to the column
+    names before the preprocessor is fitted, fit then applies the other criteria to the
+    transformed features. fit records in report the kept columns and, per criterion, the
+    dropped columns with the value they were dropped for.
+    """
+
+    def __init__(
+        self,
+        max_missing_ratio: float = 0.7,
+        min_variance: float = 0.0,
+        max_correlation: float = 0.99,
+        importance_top_k: int = 0,
+        batch_size: int = STATISTICS_BATCH_SIZE,
+        random_state: int = 42,
+        n_jobs: int = -1,
+    ):
+        self.max_missing_ratio = max_missing_ratio
+        self.min_variance = min_variance
+        self.max_correlation = max_correlation
+        self.importance_top_k = importance_top_k
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.missing_ratio_dropped = {}
+        self.report = {}
+
+    def get_missing_ratio_dropped(self, missing_ratios: pd.Series) -> pd.Series:
+        return missing_ratios[(missing_ratios > self.max_missing_ratio) | (missing_ratios >= 1.0)]
+
+    def select_missing_ratio(self, missing_ratios: pd.Series) -> List[str]:
+        """
+        names of the columns of missing_ratios (the missing value ratios of the raw features,
+        indexed by name) kept by the missing ratio criterion, in order
+        """
+        dropped = self.get_missing_ratio_dropped(missing_ratios)
+        self.missing_ratio_dropped = {str(name): float(ratio) for name, ratio in dropped.items()}
+        return [name for name in missing_ratios.index if name not in dropped.index]
+
+    def fit(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        columns: List[str],
+        missing_ratios: Optional[pd.Series] = None,
+    ) -> np.ndarray:
+        """
+        sorted positions of the kept columns of the transformed features x (named columns),
+        missing_ratios are the missing value ratios of the raw features, indexed by name, None
+        when select_missing_ratio already selected the columns x was transformed from
+        """
+        try:
+            columns = list(columns)
+            dropped = {
+                "missing_ratio": dict(self.missing_ratio_dropped),
+                "variance": {},
+                "correlation": {},
+                "importance": {},
+            }
+            kept = np.ones(len(columns), dtype=bool)
+            if missing_ratios is not None:
+                ratios = missing_ratios.reindex(columns).fillna(0.0)
+                ratio_dropped = self.get_missing_ratio_dropped(ratios)
+                for name, ratio in ratio_dropped.items():
+                    dropped["missing_ratio"][name] = float(ratio)
+                kept = ~ratios.index.isin(ratio_dropped.index)
+
+            variance, correlation = column_statistics(x, self.batch_size)
+            for position in np.flatnonzero(kept & (variance <= self.min_variance)):
+                dropped["variance"][columns[position]] = float(variance[position])
+                kept[position] = False
+
+            kept_positions = []
+            for position in np.flatnonzero(kept):
+                correlations = np.abs(correlation[position, kept_positions])
+                if len(kept_positions) and correlations.max() > self.max_correlation:
+                    twin = kept_positions[int(np.argmax(correlations))]
+                    dropped["correlation"][columns[position]] = [
+                        columns[twin],
+                        float(correlation[position, twin]),
+                    ]
+                    kept[position] = False
+                else:
+                    kept_positions.append(position)
+
+            if 0 < self.importance_top_k < kept.sum():
+                positions = np.flatnonzero(kept)
+                rows = stratified_sample_indices(y, IMPORTANCE_SAMPLE_SIZE, self.random_state)
+                model = ExtraTreesClassifier(
+                    n_estimators=100,
+                    class_weight="balanced",
+                    random_state=self.random_state,
+                    n_jobs=self.n_jobs,
+                )
+                model.fit(np.asarray(x[rows])[:, positions], np.asarray(y)[rows])
+                order = np.argsort(-model.feature_importances_, kind="stable")
+                for index in order[self.importance_top_k:]:
+                    dropped["importance"][columns[positions[index]]] = float(
+                        model.feature_importances_[index]
+                    )
+                    kept[positions[index]] = False
+
+            kept_positions = np.flatnonzero(kept)
+            self.report = {
+                "n_columns": len(columns) + len(self.missing_ratio_dropped),
+                "n_kept_columns": len(kept_positions),
+                "kept_columns": [columns[position] for position in kept_positions],
+                "dropped_columns": dropped,
+            }
+            logging.info(
+                f"Kept {len(kept_positions)} of {self.report['n_columns']} feature columns, dropped "
+                f"{ {criterion: len(names) for criterion, names in dropped.items()} }"
+            )
+            return kept_positions
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+
+def prune_preprocessor(preprocessor: Pipeline, positions: np.ndarray) -> Pipeline:
+    """
+    copy of a SimpleImputer + RobustScaler pipeline fitted on a frame, restricted to its output
+    columns at positions: both steps work column by column, so their fitted vectors are sliced
+    instead of refitted, and a ColumnSelector in front picks the kept columns of the input
+    frame. The imputer vectors are indexed by input column, the positions are mapped back
+    through the columns it outputs
+    """
+    try:
+        positions = np.asarray(positions, dtype=np.int64)
+        imputer = preprocessor.steps[0][1]
+        input_positions = get_imputed_positions(imputer)[positions]
+        steps = []
+        for name, step in preprocessor.steps:
+            if type(step) not in (SimpleImputer, RobustScaler) or getattr(step, "add_indicator", False):
+                raise ValueError(f"Cannot prune the columns of the {type(step).__name__} step [{name}]")
+            step_positions = input_positions if isinstance(step, SimpleImputer) else positions
+            step = deepcopy(step)
+            for attribute in ("statistics_", "center_", "scale_", "feature_names_in_"):
+                value = getattr(step, attribute, None)
+                if isinstance(value, np.ndarray):
+                    setattr(step, attribute, value[step_positions])
+            step.n_features_in_ = len(positions)
+            steps.append((name, step))
+        columns = imputer.feature_names_in_[input_positions].tolist()
+        return Pipeline(steps=[("selector", ColumnSelector(columns))] + steps)
+    except Exception as e:
+        raise SensorFaultException(e, sys)
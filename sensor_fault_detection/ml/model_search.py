@@ -0,0 +1,438 @@
+import os
+import sys
+import time
+from itertools import islice
+from multiprocessing import get_all_start_methods, get_context
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from neuro_mf import GridSearchedBestModel, InitializedModelDetail
+from sklearn.base import clone
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold
+from threadpoolctl import threadpool_limits
+
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.logger import logging
+from sensor_fault_detection.ml.resampling import Resampler
+from sensor_fault_detection.ml.sampling import stratified_sample_indices
+
+SEARCH_STRATEGIES = ("grid", "halving", "random")
+
+
+def get_process_context(preload: List[str] = ()):
+    """
+    start method of the fit processes: the search runs next to the threads of the other
+    stages of the pipeline, and a forked copy of a process with threads can deadlock on a
+    lock one of them held. forkserver forks every fit from a server started clean, with this
+    module and the preload modules (the modules of the models) imported once when the server
+    starts, spawn is the fallback where there is no forkserver
+    """
+    if "forkserver" in get_all_start_methods():
+        context = get_context("forkserver")
+        context.set_forkserver_preload([__name__, *preload])
+        return context
+    return get_context("spawn")
+
+
+def resolve_n_jobs(n_jobs: int) -> int:
+    """number of processes for n_jobs, negative values count back from the number of cpus"""
+    cpu_count = os.cpu_count() or 1
+    return max(1, n_jobs if n_jobs > 0 else cpu_count + 1 + n_jobs)
+
+
+def _fit_and_score(
+    connection, estimator, x_file_path, y_file_path, cv, fold, scoring, n_samples, resampler
+):
+    """
+    process target: fit a candidate on the training part of fold of a StratifiedKFold(cv) split
+    of the memory mapped training set, or of its stratified sample of n_samples rows when
+    n_samples is set, and score it on the held out part. With a resampler only the training
+    part is resampled, the held out part keeps the real rows and class balance. The score, fit
+    and score seconds (or the error message) are sent on connection. The sample and the split
+    are recomputed from the target instead of being sent, they are deterministic
+    """
+    try:
+        with threadpool_limits(limits=1):
+            x = np.load(x_file_path, mmap_mode="r")
+            y = np.load(y_file_path, mmap_mode="r")
+            if n_samples is not None and n_samples < len(y):
+                rows = stratified_sample_indices(y, n_samples, seed=0)
+                x, y = x[rows], y[rows]
+            train, test = next(islice(StratifiedKFold(cv).split(np.zeros(len(y)), y), fold, None))
+            x_train, y_train = x[train], y[train]
+            if resampler is not None:
+                x_train, y_train = resampler.fit_resample(x_train, y_train)
+            start = time.perf_counter()
+            estimator.fit(x_train, y_train)
+            fit_time = time.perf_counter() - start
+            start = time.perf_counter()
+            score = check_scoring(estimator, scoring=scoring)(estimator, x[test], y[test])
+            score_time = time.perf_counter() - start
+        connection.send((float(score), fit_time, score_time))
+    except Exception as e:
+        connection.send(f"{type(e).__name__}: {e}")
+    finally:
+        connection.close()
+
+
+class ModelSearch:
+    """
+    Parameter search of the models of neuro_mf.ModelFactory, scored by StratifiedKFold(cv)
+    cross validation like its GridSearchCV, with one of SEARCH_STRATEGIES:
+        grid        every candidate (model and parameters) of the grids
+        random      n_iter candidates drawn from the grid of every model
+        halving     successive halving: every candidate of a model is scored with a small
+                    amount of resource, only the best 1 / factor of them go on to the next round
+                    with factor times more, up to the whole resource in the last round. The
+                    resource is the number of training rows (stratified samples) or, for the
+                    models that have it, the model parameter named by resource (e.g.
+                    n_estimators), which then leaves the grid and takes its largest grid value
+                    in the last round
+    The models given a Resampler have the training part of every fold resampled, never the held
+    out part, so that no synthetic row is scored and the scores of every model are taken on the
+    same real rows. Every fit of a candidate on a fold runs in its own process (get_process_context), n_jobs at
+    a time, on the memory mapped training set files, the candidates of a round of every model
+    run together. Each process is limited to one BLAS / OpenMP thread and the candidates with
+    an n_jobs parameter run with n_jobs=1, so that n_jobs processes use n_jobs cores. A fit
+    running longer than candidate_time_budget seconds is killed and its candidate dropped.
+    results gets one entry per candidate and round with its fold scores and fit and score
+    times.
+    """
+
+    def __init__(
+        self,
+        strategy: str = "grid",
+        cv: int = 2,
+        scoring: Optional[str] = None,
+        n_jobs: int = -1,
+        candidate_time_budget: Optional[float] = None,
+        factor: int = 3,
+        resource: str = "n_samples",
+        n_iter: int = 10,
+        random_state: int = 42,
+    ):
+        if strategy not in SEARCH_STRATEGIES:
+            raise ValueError(
+                f"Unknown search strategy [{strategy}], expected one of {SEARCH_STRATEGIES}"
+            )
+        self.strategy = strategy
+        self.cv = cv
+        self.scoring = scoring
+        self.n_jobs = resolve_n_jobs(n_jobs)
+        self.candidate_time_budget = candidate_time_budget
+        self.factor = factor
+        self.resource = resource
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.results = []
+
+    def _add_candidate(
+        self,
+        initialized_model: InitializedModelDetail,
+        parameters: dict,
+        round_number: int = 0,
+        n_samples: Optional[int] = None,
+    ) -> dict:
+        candidate = {
+            "model_serial_number": initialized_model.model_serial_number,
+            "model_name": initialized_model.model_name,
+            "parameters": parameters,
+            "round": round_number,
+            "n_samples": n_samples,
+            "scores": [None] * self.cv,
+            "fit_time": [None] * self.cv,
+            "score_time": [None] * self.cv,
+            "status": "ok",
+        }
+        self.results.append(candidate)
+        return candidate
+
+    def _evaluate(
+        self,
+        initialized_model_list: List[InitializedModelDetail],
+        candidates: List[dict],
+        file_paths: Dict[str, Tuple[str, str]],
+        resamplers: Dict[str, Resampler],
+    ) -> None:
+        """
+        fit and score every candidate on every fold, n_jobs processes at a time, the fold
+        scores and times, the status and the mean_score are recorded in the candidates
+        """
+        models = {
+            initialized_model.model_serial_number: initialized_model.model
+            for initialized_model in initialized_model_list
+        }
+        context = get_process_context(
+            sorted({type(model).__module__ for model in models.values()})
+        )
+        tasks = [(candidate, fold) for candidate in candidates for fold in range(self.cv)]
+        start = time.perf_counter()
+        running, done, pending = {}, 0, list(reversed(tasks))
+        while pending or running:
+            while pending and len(running) < self.n_jobs:
+                candidate, fold = pending.pop()
+                if candidate["status"] != "ok":
+                    done += 1
+                    continue
+                estimator = clone(models[candidate["model_serial_number"]])
+                estimator.set_params(**candidate["parameters"])
+                if "n_jobs" in estimator.get_params():
+                    estimator.set_params(n_jobs=1)
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(
+                    target=_fit_and_score,
+                    args=(
+                        sender,
+                        estimator,
+                        *file_paths[candidate["model_serial_number"]],
+                        self.cv,
+                        fold,
+                        self.scoring,
+                        candidate["n_samples"],
+                        resamplers.get(candidate["model_serial_number"]),
+                    ),
+                    daemon=True,
+                )
+                process.start()
+                sender.close()
+                running[receiver] = (process, candidate, fold, time.perf_counter())
+
+            if not running:
+                continue
+            timeout = None
+            if self.candidate_time_budget is not None:
+                timeout = max(
+                    0.0,
+                    min(started for _, _, _, started in running.values())
+                    + self.candidate_time_budget
+                    - time.perf_counter(),
+                )
+            ready = wait(list(running), timeout=timeout)
+
+            for receiver in list(running):
+                process, candidate, fold, started = running[receiver]
+                if receiver in ready:
+                    try:
+                        message = receiver.recv()
+                    except EOFError:
+                        process.join()
+                        message = f"process exited with code {process.exitcode}"
+                elif (
+                    self.candidate_time_budget is not None
+                    and time.perf_counter() - started >= self.candidate_time_budget
+                ):
+                    process.kill()
+                    message = None
+                else:
+                    continue
+                process.join()
+                receiver.close()
+                del running[receiver]
+                done += 1
+
+                if message is None:
+                    candidate["status"] = "timeout"
+                    outcome = f"killed after {self.candidate_time_budget}s"
+                elif isinstance(message, str):
+                    candidate["status"] = "error"
+                    candidate["error"] = message
+                    outcome = f"failed: {message}"
+                else:
+                    score, fit_time, score_time = message
+                    candidate["scores"][fold] = score
+                    candidate["fit_time"][fold] = fit_time
+                    candidate["score_time"][fold] = score_time
+                    outcome = f"score {score:.4f}, fit {fit_time:.2f}s, score {score_time:.2f}s"
+                rows = "" if candidate["n_samples"] is None else f" on {candidate['n_samples']} rows"
+                logging.info(
+                    f"[{done}/{len(tasks)} {time.perf_counter() - start:.1f}s] "
+                    f"{candidate['model_name']} {candidate['parameters']}{rows} "
+                    f"fold {fold}: {outcome}"
+                )
+
+        for candidate in candidates:
+            if candidate["status"] == "ok":
+                candidate["mean_score"] = float(np.mean(candidate["scores"]))
+
+    def _halving_schedule(
+        self, initialized_model: InitializedModelDetail, y: np.ndarray
+    ) -> Tuple[Optional[str], List[dict], List[int]]:
+        """
+        parameter resource (None for rows), first round candidates and resources of every
+        round of a model: with n candidates there are 1 + floor(log_factor(n)) rounds and the
+        resources grow by factor up to the whole resource in the last one
+        """
+        grid = dict(initialized_model.param_grid_search)
+        if self.resource != "n_samples" and self.resource in initialized_model.model.get_params():
+            parameter = self.resource
+            values = grid.pop(parameter, [getattr(initialized_model.model, parameter)])
+            max_resources = int(max(values))
+            min_resources = 1
+        else:
+            parameter = None
+            max_resources = len(y)
+            # every class in every fold, like HalvingGridSearchCV
+            min_resources = 2 * self.cv * len(np.unique(y))
+        candidates = list(ParameterGrid(grid))
+        n_rounds = 1 + int(np.floor(np.log(len(candidates)) / np.log(self.factor) + 1e-9))
+        resources = [
+            max(min_resources, int(max_resources / self.factor ** (n_rounds - 1 - round_number)))
+            for round_number in range(n_rounds)
+        ]
+        return parameter, candidates, resources
+
+    def search(
+        self,
+        initialized_model_list: List[InitializedModelDetail],
+        x_file_path: str,
+        y_file_path: str,
+        data_file_paths: Optional[Dict[str, Tuple[str, str]]] = None,
+        resamplers: Optional[Dict[str, Resampler]] = None,
+    ) -> List[GridSearchedBestModel]:
+        """
+        best parameters and cross validation score of every model with at least one candidate
+        fitted within the budget on every fold (of the last round for halving), the best_model
+        of each is unfitted. The models are fitted on the .npy training set x_file_path and
+        y_file_path, or on the one of data_file_paths for the model serial numbers it has, with
+        the training part of every fold resampled by the Resampler of resamplers for the model
+        serial numbers it has
+        """
+        try:
+            self.results = []
+            resamplers = resamplers or {}
+            file_paths = {
+                initialized_model.model_serial_number: (data_file_paths or {}).get(
+                    initialized_model.model_serial_number, (x_file_path, y_file_path)
+                )
+                for initialized_model in initialized_model_list
+            }
+            start = time.perf_counter()
+            if self.strategy == "halving":
+                schedules = {}
+                for initialized_model in initialized_model_list:
+                    y = np.load(file_paths[initialized_model.model_serial_number][1], mmap_mode="r")
+                    parameter, parameters_list, resources = self._halving_schedule(
+                        initialized_model, y
+                    )
+                    schedules[initialized_model.model_serial_number] = (
+                        initialized_model,
+                        parameter,
+                        parameters_list,
+                        resources,
+                    )
+                # the rounds of every model are aligned on the last one, which runs every
+                # model on the whole resource together
+                n_rounds = max(len(schedule[3]) for schedule in schedules.values())
+                final_candidates = {}
+                for round_number in range(n_rounds):
+                    candidates = []
+                    for serial_number, schedule in schedules.items():
+                        initialized_model, parameter, parameters_list, resources = schedule
+                        model_round = round_number - (n_rounds - len(resources))
+                        if model_round < 0 or not parameters_list:
+                            continue
+                        for parameters in parameters_list:
+                            if parameter is None:
+                                n_samples = resources[model_round]
+                            else:
+                                parameters, n_samples = (
+                                    {**parameters, parameter: resources[model_round]},
+                                    None,
+                                )
+                            candidates.append(
+                                self._add_candidate(
+                                    initialized_model, parameters, round_number, n_samples
+                                )
+                            )
+                    logging.info(
+                        f"Halving round {round_number}: {len(candidates)} candidates x "
+                        f"{self.cv} folds on {self.n_jobs} processes"
+                    )
+                    self._evaluate(initialized_model_list, candidates, file_paths, resamplers)
+
+                    for serial_number, schedule in schedules.items():
+                        initialized_model, parameter, parameters_list, resources = schedule
+                        if round_number < n_rounds - len(resources) or not parameters_list:
+                            continue
+                        scored = [
+                            candidate
+                            for candidate in candidates
+                            if candidate["model_serial_number"] == serial_number
+                            and candidate["status"] == "ok"
+                        ]
+                        if round_number == n_rounds - 1 or not scored:
+                            final_candidates[serial_number] = scored
+                            parameters_list = []
+                        else:
+                            scored.sort(key=lambda candidate: -candidate["mean_score"])
+                            kept = scored[: int(np.ceil(len(scored) / self.factor))]
+                            parameters_list = [
+                                {
+                                    name: value
+                                    for name, value in candidate["parameters"].items()
+                                    if name != parameter
+                                }
+                                for candidate in kept
+                            ]
+                        schedules[serial_number] = (
+                            initialized_model,
+                            parameter,
+                            parameters_list,
+                            resources,
+                        )
+                final_candidates = [
+                    candidate for scored in final_candidates.values() for candidate in scored
+                ]
+            else:
+                for initialized_model in initialized_model_list:
+                    if self.strategy == "random":
+                        parameters_list = ParameterSampler(
+                            initialized_model.param_grid_search,
+                            n_iter=min(
+                                self.n_iter, len(ParameterGrid(initialized_model.param_grid_search))
+                            ),
+                            random_state=self.random_state,
+                        )
+                    else:
+                        parameters_list = ParameterGrid(initialized_model.param_grid_search)
+                    for parameters in parameters_list:
+                        self._add_candidate(initialized_model, parameters)
+                logging.info(
+                    f"Searching {len(self.results)} candidates ({self.strategy}) x {self.cv} "
+                    f"folds on {self.n_jobs} processes"
+                )
+                self._evaluate(initialized_model_list, self.results, file_paths, resamplers)
+                final_candidates = [
+                    candidate for candidate in self.results if candidate["status"] == "ok"
+                ]
+
+            best_models = {}
+            for candidate in final_candidates:
+                best = best_models.get(candidate["model_serial_number"])
+                if best is None or candidate["mean_score"] > best["mean_score"]:
+                    best_models[candidate["model_serial_number"]] = candidate
+            logging.info(
+                f"Searched {len(self.results)} candidates ({self.strategy}) "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+
+            grid_searched_best_model_list = []
+            for initialized_model in initialized_model_list:
+                best = best_models.get(initialized_model.model_serial_number)
+                if best is None:
+                    logging.info(f"No candidate of {initialized_model.model_name} was fitted")
+                    continue
+                grid_searched_best_model_list.append(
+                    GridSearchedBestModel(
+                        model_serial_number=initialized_model.model_serial_number,
+                        model=initialized_model.model,
+                        best_model=clone(initialized_model.model).set_params(**best["parameters"]),
+                        best_parameters=best["parameters"],
+                        best_score=best["mean_score"],
+                    )
+                )
+            return grid_searched_best_model_list
+        except Exception as e:
+            raise SensorFaultException(e, sys)
@@ -0,0 +1,139 @@
+import sys
+import time
+from typing import Tuple
+
+import numpy as np
+from imblearn.combine import SMOTETomek
+from imblearn.over_sampling import SMOTE
+
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.logger import logging
+
+RESAMPLING_STRATEGIES = ("smote_tomek", "smote", "smote_batched", "class_weight")
+
+
+def batched_nearest_neighbors(x: np.ndarray, k: int, batch_size: int) -> np.ndarray:
+    """
+    (rows, k) positions of the k nearest other rows of every row of x, unordered. The squared
+    euclidean distances are computed batch_size rows at a time as |a|^2 - 2 a.b + |b|^2 with one
+    float32 matrix product per batch, so the memory stays bounded by batch_size * rows
+    """
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    squared_norms = np.einsum("ij,ij->i", x, x)
+    neighbors = np.empty((len(x), k), dtype=np.int64)
+    for start in range(0, len(x), batch_size):
+        stop = min(start + batch_size, len(x))
+        distances = squared_norms[start:stop, None] - 2 * (x[start:stop] @ x.T)
+        distances += squared_norms[None, :]
+        # a row is not its own neighbour
+        distances[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        neighbors[start:stop] = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return neighbors
+
+
+def smote_batched(
+    x: np.ndarray, y: np.ndarray, k_neighbors: int, batch_size: int, random_state: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    SMOTE of the minority class up to the size of the majority class: every synthetic row lies
+    at a random point between a random minority row and one of its k_neighbors nearest minority
+    rows. The neighbours are searched among the minority rows only with
+    batched_nearest_neighbors and the synthetic rows are written straight into the output array
+    """
+    classes, counts = np.unique(y, return_counts=True)
+    minority = classes[np.argmin(counts)]
+    n_synthetic = int(counts.max() - counts.min())
+    x_minority = np.ascontiguousarray(x[y == minority], dtype=np.float32)
+    k = min(k_neighbors, len(x_minority) - 1)
+    if n_synthetic == 0 or k < 1:
+        return x, y
+
+    neighbors = batched_nearest_neighbors(x_minority, k, batch_size)
+    rng = np.random.default_rng(random_state)
+    x_resampled = np.empty((len(x) + n_synthetic, x.shape[1]), dtype=np.float32)
+    x_resampled[: len(x)] = x
+    for start in range(0, n_synthetic, batch_size):
+        stop = min(start + batch_size, n_synthetic)
+        base = rng.integers(0, len(x_minority), stop - start)
+        neighbor = neighbors[base, rng.integers(0, k, stop - start)]
+        gap = rng.random((stop - start, 1), dtype=np.float32)
+        x_resampled[len(x) + start: len(x) + stop] = x_minority[base] + gap * (
+            x_minority[neighbor] - x_minority[base]
+        )
+    y_resampled = np.concatenate([y, np.full(n_synthetic, minority, dtype=y.dtype)])
+    return x_resampled, y_resampled
+
+
+class Resampler:
+    """
+    Balance the classes of a training set with one of RESAMPLING_STRATEGIES:
+        smote_tomek     SMOTE then removal of the Tomek links, the link search is an exact
+                        nearest neighbour search over every row of the matrix
+        smote           imblearn SMOTE, the neighbours are searched among the minority rows only
+        smote_batched   SMOTE with a batched float32 neighbour search (smote_batched)
+        class_weight    no resampling, the models weight the classes instead
+    fit_resample records in report the wall time and the class counts.
+    """
+
+    def __init__(
+        self,
+        strategy: str = "smote_tomek",
+        k_neighbors: int = 5,
+        batch_size: int = 4096,
+        random_state: int = 42,
+        n_jobs: int = -1,
+    ):
+        if strategy not in RESAMPLING_STRATEGIES:
+            raise ValueError(
+                f"Unknown resampling strategy [{strategy}], expected one of {RESAMPLING_STRATEGIES}"
+            )
+        self.strategy = strategy
+        self.k_neighbors = k_neighbors
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.report = {}
+
+    def _resample(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.strategy == "class_weight":
+            return x, y
+        if self.strategy == "smote_batched":
+            return smote_batched(x, y, self.k_neighbors, self.batch_size, self.random_state)
+        smote = SMOTE(
+            sampling_strategy="minority",
+            k_neighbors=self.k_neighbors,
+            random_state=self.random_state,
+        )
+        if self.strategy == "smote":
+            return smote.fit_resample(x, y)
+        return SMOTETomek(
+            smote=smote,
+            random_state=self.random_state,
+            sampling_strategy="minority",
+            n_jobs=self.n_jobs,
+        ).fit_resample(x, y)
+
+    def fit_resample(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        resampled features and target, report gets the strategy, seconds and the class counts
+        before and after
+        """
+        try:
+            start = time.perf_counter()
+            x_resampled, y_resampled = self._resample(x, y)
+            seconds = time.perf_counter() - start
+
+            classes, counts = np.unique(y, return_counts=True)
+            resampled_classes, resampled_counts = np.unique(y_resampled, return_counts=True)
+            self.report = {
+                "strategy": self.strategy,
+                "seconds": seconds,
+                "class_counts": dict(zip(classes.tolist(), counts.tolist())),
+                "resampled_class_counts": dict(
+                    zip(resampled_classes.tolist(), resampled_counts.tolist())
+                ),
+            }
+            logging.info(f"Resampling report: {self.report}")
+            return x_resampled, y_resampled
+        except Exception as e:
+            raise SensorFaultException(e, sys)
@@ -0,0 +1,256 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from scipy import stats
+from scipy.spatial import distance
+
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.ml.drift import (
+    DISTANCE_THRESHOLD,
+    MIN_NORMALIZATION_STD,
+)
+
+BOOTSTRAP_ROUNDS = 30
+CONFIDENCE_LEVEL = 0.95
+# resolution of the train test split by row hash, the test ratio is rounded to 1 / HASH_SPLIT_BUCKETS
+HASH_SPLIT_BUCKETS = 10000
+
+
+def wilson_interval(
+    successes: np.ndarray, n: np.ndarray, confidence: float = CONFIDENCE_LEVEL
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wilson score interval of the proportion successes / n, it keeps a sensible width for
+    proportions close to 0 or 1 (e.g. null rates) where the normal approximation collapses.
+    An empty sample gives [0, 1]
+    """
+    successes = np.asarray(successes, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    z = stats.norm.ppf(0.5 + confidence / 2)
+    safe_n = np.maximum(n, 1.0)
+    proportion = successes / safe_n
+    denominator = 1 + z ** 2 / safe_n
+    center = (proportion + z ** 2 / (2 * safe_n)) / denominator
+    half_width = (
+        z * np.sqrt(proportion * (1 - proportion) / safe_n + z ** 2 / (4 * safe_n ** 2)) / denominator
+    )
+    low = np.where(n > 0, np.clip(center - half_width, 0.0, 1.0), 0.0)
+    high = np.where(n > 0, np.clip(center + half_width, 0.0, 1.0), 1.0)
+    return low, high
+
+
+def hash_split_mask(
+    hashes: np.ndarray, test_ratio: float, n_buckets: int = HASH_SPLIT_BUCKETS
+) -> np.ndarray:
+    """
+    True for the rows of the test set: a row goes to the test set when its hash falls in the
+    first test_ratio of the hash space. The assignment only depends on the row itself, not on
+    the other rows, so a row keeps its set when rows are added, and every class sends
+    test_ratio of its rows to the test set up to sampling noise
+    """
+    return np.asarray(hashes, dtype=np.uint64) % np.uint64(n_buckets) < np.uint64(
+        round(test_ratio * n_buckets)
+    )
+
+
+def stratified_sample_indices(labels: np.ndarray, sample_size: int, seed: int) -> np.ndarray:
+    """
+    sorted positions of a random sample of about sample_size rows where every label keeps
+    its share of the rows (and at least one row), all the positions when there are no more
+    than sample_size rows
+    """
+    if sample_size >= len(labels):
+        return np.arange(len(labels))
+    rng = np.random.default_rng(seed)
+    _, inverse, label_counts = np.unique(
+        np.asarray(labels).astype(str), return_inverse=True, return_counts=True
+    )
+    allocations = np.minimum(
+        np.maximum(np.round(label_counts * sample_size / len(labels)).astype(np.int64), 1),
+        label_counts,
+    )
+    positions = [
+        rng.choice(np.flatnonzero(inverse == label), size=allocation, replace=False)
+        for label, allocation in enumerate(allocations)
+    ]
+    return np.sort(np.concatenate(positions))
+
+
+def bootstrap_weights(
+    n_rows: int, n_rounds: int, resample: bool, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    (n_rounds, n_rows) Poisson(1) bootstrap weights of the rows of a sample, all ones for a
+    sample that holds the full data and is not resampled
+    """
+    if not resample:
+        return np.ones((n_rounds, n_rows))
+    return rng.poisson(1.0, size=(n_rounds, n_rows)).astype(np.float64)
+
+
+def bootstrap_numerical_drift(
+    reference: np.ndarray,
+    current: np.ndarray,
+    reference_weights: np.ndarray,
+    current_weights: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    KS statistic and normed Wasserstein distance of the bootstrap replicates of one column,
+    reference and current hold its finite values and *_weights their (n_rounds, values)
+    bootstrap weights.
+
+    Poisson bootstrap: a replicate weights every value by a Poisson(1) count instead of
+    drawing the values again, so the merge order of the two sorted samples is shared by all
+    the replicates and each one only costs a weighted cumulative sum (see
+    numerical_drift_statistics for the statistics)
+    """
+    reference_order = np.argsort(reference, kind="stable")
+    current_order = np.argsort(current, kind="stable")
+    reference, reference_weights = reference[reference_order], reference_weights[:, reference_order]
+    current, current_weights = current[current_order], current_weights[:, current_order]
+    reference_positions = np.arange(len(reference)) + np.searchsorted(current, reference, side="left")
+    current_positions = np.arange(len(current)) + np.searchsorted(reference, current, side="right")
+    merged = np.empty(len(reference) + len(current))
+    merged[reference_positions] = reference
+    merged[current_positions] = current
+    gaps = np.diff(merged)
+
+    reference_totals = np.maximum(reference_weights.sum(axis=1), 1.0)
+    current_totals = np.maximum(current_weights.sum(axis=1), 1.0)
+    steps = np.empty((len(reference_weights), len(merged)))
+    steps[:, reference_positions] = reference_weights / reference_totals[:, None]
+    steps[:, current_positions] = -current_weights / current_totals[:, None]
+    cdf_difference = np.abs(np.cumsum(steps, axis=1)[:, :-1])
+
+    ks_statistics = np.max(cdf_difference[:, gaps > 0], axis=1, initial=0.0)
+    # weighted std around the sample mean, centered first to keep the precision
+    centered = reference - reference.mean()
+    mean = reference_weights @ centered / reference_totals
+    variance = np.maximum(reference_weights @ centered ** 2 / reference_totals - mean ** 2, 0.0)
+    wasserstein_distances = cdf_difference @ gaps / np.maximum(
+        np.sqrt(variance), MIN_NORMALIZATION_STD
+    )
+    return ks_statistics, wasserstein_distances
+
+
+def bootstrap_frequency_drift(
+    reference: pd.Series,
+    current: pd.Series,
+    reference_weights: np.ndarray,
+    current_weights: np.ndarray,
+) -> np.ndarray:
+    """
+    Jensen-Shannon distance of the bootstrap replicates of one column, the value counts of
+    a replicate are the sums of the weights of the values
+    """
+    codes, uniques = pd.factorize(pd.concat([reference, current], ignore_index=True))
+    reference_codes, current_codes = codes[: len(reference)], codes[len(reference):]
+    reference_counts = np.stack(
+        [reference_weights[:, reference_codes == code].sum(axis=1) for code in range(len(uniques))],
+        axis=1,
+    )
+    current_counts = np.stack(
+        [current_weights[:, current_codes == code].sum(axis=1) for code in range(len(uniques))],
+        axis=1,
+    )
+    # jensenshannon normalizes the counts of every replicate
+    return distance.jensenshannon(reference_counts, current_counts, axis=1)
+
+
+def bootstrap_interval(
+    estimate: float, replicates: np.ndarray, confidence: float
+) -> Tuple[float, float]:
+    """
+    bias corrected normal bootstrap interval, estimate - bias +/- z * standard error where
+    bias is the mean of the replicates minus the estimate, floored at 0. Distances measured
+    on samples are biased upwards by the sampling noise and the replicates are biased the same
+    way around the estimate, so the correction removes that bias instead of doubling it like
+    the percentile interval. Mean and standard error need far fewer replicates than tail
+    quantiles.
+    """
+    z = float(stats.norm.ppf(0.5 + confidence / 2))
+    center = 2 * estimate - float(np.mean(replicates))
+    half_width = z * float(np.std(replicates, ddof=1)) if len(replicates) > 1 else 0.0
+    return max(center - half_width, 0.0), max(center + half_width, 0.0)
+
+
+def add_drift_intervals(
+    reference_df: DataFrame,
+    current_df: DataFrame,
+    drift_by_columns: Dict[str, dict],
+    n_rounds: int = BOOTSTRAP_ROUNDS,
+    confidence: float = CONFIDENCE_LEVEL,
+    seed: int = 42,
+    resample_reference: bool = True,
+    resample_current: bool = True,
+    n_jobs: int = 1,
+) -> Dict[str, dict]:
+    """
+    add to the DataDriftDetector results drift_by_columns of samples of the reference and
+    current data the bootstrap interval of the drift score (drift_score_interval)
+    and, for the Wasserstein tested columns, the asymptotic KS p-value of the samples and
+    its interval. A column is inconclusive when the interval of its distance contains the
+    drift threshold, so that the samples cannot tell on which side of it the full data
+    falls. Columns tested with a p-value (samples of at most SMALL_SAMPLE_SIZE values) get
+    no interval.
+
+    A replicate resamples whole rows, the same weights are used for every column. A side
+    holding the full data (resample_reference, resample_current False) is kept as is in
+    every replicate, when neither is resampled no column is inconclusive. The columns run
+    on n_jobs threads.
+    """
+    try:
+        rng = np.random.default_rng(seed)
+        reference_row_weights = bootstrap_weights(len(reference_df), n_rounds, resample_reference, rng)
+        current_row_weights = bootstrap_weights(len(current_df), n_rounds, resample_current, rng)
+
+        def add_column_interval(column: str) -> None:
+            drift = drift_by_columns[column]
+            if drift["stattest_name"] not in ("wasserstein", "jensenshannon"):
+                drift["inconclusive"] = False
+                return
+            reference, current = reference_df[column], current_df[column]
+            if pd.api.types.is_float_dtype(reference.dtype):
+                reference_mask = np.isfinite(reference.to_numpy())
+                current_mask = np.isfinite(current.to_numpy())
+            else:
+                reference_mask = reference.notna().to_numpy()
+                current_mask = current.notna().to_numpy()
+            reference, current = reference[reference_mask], current[current_mask]
+            reference_weights = reference_row_weights[:, reference_mask]
+            current_weights = current_row_weights[:, current_mask]
+
+            if drift["stattest_name"] == "wasserstein":
+                ks_statistics, scores = bootstrap_numerical_drift(
+                    reference.to_numpy(dtype=np.float64),
+                    current.to_numpy(dtype=np.float64),
+                    reference_weights,
+                    current_weights,
+                )
+                effective_size = np.sqrt(len(reference) * len(current) / (len(reference) + len(current)))
+                ks_low, ks_high = bootstrap_interval(
+                    drift["ks_statistic"], ks_statistics, confidence
+                )
+                drift["ks_p_value"] = float(stats.kstwobign.sf(drift["ks_statistic"] * effective_size))
+                # the p-value decreases with the statistic
+                drift["ks_p_value_interval"] = [
+                    float(stats.kstwobign.sf(ks_high * effective_size)),
+                    float(stats.kstwobign.sf(ks_low * effective_size)),
+                ]
+            else:
+                scores = bootstrap_frequency_drift(
+                    reference, current, reference_weights, current_weights
+                )
+            low, high = bootstrap_interval(drift["drift_score"], scores, confidence)
+            drift["drift_score_interval"] = [low, high]
+            drift["inconclusive"] = bool(low < DISTANCE_THRESHOLD <= high)
+
+        with ThreadPoolExecutor(max_workers=max(n_jobs, 1)) as executor:
+            list(executor.map(add_column_interval, drift_by_columns))
+        return drift_by_columns
+    except Exception as e:
+        raise SensorFaultException(e, sys)
@@ -0,0 +1,283 @@
+import sys
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from sensor_fault_detection.constant.training_pipeline import SCHEMA_FILE_PATH
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.utils.main_utils import iter_dataframe_chunks, read_yaml_file
+
+
+class SchemaValidator:
+    """
+    Validate dataframes against the schema file: every column of the schema is checked for
+    presence, order, dtype, allowed range (min_value/max_value), allowed values and missing
+    ratio (max_missing_ratio). The constraints are read from the "validation" section of the
+    schema, feature_constraints apply to every feature column and column_constraints override
+    them for single columns.
+
+    The numerical columns of a chunk are checked together on one (rows, columns) array, so
+    the cost is a handful of vectorized reductions per chunk. Inputs larger than memory are
+    validated chunk by chunk (validate_chunks, validate_file), the counts add up across chunks.
+    A single serving batch is validated with validate(serving=True), SensorFaultModel.predict
+    does so when the model was saved with a validator.
+    """
+
+    def __init__(self, schema_config: dict):
+        """
+        :param schema_config: content of the schema file
+        """
+        try:
+            self.target_column = schema_config["target_column"]
+            self.dtypes = {
+                column.strip(): str(dtype) for column, dtype in schema_config["columns"].items()
+            }
+            self.required_columns = {
+                column.strip() for column in schema_config.get("required_columns", [])
+            }
+            self.required_columns.add(self.target_column)
+
+            validation_config = schema_config.get("validation") or {}
+            self.enforce_column_order = validation_config.get("enforce_column_order", False)
+            feature_constraints = validation_config.get("feature_constraints") or {}
+            column_constraints = validation_config.get("column_constraints") or {}
+            self.constraints = {}
+            for column in self.dtypes:
+                constraints = {} if column == self.target_column else dict(feature_constraints)
+                constraints.update(column_constraints.get(column) or {})
+                self.constraints[column] = constraints
+
+            self.numerical_columns = [
+                column
+                for column, dtype in self.dtypes.items()
+                if pd.api.types.is_numeric_dtype(np.dtype(dtype))
+            ]
+            self.categorical_columns = [
+                column for column in self.dtypes if column not in self.numerical_columns
+            ]
+            self.min_values = self._constraint_vector("min_value", -np.inf)
+            self.max_values = self._constraint_vector("max_value", np.inf)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    @classmethod
+    def from_schema_file(cls, schema_file_path: str = SCHEMA_FILE_PATH) -> "SchemaValidator":
+        return cls(read_yaml_file(schema_file_path))
+
+    def _constraint_vector(self, name: str, default: float) -> np.ndarray:
+        return np.array(
+            [self.constraints[column].get(name, default) for column in self.numerical_columns],
+            dtype=np.float64,
+        )
+
+    def validate(self, dataframe: DataFrame, serving: bool = False) -> dict:
+        """
+        validation report of a single dataframe, see validate_chunks
+        """
+        return self.validate_chunks([dataframe], serving=serving)
+
+    def validate_file(
+        self, file_path: str, chunk_size: int, columns: Optional[List[str]] = None
+    ) -> dict:
+        """
+        validation report of a csv, parquet or feather file read chunk_size rows at a time,
+        the values are checked as stored, before any schema dtype cast.
+        columns: only read and check these columns
+        """
+        return self.validate_chunks(iter_dataframe_chunks(file_path, chunk_size, columns=columns))
+
+    def validate_chunks(self, chunks: Iterable[DataFrame], serving: bool = False) -> dict:
+        """
+        validation report of the concatenation of chunks, which all have the columns of the
+        first one. A serving batch (serving) holds the features only: the target column is
+        not required and the missing ratios, which only mean something over a dataset, are
+        not checked:
+            validation_status: True when no check failed
+            errors: description of every failed check
+            n_rows, missing_columns, unexpected_columns, column_order_valid
+            columns: per schema column present in the data its observed dtype, number of
+                missing, invalid (not parsable or not allowed) and out of range values,
+                min/max for numerical columns, its errors and status
+        """
+        try:
+            columns: Optional[List[str]] = None
+            n_rows = 0
+            for chunk in chunks:
+                if columns is None:
+                    columns = [str(column) for column in chunk.columns]
+                    numerical_index = [
+                        index
+                        for index, column in enumerate(self.numerical_columns)
+                        if column in chunk.columns
+                    ]
+                    numerical_columns = [self.numerical_columns[i] for i in numerical_index]
+                    categorical_columns = [
+                        column for column in self.categorical_columns if column in chunk.columns
+                    ]
+                    min_values = self.min_values[numerical_index]
+                    max_values = self.max_values[numerical_index]
+                    observed_dtypes = dict(zip(columns, chunk.dtypes))
+                    counts = {
+                        name: np.zeros(len(numerical_columns), dtype=np.int64)
+                        for name in ("n_missing", "n_invalid", "n_infinite", "n_out_of_range")
+                    }
+                    minimums = np.full(len(numerical_columns), np.nan)
+                    maximums = np.full(len(numerical_columns), np.nan)
+                    categorical_counts = {
+                        column: {"n_missing": 0, "n_invalid": 0} for column in categorical_columns
+                    }
+                n_rows += len(chunk)
+                if len(chunk) == 0:
+                    continue
+
+                if numerical_columns:
+                    block = chunk[numerical_columns]
+                    unparsed = [
+                        index
+                        for index, dtype in enumerate(block.dtypes)
+                        if not pd.api.types.is_numeric_dtype(dtype)
+                    ]
+                    if unparsed:
+                        block = block.copy()
+                        for index in unparsed:
+                            column = numerical_columns[index]
+                            values = pd.to_numeric(block[column], errors="coerce")
+                            n_invalid = int((values.isna() & block[column].notna()).sum())
+                            counts["n_invalid"][index] += n_invalid
+                            # the unparsable values become NaN, they are not missing ones
+                            counts["n_missing"][index] -= n_invalid
+                            block[column] = values
+                    values = block.to_numpy(dtype=np.float64, na_value=np.nan)
+                    counts["n_missing"] += np.count_nonzero(np.isnan(values), axis=0)
+                    counts["n_infinite"] += np.count_nonzero(np.isinf(values), axis=0)
+                    counts["n_out_of_range"] += np.count_nonzero(
+                        (values < min_values) | (values > max_values), axis=0
+                    )
+                    # fmin/fmax skip NaNs, a column without any value stays NaN
+                    minimums = np.fmin(minimums, np.fmin.reduce(values, axis=0))
+                    maximums = np.fmax(maximums, np.fmax.reduce(values, axis=0))
+
+                for column in categorical_columns:
+                    series = chunk[column]
+                    missing = series.isna()
+                    categorical_counts[column]["n_missing"] += int(missing.sum())
+                    allowed_values = self.constraints[column].get("allowed_values")
+                    if allowed_values is not None:
+                        categorical_counts[column]["n_invalid"] += int(
+                            (~missing & ~series.isin(allowed_values)).sum()
+                        )
+
+            if columns is None:
+                columns = []
+                numerical_columns, categorical_columns = [], []
+
+            column_reports = {}
+            for index, column in enumerate(numerical_columns):
+                column_counts = {name: int(count[index]) for name, count in counts.items()}
+                column_reports[column] = self._column_report(
+                    column, observed_dtypes[column], n_rows, column_counts, serving
+                )
+                column_reports[column]["min"] = self._to_float(minimums[index])
+                column_reports[column]["max"] = self._to_float(maximums[index])
+            for column in categorical_columns:
+                column_reports[column] = self._column_report(
+                    column, observed_dtypes[column], n_rows, categorical_counts[column], serving
+                )
+            return self.dataset_report(columns, n_rows, column_reports, serving)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    @staticmethod
+    def _to_float(value: float) -> Optional[float]:
+        return None if np.isnan(value) else float(value)
+
+    def _column_report(
+        self,
+        column: str,
+        dtype: np.dtype,
+        n_rows: int,
+        counts: Dict[str, int],
+        serving: bool = False,
+    ) -> dict:
+        expected_dtype = self.dtypes[column]
+        constraints = self.constraints[column]
+        missing_ratio = counts["n_missing"] / n_rows if n_rows else 0.0
+        errors = []
+
+        if column in self.numerical_columns:
+            # object columns are parsed value by value, their unparsable values are n_invalid
+            if isinstance(dtype, np.dtype):
+                dtype_valid = dtype == object or np.can_cast(dtype, expected_dtype, "same_kind")
+            else:
+                dtype_valid = pd.api.types.is_numeric_dtype(dtype)
+            if not dtype_valid:
+                errors.append(f"dtype {dtype} cannot be cast to {expected_dtype}")
+            if counts["n_invalid"]:
+                errors.append(f"{counts['n_invalid']} values are not {expected_dtype}")
+            if counts["n_infinite"]:
+                errors.append(f"{counts['n_infinite']} infinite values")
+            if counts["n_out_of_range"]:
+                errors.append(
+                    f"{counts['n_out_of_range']} values outside "
+                    f"[{constraints.get('min_value', '-inf')}, {constraints.get('max_value', 'inf')}]"
+                )
+        elif counts["n_invalid"]:
+            errors.append(
+                f"{counts['n_invalid']} values not in {constraints.get('allowed_values')}"
+            )
+
+        max_missing_ratio = constraints.get("max_missing_ratio")
+        if not serving and max_missing_ratio is not None and missing_ratio > max_missing_ratio:
+            errors.append(f"missing ratio {missing_ratio:.4f} above {max_missing_ratio}")
+
+        return {
+            "dtype": str(dtype),
+            "expected_dtype": expected_dtype,
+            **counts,
+            "missing_ratio": missing_ratio,
+            "errors": errors,
+            "status": len(errors) == 0,
+        }
+
+    def dataset_report(
+        self,
+        columns: List[str],
+        n_rows: int,
+        column_reports: Dict[str, dict],
+        serving: bool = False,
+    ) -> dict:
+        """
+        validation report of a dataset with the given columns from the reports of its
+        schema columns, see validate_chunks
+        """
+        missing_columns = [column for column in self.dtypes if column not in columns]
+        unexpected_columns = [column for column in columns if column not in self.dtypes]
+        schema_order = [column for column in self.dtypes if column in columns]
+        column_order_valid = [column for column in columns if column in self.dtypes] == schema_order
+
+        errors = []
+        missing_required_columns = [
+            column
+            for column in missing_columns
+            if column in self.required_columns and not (serving and column == self.target_column)
+        ]
+        if missing_required_columns:
+            errors.append(f"missing required columns: {missing_required_columns}")
+        if unexpected_columns:
+            errors.append(f"columns not in the schema: {unexpected_columns}")
+        if self.enforce_column_order and not column_order_valid:
+            errors.append("columns are not in the schema order")
+        for column in schema_order:
+            errors.extend(f"{column}: {error}" for error in column_reports[column]["errors"])
+
+        return {
+            "validation_status": len(errors) == 0,
+            "errors": errors,
+            "n_rows": n_rows,
+            "missing_columns": missing_columns,
+            "unexpected_columns": unexpected_columns,
+            "column_order_valid": column_order_valid,
+            "columns": {column: column_reports[column] for column in schema_order},
+        }
@@ -0,0 +1,227 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Iterable, Iterator
+
+import numpy as np
+from pandas import DataFrame
+from scipy import stats
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import RobustScaler
+
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.logger import logging
+
+# points kept per column by a QuantileSketch
+QUANTILE_SKETCH_SIZE = 2048
+
+
+class QuantileSketch:
+    """
+    Mergeable summary of the distribution of every column of (rows, columns) arrays without
+    missing values: per column, at most size sorted values each standing for a weight of rows.
+
+    A batch of n rows is summarized by its values at the ranks (i + 0.5) * n / size, and two
+    summaries are merged by sorting their weighted values together and keeping again size
+    equally spaced (by cumulative weight) values. A compaction moves the rank of any quantile
+    by at most total weight / size, so a sketch built by L levels of merges answers a quantile
+    query within (L + 1) * n / size ranks of the exact one. Batches of at most size rows are
+    kept exactly.
+    """
+
+    def __init__(self, values: np.ndarray, weights: np.ndarray):
+        """
+        :param values: (points, columns) values sorted in every column
+        :param weights: (points, columns) number of rows every value stands for
+        """
+        self.values = values
+        self.weights = weights
+
+    @property
+    def n_rows(self) -> float:
+        return float(self.weights[:, 0].sum()) if len(self.weights) else 0.0
+
+    @classmethod
+    def from_array(cls, x: np.ndarray, size: int = QUANTILE_SKETCH_SIZE) -> "QuantileSketch":
+        values = np.sort(np.asarray(x), axis=0)
+        n_rows = len(values)
+        if n_rows <= size:
+            return cls(values, np.ones(values.shape))
+        ranks = ((np.arange(size) + 0.5) * n_rows / size).astype(np.int64)
+        return cls(values[ranks], np.full((size, values.shape[1]), n_rows / size))
+
+    def merge(self, other: "QuantileSketch", size: int = QUANTILE_SKETCH_SIZE) -> "QuantileSketch":
+        values = np.concatenate([self.values, other.values])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(values, axis=0, kind="stable")
+        values = np.take_along_axis(values, order, axis=0)
+        weights = np.take_along_axis(weights, order, axis=0)
+        if len(values) <= size:
+            return QuantileSketch(values, weights)
+
+        total = weights[:, 0].sum()
+        targets = (np.arange(size) + 0.5) * total / size
+        cumulative_weights = np.cumsum(weights, axis=0)
+        positions = np.empty((size, values.shape[1]), dtype=np.int64)
+        for column in range(values.shape[1]):
+            positions[:, column] = np.searchsorted(cumulative_weights[:, column], targets)
+        positions = np.minimum(positions, len(values) - 1)
+        return QuantileSketch(
+            np.take_along_axis(values, positions, axis=0),
+            np.full((size, values.shape[1]), total / size),
+        )
+
+    def quantiles(self, q: Iterable[float]) -> np.ndarray:
+        """
+        (len(q), columns) estimated quantiles q (in [0, 1]) of every column: the value whose
+        weight covers the rank q * rows. Like the exact quantile, the estimate is a value of
+        the data, which keeps it exact on the ties of discrete sensor counts
+        """
+        q = np.asarray(list(q), dtype=np.float64)
+        cumulative_weights = np.cumsum(self.weights, axis=0)
+        result = np.empty((len(q), self.values.shape[1]))
+        for column in range(self.values.shape[1]):
+            positions = np.searchsorted(cumulative_weights[:, column], q * self.n_rows)
+            result[:, column] = self.values[np.minimum(positions, len(self.values) - 1), column]
+        return result
+
+
+def merge_sketches(
+    sketches: Iterable[QuantileSketch], size: int = QUANTILE_SKETCH_SIZE
+) -> QuantileSketch:
+    """
+    merge a stream of sketches like a binary counter: only sketches summarizing the same
+    number of batches are merged, so n batches take log2(n) levels of merges instead of n
+    and the rank error stays within (log2(n) + 1) * rows / size. At most log2(n) sketches are
+    held at a time
+    """
+    levels = {}
+    for sketch in sketches:
+        level = 0
+        while level in levels:
+            sketch = levels.pop(level).merge(sketch, size)
+            level += 1
+        levels[level] = sketch
+    merged = None
+    for level in sorted(levels):
+        merged = levels[level] if merged is None else merged.merge(levels[level], size)
+    return merged
+
+
+def fit_preprocessor_in_chunks(
+    preprocessor: Pipeline,
+    chunks: Iterable[DataFrame],
+    sketch_size: int = QUANTILE_SKETCH_SIZE,
+    n_jobs: int = 1,
+) -> Pipeline:
+    """
+    fit a SimpleImputer(strategy="constant") + RobustScaler pipeline on a stream of feature
+    chunks, without ever holding more than about n_jobs + 1 chunks. The imputer only learns
+    the columns and its constant, which the first chunk gives exactly. The scaler center and
+    scale are the quantiles of a QuantileSketch of the imputed chunks, the chunks are imputed
+    and summarized on n_jobs threads.
+    Returns the preprocessor, fitted in place, usable like one fitted in memory
+    """
+    try:
+        (_, imputer), (_, scaler) = preprocessor.steps
+        if not isinstance(imputer, SimpleImputer) or imputer.strategy != "constant":
+            raise ValueError("chunked fit needs a SimpleImputer with strategy='constant'")
+        if not isinstance(scaler, RobustScaler):
+            raise ValueError("chunked fit needs a RobustScaler as the last step")
+
+        chunks = iter(chunks)
+        first_chunk = next(chunks)
+        imputer.fit(first_chunk)
+
+        def summarize(chunk: DataFrame) -> QuantileSketch:
+            return QuantileSketch.from_array(imputer.transform(chunk), sketch_size)
+
+        def summarize_chunks(executor: ThreadPoolExecutor) -> Iterator[QuantileSketch]:
+            pending = deque()
+            for chunk in chain([first_chunk], chunks):
+                pending.append(executor.submit(summarize, chunk))
+                # a bounded number of chunks in flight keeps the memory bounded
+                while len(pending) > max(n_jobs, 1):
+                    yield pending.popleft().result()
+            for future in pending:
+                yield future.result()
+
+        with ThreadPoolExecutor(max_workers=max(n_jobs, 1)) as executor:
+            sketch = merge_sketches(summarize_chunks(executor), sketch_size)
+
+        # sets the fitted attributes, center and scale are then replaced by the streamed ones
+        scaler.fit(imputer.transform(first_chunk.iloc[:1]))
+        q_min, q_max = scaler.quantile_range
+        median, low, high = sketch.quantiles([0.5, q_min / 100, q_max / 100])
+        scaler.center_ = median if scaler.with_centering else None
+        if scaler.with_scaling:
+            scale = high - low
+            # same as RobustScaler: a constant column is not scaled
+            scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+            if scaler.unit_variance:
+                scale = scale / (stats.norm.ppf(q_max / 100) - stats.norm.ppf(q_min / 100))
+            scaler.scale_ = scale
+        else:
+            scaler.scale_ = None
+        logging.info(f"Fitted the preprocessor on {int(sketch.n_rows)} rows streamed in chunks")
+        return preprocessor
+    except Exception as e:
+        raise SensorFaultException(e, sys)
+
+
+def write_array_in_chunks(
+    chunks: Iterable[np.ndarray],
+    file_path: str,
+    n_rows: int,
+    n_columns: int,
+    dtype: np.dtype = np.float32,
+) -> np.memmap:
+    """
+    write a stream of (rows, n_columns) arrays holding n_rows rows in total into the dtype
+    .npy file file_path. The chunks are appended to a temporary file one after the other and
+    the file is renamed into place, so only one chunk is in memory, the written pages are not
+    mapped into the process and a memory map of the previous file stays valid.
+    Returns the file memory mapped read only
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    temporary_file_path = f"{file_path}.tmp"
+    offset = 0
+    with open(temporary_file_path, "wb") as file_obj:
+        np.lib.format.write_array_header_1_0(
+            file_obj,
+            {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                "fortran_order": False,
+                "shape": (n_rows, n_columns),
+            },
+        )
+        for chunk in chunks:
+            np.ascontiguousarray(chunk, dtype=dtype).tofile(file_obj)
+            offset += len(chunk)
+    if offset != n_rows:
+        os.remove(temporary_file_path)
+        raise ValueError(f"Wrote {offset} rows, expected {n_rows}")
+    os.replace(temporary_file_path, file_path)
+    return np.load(file_path, mmap_mode="r")
+
+
+def transform_in_chunks(
+    preprocessor: Pipeline, chunks: Iterable[DataFrame], file_path: str, n_rows: int
+) -> np.memmap:
+    """
+    transform a stream of feature chunks holding n_rows rows in total into the float32 .npy
+    file file_path with write_array_in_chunks.
+    Returns the file memory mapped read only
+    """
+    try:
+        return write_array_in_chunks(
+            (preprocessor.transform(chunk) for chunk in chunks),
+            file_path,
+            n_rows,
+            preprocessor.steps[-1][1].n_features_in_,
+        )
+    except Exception as e:
+        raise SensorFaultException(e, sys)
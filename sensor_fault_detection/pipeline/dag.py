@@ -0,0 +1,172 @@
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.logger import logging
+
+
+@dataclass
+class Stage:
+    """
+    a stage of the pipeline graph: run is called with the artifacts of the dependencies, in
+    the order of dependencies, and returns the artifact of the stage
+    """
+
+    name: str
+    run: Callable[..., Any]
+    dependencies: Tuple[str, ...] = ()
+
+
+class StageGraph:
+    """
+    Stages with explicit artifact dependencies, run on a pool of max_workers threads: a stage
+    starts as soon as all its dependencies have finished, so the stages that do not depend on
+    each other run at the same time. The heavy stages release the GIL (numpy, pandas, the
+    model search processes) or wait on I/O (mongodb, s3), which is why threads are enough.
+    When a stage fails no other stage is started, the running ones are waited for and the
+    first error is raised. After a run, report holds when every stage was ready (its
+    dependencies finished), started (got a thread) and ended, in seconds since the start of
+    the run, its slack and the critical path, the chain of stages each waiting on the one
+    before it that set the duration of the run.
+    """
+
+    def __init__(self, stages: List[Stage], max_workers: int = 4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max(max_workers, 1)
+        self.order = self.get_topological_order()
+        self.report = {}
+
+    def get_topological_order(self) -> List[str]:
+        """
+        stage names, every stage after its dependencies, in the order they were declared
+        otherwise
+        """
+        try:
+            order, visiting = [], set()
+
+            def visit(name: str):
+                if name in order:
+                    return
+                if name in visiting:
+                    raise ValueError(f"Stage [{name}] depends on itself")
+                visiting.add(name)
+                for dependency in self.stages[name].dependencies:
+                    if dependency not in self.stages:
+                        raise ValueError(f"Stage [{name}] depends on unknown stage [{dependency}]")
+                    visit(dependency)
+                visiting.discard(name)
+                order.append(name)
+
+            for name in self.stages:
+                visit(name)
+            return order
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        artifact of every stage, by stage name
+        """
+        try:
+            artifacts, timings, running, errors = {}, {}, {}, []
+            start = time.perf_counter()
+
+            def run_stage(stage: Stage, *dependency_artifacts):
+                # queued stages wait for a free thread, their start is when they get one
+                timings[stage.name]["start"] = time.perf_counter() - start
+                return stage.run(*dependency_artifacts)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while True:
+                    if not errors:
+                        for name in self.order:
+                            stage = self.stages[name]
+                            if name in timings or not all(
+                                dependency in artifacts for dependency in stage.dependencies
+                            ):
+                                continue
+                            logging.info(f"Stage [{name}] is ready")
+                            timings[name] = {"ready": time.perf_counter() - start}
+                            dependency_artifacts = [
+                                artifacts[dependency] for dependency in stage.dependencies
+                            ]
+                            running[executor.submit(run_stage, stage, *dependency_artifacts)] = name
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        timings[name]["end"] = time.perf_counter() - start
+                        try:
+                            artifacts[name] = future.result()
+                        except Exception as error:
+                            if not errors:
+                                logging.info(f"Stage [{name}] failed, no other stage is started")
+                                # the stages still waiting for a thread are dropped
+                                for queued in running:
+                                    queued.cancel()
+                            errors.append(error)
+            self.report = self.get_report(timings, time.perf_counter() - start)
+            if errors:
+                raise errors[0]
+            logging.info(
+                f"Ran {len(self.stages)} stages in {self.report['seconds']:.1f}s "
+                f"({self.report['stage_seconds']:.1f}s of stage work), critical path "
+                f"{' -> '.join(self.report['critical_path'])}"
+            )
+            return artifacts
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def get_report(self, timings: Dict[str, dict], seconds: float) -> dict:
+        """
+        timings of the finished stages, their slack, how much later each could have ended
+        without delaying the run, and the critical path, walked back from the stage that ended
+        last through the dependency each stage waited for last
+        """
+        stages = {}
+        for name, timing in timings.items():
+            if "start" not in timing or "end" not in timing:
+                continue
+            stages[name] = {
+                "ready": timing["ready"],
+                "start": timing["start"],
+                "end": timing["end"],
+                "seconds": timing["end"] - timing["start"],
+                "dependencies": list(self.stages[name].dependencies),
+            }
+        latest_end = {}
+        for name in reversed(self.order):
+            if name not in stages:
+                continue
+            latest_end[name] = min(
+                [
+                    latest_end[successor] - stages[successor]["seconds"]
+                    for successor in self.order
+                    if successor in stages and name in self.stages[successor].dependencies
+                ]
+                or [seconds]
+            )
+            stages[name]["slack"] = max(latest_end[name] - stages[name]["end"], 0.0)
+
+        critical_path = []
+        name = max(stages, key=lambda stage: stages[stage]["end"], default=None)
+        while name is not None:
+            critical_path.append(name)
+            name = max(
+                (dependency for dependency in stages[name]["dependencies"] if dependency in stages),
+                key=lambda stage: stages[stage]["end"],
+                default=None,
+            )
+        critical_path.reverse()
+        return {
+            "seconds": seconds,
+            "stage_seconds": sum(stage["seconds"] for stage in stages.values()),
+            "max_workers": self.max_workers,
+            "critical_path": critical_path,
+            "critical_path_seconds": sum(stages[name]["seconds"] for name in critical_path),
+            "stages": stages,
+        }
@@ -0,0 +1,136 @@
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, fields, is_dataclass
+from typing import Any, Optional
+
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.logger import logging
+from sensor_fault_detection.utils.main_utils import (
+    get_file_hash,
+    read_json_file,
+    write_json_file,
+)
+
+
+def get_file_fingerprint(file_path: str, checksum: bool = False) -> dict:
+    """
+    size and modification time of a file, or size and sha256 of its content with checksum,
+    slower on large files but unchanged when a file is rewritten with the same content
+    """
+    stat = os.stat(file_path)
+    if checksum:
+        return {"size": stat.st_size, "sha256": get_file_hash(file_path)}
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def describe(value: Any, checksum: bool = False) -> Any:
+    """
+    json description of a config, an artifact or an input of a stage: dataclasses, dicts and
+    sequences are described field by field and a path to an existing file by its fingerprint,
+    a path to a missing file stays a plain string
+    """
+    if is_dataclass(value):
+        return {
+            field.name: describe(getattr(value, field.name), checksum) for field in fields(value)
+        }
+    if isinstance(value, dict):
+        return {str(key): describe(item, checksum) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [describe(item, checksum) for item in value]
+    if isinstance(value, str) and os.path.isfile(value):
+        return {"path": value, **get_file_fingerprint(value, checksum)}
+    return value
+
+
+def artifact_from_dict(artifact_class: type, content: dict) -> Any:
+    """
+    artifact_class dataclass built from the fields of its json content, nested dataclasses
+    included
+    """
+    values = {}
+    for field in fields(artifact_class):
+        if field.name not in content:
+            continue
+        value = content[field.name]
+        if is_dataclass(field.type) and isinstance(value, dict):
+            value = artifact_from_dict(field.type, value)
+        values[field.name] = value
+    return artifact_class(**values)
+
+
+class StageManifest:
+    """
+    Manifest of every stage of a training run, manifest_dir/<stage>.json, written once the
+    stage succeeded: its config, the description of its inputs (upstream artifacts, files
+    and source fingerprints) and its artifact with the fingerprint of every output
+    file. A stage whose config and inputs have the same description and whose output files
+    are unchanged since is not run again, its artifact is read back from the manifest. A
+    stage run again rewrites its outputs, which changes the inputs of the stages after it.
+    """
+
+    def __init__(self, manifest_dir: str, checksum: bool = False):
+        self.manifest_dir = manifest_dir
+        self.checksum = checksum
+
+    def get_manifest_file_path(self, stage: str) -> str:
+        return os.path.join(self.manifest_dir, f"{stage}.json")
+
+    def get_fingerprint(self, config: Any, inputs: dict) -> dict:
+        """
+        the config is described by its values only, its paths include the outputs of the
+        stage, the files it reads (upstream artifacts, config files) are passed in inputs
+        """
+        return {
+            "config": json.loads(json.dumps(asdict(config), default=str)),
+            "inputs": describe(inputs, self.checksum),
+        }
+
+    def load(self, stage: str, artifact_class: type, fingerprint: dict) -> Optional[Any]:
+        """
+        artifact of the last successful run of stage when it can be reused, None when the stage
+        never succeeded, its config or inputs changed or one of its output files changed
+        """
+        try:
+            manifest_file_path = self.get_manifest_file_path(stage)
+            if not os.path.exists(manifest_file_path):
+                logging.info(f"Stage [{stage}] has no manifest, running it")
+                return None
+            manifest = read_json_file(manifest_file_path)
+            for key in ("config", "inputs"):
+                if manifest[key] != fingerprint[key]:
+                    changed = [
+                        name
+                        for name in sorted(set(manifest[key]) | set(fingerprint[key]))
+                        if manifest[key].get(name) != fingerprint[key].get(name)
+                    ]
+                    logging.info(f"Stage [{stage}] {key} changed {changed}, running it")
+                    return None
+            artifact = artifact_from_dict(artifact_class, manifest["artifact"])
+            if describe(artifact, self.checksum) != manifest["outputs"]:
+                logging.info(f"Stage [{stage}] outputs are missing or changed, running it")
+                return None
+            logging.info(
+                f"Stage [{stage}] unchanged since {manifest['finished_at']}, reused its artifact "
+                f"and skipped {manifest['seconds']:.1f}s of work"
+            )
+            return artifact
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def save(self, stage: str, fingerprint: dict, artifact: Any, seconds: float) -> None:
+        try:
+            write_json_file(
+                self.get_manifest_file_path(stage),
+                {
+                    "stage": stage,
+                    **fingerprint,
+                    "artifact": asdict(artifact),
+                    "outputs": describe(artifact, self.checksum),
+                    "seconds": seconds,
+                    "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                },
+            )
+        except Exception as e:
+            raise SensorFaultException(e, sys)
@@ -6,32 +6,92 @@ from sensor_fault_detection.components.model_trainer import ModelTrainer
 from sensor_fault_detection.components.model_evaluation import ModelEvaluation
 from sensor_fault_detection.components.model_pusher import ModelPusher
 
-from sensor_fault_detection.entity.config_entity import (DataIngestionConfig,
+from sensor_fault_detection.entity.config_entity import (TrainingPipelineConfig,
+                                                         DataIngestionConfig,
                                                          DataValidationConfig,
                                                          DataTransformationConfig,
                                                          ModelTrainerConfig,
                                                          ModelEvaluationConfig,
-                                                         ModelPusherConfig)
+                                                         ModelPusherConfig,
+                                                         rebase_config)
 
 from sensor_fault_detection.entity.artifact_entity import (DataIngestionArtifact,
+                                                           SchemaValidationArtifact,
                                                            DataValidationArtifact,
                                                            DataTransformationArtifact,
                                                            ModelTrainerArtifact,
+                                                           ProductionModelArtifact,
                                                            ModelEvaluationArtifact,
                                                            ModelPusherArtifact)
 
+from sensor_fault_detection.constant.training_pipeline import ARTIFACT_DIR, SCHEMA_FILE_PATH
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
+from sensor_fault_detection.pipeline.dag import Stage, StageGraph
+from sensor_fault_detection.pipeline.manifest import StageManifest
+from sensor_fault_detection.utils.main_utils import write_json_file
+from dataclasses import replace
+from typing import Any, Callable, Optional, Union
+import os
 import sys
+import time
 
 class TrainPipeline:
-    def __init__(self):
-        self.data_ingestion_config = DataIngestionConfig()
-        self.data_validation_config = DataValidationConfig()
-        self.data_transformation_config = DataTransformationConfig()
-        self.model_trainer_config = ModelTrainerConfig()
-        self.model_evaluation_config = ModelEvaluationConfig()
+    def __init__(self, run_name: Optional[str] = None):
+        """
+        :param run_name: artifact directory name of the run, ARTIFACT_DIR/<run_name>, a new
+            timestamped run when None. The stages of an earlier run of that name whose config,
+            inputs and outputs are unchanged are skipped, so a failed run is resumed from the
+            first stage that did not complete. Only a named run is resumed, a new run never
+            reuses the stages of an earlier one
+        """
+        self.training_pipeline_config = TrainingPipelineConfig()
+        if run_name is not None:
+            self.training_pipeline_config = replace(
+                rebase_config(self.training_pipeline_config, os.path.join(ARTIFACT_DIR, run_name)),
+                timestamp=run_name,
+            )
+        artifact_dir = self.training_pipeline_config.artifact_dir
+        self.data_ingestion_config = rebase_config(DataIngestionConfig(), artifact_dir)
+        self.data_validation_config = rebase_config(DataValidationConfig(), artifact_dir)
+        self.data_transformation_config = rebase_config(DataTransformationConfig(), artifact_dir)
+        self.model_trainer_config = rebase_config(ModelTrainerConfig(), artifact_dir)
+        self.model_evaluation_config = rebase_config(ModelEvaluationConfig(), artifact_dir)
         self.model_pusher_config = ModelPusherConfig()
+        self.stage_manifest = StageManifest(
+            manifest_dir=self.training_pipeline_config.manifest_dir,
+            checksum=self.training_pipeline_config.manifest_checksum,
+        )
+
+    def run_stage(
+        self,
+        stage: str,
+        config: Any,
+        inputs: dict,
+        artifact_class: type,
+        start_stage: Callable[[], Any],
+        record: bool = True,
+    ) -> Any:
+        """
+        This method of TrainPipeline class runs a stage unless its manifest shows the last run
+        of it is up to date, in which case its artifact is reused, and records its manifest.
+        A stage that is not recorded always runs, a stage returning None has no manifest
+        """
+        try:
+            fingerprint = self.stage_manifest.get_fingerprint(config, inputs)
+            artifact = (
+                self.stage_manifest.load(stage, artifact_class, fingerprint) if record else None
+            )
+            if artifact is None:
+                start = time.perf_counter()
+                artifact = start_stage()
+                seconds = time.perf_counter() - start
+                if record and artifact is not None:
+                    self.stage_manifest.save(stage, fingerprint, artifact, seconds)
+                logging.info(f"Stage [{stage}] completed in {seconds:.1f}s")
+            return artifact
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
     def start_data_ingestion(self) -> DataIngestionArtifact:
         """
@@ -81,10 +141,45 @@ class TrainPipeline:
         except Exception as e:
             raise SensorFaultException(e, sys)
         
+    def start_schema_validation(
+        self, data_ingestion_artifact: DataIngestionArtifact
+    ) -> SchemaValidationArtifact:
+        """
+        This method of TrainPipeline class is responsible for starting the schema validation of
+        the data validation component
+        """
+        try:
+            data_validation = DataValidation(
+                data_ingestion_artifact=data_ingestion_artifact,
+                data_validation_config=self.data_validation_config,
+            )
+            return data_validation.initiate_schema_validation()
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
+    def start_drift_detection(
+        self,
+        data_ingestion_artifact: DataIngestionArtifact,
+        schema_validation_artifact: SchemaValidationArtifact,
+    ) -> DataValidationArtifact:
+        """
+        This method of TrainPipeline class is responsible for starting the drift detection of
+        the data validation component
+        """
+        try:
+            data_validation = DataValidation(
+                data_ingestion_artifact=data_ingestion_artifact,
+                data_validation_config=self.data_validation_config,
+            )
+            # in sample mode the drift detection reads back the samples of the schema validation
+            return data_validation.initiate_drift_detection(schema_validation_artifact)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
     def start_data_transformation(
             self, 
             data_ingestion_artifact: DataIngestionArtifact,
-            data_validation_artifact: DataValidationArtifact,
+            data_validation_artifact: Union[DataValidationArtifact, SchemaValidationArtifact],
     ) -> DataTransformationArtifact:
         """
         This method of TrainPipeline class is responsible for starting data transformation
@@ -122,10 +217,21 @@ class TrainPipeline:
         except Exception as e:
             raise SensorFaultException(e, sys)
 
+    def start_production_model_fetch(self) -> ProductionModelArtifact:
+        """
+        This method of TrainPipeline class is responsible for fetching the production model the
+        model evaluation compares against
+        """
+        try:
+            return ModelEvaluation.fetch_production_model(self.model_evaluation_config)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
+
     def start_model_evaluation(
         self,
         data_ingestion_artifact: DataIngestionArtifact,
         model_trainer_artifact: ModelTrainerArtifact,
+        production_model_artifact: Optional[ProductionModelArtifact] = None,
     ) -> ModelEvaluationArtifact:
         """
         This method of TrainPipeline class is responsible for starting model evaluation component
@@ -135,6 +241,7 @@ class TrainPipeline:
                 model_eval_config=self.model_evaluation_config,
                 data_ingestion_artifact=data_ingestion_artifact,
                 model_trainer_artifact=model_trainer_artifact,
+                production_model_artifact=production_model_artifact,
             )
             model_evaluation_artifact = model_evaluation.initiate_model_evaluation()
             return model_evaluation_artifact
@@ -144,6 +251,7 @@ class TrainPipeline:
     def start_model_pusher(
             self,
             model_trainer_artifact: ModelTrainerArtifact,
+            data_validation_artifact: DataValidationArtifact = None,
     ):
         """ 
         This method of TrainPipeline class is responsible for starting model pusher component
@@ -151,39 +259,181 @@ class TrainPipeline:
         try:
             model_pusher = ModelPusher(
                 model_trainer_artifact=model_trainer_artifact,
-                model_pusher_config=self.model_pusher_config
+                model_pusher_config=self.model_pusher_config,
+                data_validation_artifact=data_validation_artifact,
             )
             model_pusher_artifact = model_pusher.initiate_model_pusher()
             return model_pusher_artifact
         except Exception as e:
             raise SensorFaultException(e, sys)
 
-    def run_pipeline(self) -> None:
+    def start_model_pusher_if_accepted(
+        self,
+        model_trainer_artifact: ModelTrainerArtifact,
+        data_validation_artifact: DataValidationArtifact,
+        model_evaluation_artifact: ModelEvaluationArtifact,
+    ) -> Optional[ModelPusherArtifact]:
+        """
+        This method of TrainPipeline class starts the model pusher component when the model
+        evaluation accepted the trained model
+        """
+        if not model_evaluation_artifact.is_model_accepted:
+            logging.info(f"Model not accepted.")
+            return None
+        return self.run_stage(
+            "model_pusher",
+            self.model_pusher_config,
+            {"model_trainer": model_trainer_artifact, "data_validation": data_validation_artifact},
+            ModelPusherArtifact,
+            lambda: self.start_model_pusher(
+                model_trainer_artifact=model_trainer_artifact,
+                data_validation_artifact=data_validation_artifact,
+            ),
+        )
+
+    def get_stage_graph(self) -> StageGraph:
+        """
+        This method of TrainPipeline class declares the stages of the pipeline and the artifacts
+        each depends on: the drift detection runs along the data transformation and the model
+        training, the production model is fetched from s3 while the new model is trained
+        """
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
-            data_validation_artifact = self.start_data_validation(
-                data_ingestion_artifact=data_ingestion_artifact
-            )
-            data_transformation_artifact = self.start_data_transformation(
-                data_ingestion_artifact=data_ingestion_artifact,
-                data_validation_artifact=data_validation_artifact
-            )
+            stages = [
+                Stage(
+                    "data_ingestion",
+                    lambda: self.run_stage(
+                        "data_ingestion",
+                        self.data_ingestion_config,
+                        {
+                            "source": DataIngestion(
+                                data_ingestion_config=self.data_ingestion_config
+                            ).get_source_fingerprint(),
+                        },
+                        DataIngestionArtifact,
+                        self.start_data_ingestion,
+                    ),
+                ),
+                Stage(
+                    "schema_validation",
+                    lambda data_ingestion_artifact: self.run_stage(
+                        "schema_validation",
+                        self.data_validation_config,
+                        {"data_ingestion": data_ingestion_artifact, "schema": SCHEMA_FILE_PATH},
+                        SchemaValidationArtifact,
+                        lambda: self.start_schema_validation(
+                            data_ingestion_artifact=data_ingestion_artifact
+                        ),
+                    ),
+                    ("data_ingestion",),
+                ),
+                Stage(
+                    "data_validation",
+                    lambda data_ingestion_artifact, schema_validation_artifact: self.run_stage(
+                        "data_validation",
+                        self.data_validation_config,
+                        {
+                            "data_ingestion": data_ingestion_artifact,
+                            "schema_validation": schema_validation_artifact,
+                        },
+                        DataValidationArtifact,
+                        lambda: self.start_drift_detection(
+                            data_ingestion_artifact=data_ingestion_artifact,
+                            schema_validation_artifact=schema_validation_artifact,
+                        ),
+                    ),
+                    ("data_ingestion", "schema_validation"),
+                ),
+                Stage(
+                    "data_transformation",
+                    lambda data_ingestion_artifact, schema_validation_artifact: self.run_stage(
+                        "data_transformation",
+                        self.data_transformation_config,
+                        {
+                            "data_ingestion": data_ingestion_artifact,
+                            "schema_validation": schema_validation_artifact,
+                            "schema": SCHEMA_FILE_PATH,
+                        },
+                        DataTransformationArtifact,
+                        lambda: self.start_data_transformation(
+                            data_ingestion_artifact=data_ingestion_artifact,
+                            data_validation_artifact=schema_validation_artifact,
+                        ),
+                    ),
+                    ("data_ingestion", "schema_validation"),
+                ),
+                Stage(
+                    "model_trainer",
+                    lambda data_transformation_artifact: self.run_stage(
+                        "model_trainer",
+                        self.model_trainer_config,
+                        {
+                            "data_transformation": data_transformation_artifact,
+                            "model_config": self.model_trainer_config.model_config_file_path,
+                        },
+                        ModelTrainerArtifact,
+                        lambda: self.start_model_trainer(
+                            data_transformation_artifact=data_transformation_artifact
+                        ),
+                    ),
+                    ("data_transformation",),
+                ),
+                # fetched on every run, the production model may have changed since
+                Stage(
+                    "production_model",
+                    lambda: self.run_stage(
+                        "production_model",
+                        self.model_evaluation_config,
+                        {},
+                        ProductionModelArtifact,
+                        self.start_production_model_fetch,
+                        record=False,
+                    ),
+                ),
+                Stage(
+                    "model_evaluation",
+                    lambda data_ingestion, model_trainer, production_model: self.run_stage(
+                        "model_evaluation",
+                        self.model_evaluation_config,
+                        {
+                            "data_ingestion": data_ingestion,
+                            "model_trainer": model_trainer,
+                            "production_model": production_model,
+                        },
+                        ModelEvaluationArtifact,
+                        lambda: self.start_model_evaluation(
+                            data_ingestion_artifact=data_ingestion,
+                            model_trainer_artifact=model_trainer,
+                            production_model_artifact=production_model,
+                        ),
+                    ),
+                    ("data_ingestion", "model_trainer", "production_model"),
+                ),
+                Stage(
+                    "model_pusher",
+                    self.start_model_pusher_if_accepted,
+                    ("model_trainer", "data_validation", "model_evaluation"),
+                ),
+            ]
+            return StageGraph(stages, max_workers=self.training_pipeline_config.max_workers)
+        except Exception as e:
+            raise SensorFaultException(e, sys)
 
-            model_trainer_artifact = self.start_model_trainer(
-                data_transformation_artifact=data_transformation_artifact
-            )
-            model_evaluation_artifact = self.start_model_evaluation(
-                data_ingestion_artifact=data_ingestion_artifact,
-                model_trainer_artifact=model_trainer_artifact
+    def run_pipeline(self) -> None:
+        try:
+            logging.info(
+                f"Running training pipeline in [{self.training_pipeline_config.artifact_dir}]"
             )
-            if not model_evaluation_artifact.is_model_accepted:
-                logging.info(f"Model not accepted.")
+            stage_graph = self.get_stage_graph()
+            try:
+                artifacts = stage_graph.run()
+            finally:
+                write_json_file(
+                    self.training_pipeline_config.pipeline_report_file_path, stage_graph.report
+                )
+            if artifacts["model_pusher"] is None:
                 return None
-            model_pusher_artifact = self.start_model_pusher(
-                model_trainer_artifact=model_trainer_artifact
-            )
 
-            logging.info(f"Training Pipeline is complete. {model_pusher_artifact}")
+            logging.info(f"Training Pipeline is complete. {artifacts['model_pusher']}")
 
         except Exception as e:
-            raise SensorFaultException(e, sys)
\ No newline at end of file
+            raise SensorFaultException(e, sys)
@@ -1,23 +1,116 @@
+import hashlib
+import json
 import os.path
+import shutil
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
 import pandas as pd
 import dill
 import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
 import yaml
-import json
+from pymongo.errors import AutoReconnect, BulkWriteError
+from sensor_fault_detection.constant.database import (
+    BULK_LOAD_BATCH_SIZE,
+    BULK_LOAD_CHUNK_SIZE,
+    BULK_LOAD_MAX_RETRIES,
+    BULK_LOAD_WRITERS,
+    DUPLICATE_KEY_ERROR_CODE,
+)
+from sensor_fault_detection.constant.training_pipeline import ARTIFACT_FILE_COMPRESSION, SCHEMA_FILE_PATH
 from sensor_fault_detection.exception import SensorFaultException
 from sensor_fault_detection.logger import logging
 from sensor_fault_detection.configuration import mongo_db_connection
 
 
-def dump_csv_file_to_mongodb_collection(file_path: str, database_name: str, collection_name: str) -> None:
+def dataframe_to_documents(dataframe: pd.DataFrame) -> List[dict]:
+    """
+    Convert dataframe rows to mongodb documents of plain python values, NaN becomes None
+    """
+    return dataframe.astype(object).where(dataframe.notna(), None).to_dict("records")
+
+
+def insert_documents(collection, documents: List[dict], max_retries: int = BULK_LOAD_MAX_RETRIES) -> int:
+    """
+    Unordered insert_many of one batch, retried on transient connection errors.
+    insert_many assigns the _id of each document in place, so documents written by a
+    failed attempt come back as duplicate key errors on the retry and count as inserted
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return len(collection.insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            if attempt > 0 and all(error["code"] == DUPLICATE_KEY_ERROR_CODE for error in write_errors):
+                return len(documents)
+            raise
+        except AutoReconnect as e:
+            if attempt == max_retries:
+                raise
+            logging.warning(
+                f"Retrying batch of {len(documents)} documents, attempt {attempt + 1}/{max_retries}: {e}"
+            )
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def dump_csv_file_to_mongodb_collection(
+    file_path: str,
+    database_name: str,
+    collection_name: str,
+    chunk_size: int = BULK_LOAD_CHUNK_SIZE,
+    batch_size: int = BULK_LOAD_BATCH_SIZE,
+    n_writers: int = BULK_LOAD_WRITERS,
+    max_retries: int = BULK_LOAD_MAX_RETRIES,
+) -> int:
+    """
+    Bulk load a csv file into a mongodb collection
+    file_path: str location of the csv file, read chunk_size rows at a time
+    batch_size: number of documents per unordered insert_many
+    n_writers: number of batches in flight at the same time
+    max_retries: retries of a batch on transient connection errors
+    return: number of inserted documents
+    """
     try:
-        # reading the csv file
-        df = pd.read_csv(file_path)
-        logging.info(f"Rows and Columns {df.shape}")
-        df.reset_index(drop=True, inplace=True)
-        json_records = list(json.load(df.T.to_json()).values())
-        mongo_db_connection.MongoDBClient[database_name][collection_name].insert_many(json_records)
+        collection = mongo_db_connection.MongoDBClient(database_name=database_name).database[
+            collection_name
+        ]
+        start = time.perf_counter()
+        rows_read = 0
+        inserted = 0
+        pending = set()
+        with ThreadPoolExecutor(max_workers=n_writers) as executor:
+            for chunk in pd.read_csv(file_path, chunksize=chunk_size, na_values="na"):
+                documents = dataframe_to_documents(chunk)
+                for index in range(0, len(documents), batch_size):
+                    # bound the number of batches held in memory
+                    if len(pending) >= 2 * n_writers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        inserted += sum(future.result() for future in done)
+                    pending.add(
+                        executor.submit(
+                            insert_documents,
+                            collection,
+                            documents[index: index + batch_size],
+                            max_retries,
+                        )
+                    )
+                rows_read += len(chunk)
+                logging.info(
+                    f"Read {rows_read} rows, inserted {inserted} documents "
+                    f"({inserted / (time.perf_counter() - start):.0f} documents/sec)"
+                )
+            inserted += sum(future.result() for future in pending)
+        logging.info(
+            f"Inserted {inserted} documents into {database_name}.{collection_name} "
+            f"in {time.perf_counter() - start:.1f} seconds"
+        )
+        return inserted
     except Exception as e:
         raise SensorFaultException(e, sys)
 
@@ -31,12 +124,44 @@ def read_yaml_file(file_path: str) -> dict:
 
 def write_yaml_file(file_path: str, content: object, replace: bool = False) -> None:
     try:
-        if replace:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        if not replace and os.path.exists(file_path):
+            raise FileExistsError(f"[{file_path}] already exists and replace is False")
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w") as file:
+        # written aside and renamed, like save_object, so that a crash never leaves the file
+        # half written or missing
+        temporary_file_path = f"{file_path}.tmp"
+        with open(temporary_file_path, "w") as file:
             yaml.dump(content, file)
+        os.replace(temporary_file_path, file_path)
+    except Exception as e:
+        raise SensorFaultException(e, sys)
+
+def _to_json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def read_json_file(file_path: str) -> dict:
+    try:
+        with open(file_path, "rb") as json_file:
+            return json.load(json_file)
+    except Exception as e:
+        raise SensorFaultException(e, sys) from e
+
+def write_json_file(file_path: str, content: object) -> None:
+    """
+    Save content as compact json, numpy scalars and arrays are written as numbers and lists
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        # written aside and renamed, like save_object, a report linked to a cache entry is
+        # replaced, not written through
+        temporary_file_path = f"{file_path}.tmp"
+        with open(temporary_file_path, "w") as file:
+            json.dump(content, file, separators=(",", ":"), default=_to_json_value)
+        os.replace(temporary_file_path, file_path)
     except Exception as e:
         raise SensorFaultException(e, sys)
 
@@ -65,21 +190,25 @@ def save_numpy_array_data(file_path: str, array: np.array):
     try:
         dir_path = os.path.dirname(file_path)
         os.makedirs(dir_path, exist_ok=True)
-        with open(file_path, "wb") as file_obj:
+        # written aside and renamed, a memory map of the previous file stays valid
+        temporary_file_path = f"{file_path}.tmp"
+        with open(temporary_file_path, "wb") as file_obj:
             np.save(file_obj, array)
+        os.replace(temporary_file_path, file_path)
     except Exception as e:
         raise SensorFaultException(e, sys) from e
 
 
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: Optional[str] = None) -> np.array:
     """
     load numpy array data from file
     file_path: str location of file to load
+    mmap_mode: "r" maps the file read only instead of reading it, only the pages
+        that are touched are loaded
     return: np.array data loaded
     """
     try:
-        with open(file_path, "rb") as file_obj:
-            return np.load(file_obj)
+        return np.load(file_path, mmap_mode=mmap_mode)
     except Exception as e:
         raise SensorFaultException(e, sys) from e
 
@@ -89,10 +218,365 @@ def save_object(file_path: str, obj: object) -> None:
 
     try:
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "wb") as file_obj:
+        # written aside and renamed, a file linked to a cache entry is replaced, not
+        # written through
+        temporary_file_path = f"{file_path}.tmp"
+        with open(temporary_file_path, "wb") as file_obj:
             dill.dump(obj, file_obj)
+        os.replace(temporary_file_path, file_path)
 
         logging.info("Exited the save_object method of MainUtils class")
 
     except Exception as e:
         raise SensorFaultException(e, sys) from e
+
+
+def get_file_format(file_path: str) -> str:
+    """
+    file format of a dataframe artifact, taken from its extension: csv, parquet or feather
+    """
+    file_format = os.path.splitext(file_path)[1].lstrip(".").lower()
+    if file_format not in ("csv", "parquet", "feather"):
+        raise ValueError(f"Unsupported dataframe file format: [{file_format}] of {file_path}")
+    return file_format
+
+
+def change_file_extension(file_path: str, file_format: str) -> str:
+    return f"{os.path.splitext(file_path)[0]}.{file_format}"
+
+
+def get_file_hash(file_path: str, chunk_size: int = 2 ** 20) -> str:
+    """
+    sha256 hex digest of the file content, read chunk_size bytes at a time
+    """
+    try:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(chunk_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    except Exception as e:
+        raise SensorFaultException(e, sys) from e
+
+
+def link_or_copy_file(source_file_path: str, file_path: str) -> None:
+    """
+    Make file_path refer to the content of source_file_path: a hardlink, so no data is
+    copied, falling back to a copy across filesystems or where links are not supported
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        try:
+            os.link(source_file_path, file_path)
+        except OSError:
+            shutil.copy2(source_file_path, file_path)
+    except Exception as e:
+        raise SensorFaultException(e, sys) from e
+
+
+class DataFrameWriter:
+    """
+    Write dataframe chunks one after the other into a single csv, parquet or feather file,
+    the format is taken from the file extension. Parquet and feather keep the dtypes of the
+    first non empty chunk as the file schema and are compressed with ARTIFACT_FILE_COMPRESSION.
+    When only empty chunks were written the file is still written on close, with no rows and
+    the columns of the first one
+    """
+
+    def __init__(self, file_path: str, compression: str = ARTIFACT_FILE_COMPRESSION):
+        self.file_path = file_path
+        self.file_format = get_file_format(file_path)
+        self.compression = compression
+        self.schema = None
+        self._writer = None
+        self._empty_dataframe = None
+        self.rows = 0
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+
+    def write(self, dataframe: pd.DataFrame) -> None:
+        try:
+            if len(dataframe) == 0:
+                # an empty object column has no type yet, the schema waits for values
+                if self._empty_dataframe is None:
+                    self._empty_dataframe = dataframe
+                return
+            if self.file_format == "csv":
+                dataframe.to_csv(
+                    self.file_path,
+                    index=False,
+                    header=self.rows == 0,
+                    mode="w" if self.rows == 0 else "a",
+                )
+            else:
+                if self.schema is None:
+                    self.schema = pa.Schema.from_pandas(dataframe, preserve_index=False)
+                self.write_table(
+                    pa.Table.from_pandas(dataframe, schema=self.schema, preserve_index=False)
+                )
+            self.rows += len(dataframe)
+        except Exception as e:
+            raise SensorFaultException(e, sys) from e
+
+    def write_table(self, table: pa.Table) -> None:
+        if self._writer is None:
+            self.schema = self.schema or table.schema
+            if self.file_format == "parquet":
+                self._writer = pq.ParquetWriter(
+                    self.file_path, self.schema, compression=self.compression
+                )
+            else:
+                self._writer = ipc.new_file(
+                    self.file_path,
+                    self.schema,
+                    options=ipc.IpcWriteOptions(compression=self.compression),
+                )
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self.rows == 0 and self._writer is None and self._empty_dataframe is not None:
+            if self.file_format == "csv":
+                self._empty_dataframe.to_csv(self.file_path, index=False)
+            else:
+                schema = pa.Schema.from_pandas(self._empty_dataframe, preserve_index=False)
+                self.write_table(
+                    pa.schema(
+                        [
+                            field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                            for field in schema
+                        ],
+                        metadata=schema.metadata,
+                    ).empty_table()
+                )
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_dataframe(dataframe: pd.DataFrame, file_path: str) -> None:
+    """
+    Save dataframe as csv, parquet or feather depending on the file extension
+    """
+    with DataFrameWriter(file_path) as writer:
+        writer.write(dataframe)
+
+
+@lru_cache(maxsize=None)
+def _read_schema_dtypes(schema_file_path: str) -> Tuple[Tuple[str, str], ...]:
+    schema_config = read_yaml_file(schema_file_path)
+    return tuple(
+        (column.strip(), dtype)
+        for column, dtype in schema_config["columns"].items()
+        # the target keeps its "pos"/"neg" labels
+        if column.strip() != schema_config["target_column"]
+    )
+
+
+def get_schema_dtypes(schema_file_path: str = SCHEMA_FILE_PATH) -> Dict[str, str]:
+    """
+    dtype declared in the schema for every feature column
+    """
+    return dict(_read_schema_dtypes(schema_file_path))
+
+
+def apply_schema_dtypes(dataframe: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """
+    Cast the columns of dataframe present in dtypes to their declared dtype in place,
+    values that cannot be parsed (e.g. "na" markers) become NaN
+    """
+    for column, dtype in dtypes.items():
+        if column in dataframe.columns and dataframe[column].dtype != dtype:
+            dataframe[column] = pd.to_numeric(dataframe[column], errors="coerce").astype(dtype)
+    return dataframe
+
+
+def read_dataframe(
+    file_path: str,
+    columns: Optional[List[str]] = None,
+    memory_map: bool = True,
+    dtype: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """
+    Load a csv, parquet or feather dataframe artifact
+    file_path: str location of file to load, the format is taken from the extension
+    columns: only load these columns
+    memory_map: map the file instead of reading it into a buffer first
+    dtype: cast these columns to the given dtype, csv "na" markers are parsed as NaN
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "parquet":
+            dataframe = pd.read_parquet(file_path, columns=columns, memory_map=memory_map)
+        elif file_format == "feather":
+            dataframe = feather.read_table(
+                file_path, columns=columns, memory_map=memory_map
+            ).to_pandas()
+        else:
+            dataframe = pd.read_csv(
+                file_path, usecols=columns, memory_map=memory_map, na_values="na", dtype=dtype
+            )
+        return apply_schema_dtypes(dataframe, dtype) if dtype else dataframe
+    except Exception as e:
+        raise SensorFaultException(e, sys) from e
+
+
+def iter_dataframe_chunks(
+    file_path: str,
+    chunk_size: int,
+    columns: Optional[List[str]] = None,
+    dtype: Optional[Dict[str, str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a csv, parquet or feather dataframe artifact as chunks of at most chunk_size rows,
+    so that files larger than memory can be processed. Same arguments as read_dataframe
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "csv":
+            chunks = pd.read_csv(
+                file_path, usecols=columns, na_values="na", dtype=dtype, chunksize=chunk_size
+            )
+        elif file_format == "parquet":
+            parquet_file = pq.ParquetFile(file_path, memory_map=True)
+            chunks = (
+                batch.to_pandas()
+                for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns)
+            )
+        else:
+            reader = ipc.open_file(pa.memory_map(file_path))
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+            # record batches are zero copy views of the mapped file, slicing them is free
+            chunks = (
+                (batch.select(columns) if columns else batch).slice(offset, chunk_size).to_pandas()
+                for batch in batches
+                for offset in range(0, batch.num_rows, chunk_size)
+            )
+        for chunk in chunks:
+            yield apply_schema_dtypes(chunk, dtype) if dtype else chunk
+    except Exception as e:
+        raise SensorFaultException(e, sys) from e
+
+
+def get_dataframe_columns(file_path: str) -> List[str]:
+    """
+    Column names of a csv, parquet or feather dataframe artifact, read from its header or
+    schema only
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "parquet":
+            return list(pq.read_schema(file_path).names)
+        if file_format == "feather":
+            return list(ipc.open_file(pa.memory_map(file_path)).schema.names)
+        return list(pd.read_csv(file_path, nrows=0).columns)
+    except Exception as e:
+        raise SensorFaultException(e, sys) from e
+
+
+def get_dataframe_row_count(file_path: str) -> int:
+    """
+    Number of rows of a csv, parquet or feather dataframe artifact: from the metadata for
+    parquet, from the memory mapped record batches for feather, csv files are streamed
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "parquet":
+            return pq.ParquetFile(file_path, memory_map=True).metadata.num_rows
+        if file_format == "feather":
+            return ipc.open_file(pa.memory_map(file_path)).read_all().num_rows
+        return sum(len(chunk) for chunk in pd.read_csv(file_path, usecols=[0], chunksize=100000))
+    except Exception as e:
+        raise SensorFaultException(e, sys) from e
+
+
+def read_dataframe_rows(
+    file_path: str,
+    indices: np.ndarray,
+    columns: Optional[List[str]] = None,
+    dtype: Optional[Dict[str, str]] = None,
+    chunk_size: int = 100000,
+) -> pd.DataFrame:
+    """
+    Load the rows at the sorted positions indices of a csv, parquet or feather dataframe
+    artifact. Parquet files are memory mapped and only the row groups holding one of the
+    indices are read and decoded, found from the row counts of the file metadata: the cost
+    is bounded by the number of row groups the indices fall in times their size, up to the
+    whole file once the indices hit every row group. The row count of a compressed feather
+    record batch is only known once it is decoded, feather files are decoded one record
+    batch at a time up to the last index, csv files are streamed chunk_size rows at a time.
+    Same columns and dtype arguments as read_dataframe
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "csv":
+            chunks, offset = [], 0
+            for chunk in iter_dataframe_chunks(file_path, chunk_size, columns=columns, dtype=dtype):
+                start, stop = np.searchsorted(indices, [offset, offset + len(chunk)])
+                chunks.append(chunk.iloc[indices[start:stop] - offset])
+                offset += len(chunk)
+            return pd.concat(chunks, ignore_index=True)
+        tables, offset = [], 0
+        if file_format == "parquet":
+            parquet_file = pq.ParquetFile(file_path, memory_map=True)
+            schema = parquet_file.schema_arrow
+            for group in range(parquet_file.num_row_groups):
+                n_rows = parquet_file.metadata.row_group(group).num_rows
+                start, stop = np.searchsorted(indices, [offset, offset + n_rows])
+                if start < stop:
+                    table = parquet_file.read_row_group(group, columns=columns)
+                    tables.append(table.take(pa.array(indices[start:stop] - offset)))
+                offset += n_rows
+        else:
+            reader = ipc.open_file(pa.memory_map(file_path))
+            schema = reader.schema
+            for batch_index in range(reader.num_record_batches):
+                if len(indices) == 0 or offset > indices[-1]:
+                    break
+                table = pa.Table.from_batches([reader.get_batch(batch_index)])
+                start, stop = np.searchsorted(indices, [offset, offset + table.num_rows])
+                if start < stop:
+                    if columns is not None:
+                        table = table.select(columns)
+                    tables.append(table.take(pa.array(indices[start:stop] - offset)))
+                offset += table.num_rows
+        if not tables:
+            if columns is not None:
+                schema = pa.schema([schema.field(column) for column in columns])
+            tables.append(schema.empty_table())
+        dataframe = pa.concat_tables(tables).to_pandas()
+        return apply_schema_dtypes(dataframe, dtype) if dtype else dataframe
+    except Exception as e:
+        raise SensorFaultException(e, sys) from e
+
+
+def merge_dataframe_files(file_paths: List[str], file_path: str) -> None:
+    """
+    Concatenate dataframe files sharing the same columns, in order, into file_path
+    """
+    try:
+        if get_file_format(file_path) == "csv":
+            with open(file_path, "wb") as merged_file:
+                for index, part_file_path in enumerate(file_paths):
+                    with open(part_file_path, "rb") as part_file:
+                        header = part_file.readline()
+                        if index == 0:
+                            merged_file.write(header)
+                        shutil.copyfileobj(part_file, merged_file)
+            return
+        with DataFrameWriter(file_path) as writer:
+            for part_file_path in file_paths:
+                if get_file_format(part_file_path) == "parquet":
+                    table = pq.read_table(part_file_path, memory_map=True)
+                else:
+                    table = feather.read_table(part_file_path, memory_map=True)
+                writer.write_table(table)
+    except Exception as e:
+        raise SensorFaultException(e, sys) from e
+
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.pipeline.dag import Stage, StageGraph
+
+
+def test_stages_get_the_artifacts_of_their_dependencies():
+    stages = [
+        Stage("sum", lambda a, b: a + b, ("a", "b")),
+        Stage("a", lambda: 1),
+        Stage("b", lambda a: a * 10, ("a",)),
+    ]
+    graph = StageGraph(stages, max_workers=2)
+
+    assert graph.order == ["a", "b", "sum"]
+    assert graph.run() == {"a": 1, "b": 10, "sum": 11}
+
+
+def test_independent_stages_run_at_the_same_time():
+    # each stage waits for the other one, they only both finish when they run together
+    barrier = threading.Barrier(2, timeout=5)
+    stages = [
+        Stage("source", lambda: None),
+        Stage("left", lambda source: barrier.wait(), ("source",)),
+        Stage("right", lambda source: barrier.wait(), ("source",)),
+    ]
+
+    artifacts = StageGraph(stages, max_workers=2).run()
+
+    assert sorted([artifacts["left"], artifacts["right"]]) == [0, 1]
+
+
+def test_one_worker_runs_one_stage_at_a_time():
+    running, overlaps = [], []
+
+    def run():
+        running.append(1)
+        overlaps.append(len(running))
+        time.sleep(0.01)
+        running.pop()
+
+    StageGraph([Stage(name, run) for name in "abcd"], max_workers=1).run()
+
+    assert overlaps == [1, 1, 1, 1]
+
+
+def test_failed_stage_stops_the_stages_after_it():
+    started, slow_started, failed = [], threading.Event(), threading.Event()
+
+    def fail():
+        slow_started.wait(timeout=5)
+        failed.set()
+        raise RuntimeError("stage failed")
+
+    def slow():
+        # still running when the failure is seen, it is waited for
+        slow_started.set()
+        failed.wait(timeout=5)
+        time.sleep(0.2)
+        started.append("slow")
+        return "slow"
+
+    stages = [
+        Stage("fail", fail),
+        Stage("slow", slow),
+        Stage("after_fail", lambda: started.append("after_fail"), ("fail",)),
+        Stage("after_slow", lambda slow: started.append("after_slow"), ("slow",)),
+    ]
+    graph = StageGraph(stages, max_workers=2)
+
+    with pytest.raises(SensorFaultException, match="stage failed"):
+        graph.run()
+    assert started == ["slow"]
+    assert set(graph.report["stages"]) == {"fail", "slow"}
+
+
+@pytest.mark.parametrize(
+    "dependencies, message",
+    [
+        ({"a": ("b",), "b": ("a",)}, "depends on itself"),
+        ({"a": ("c",), "b": ()}, "unknown stage"),
+    ],
+)
+def test_invalid_graph_is_rejected(dependencies, message):
+    stages = [Stage(name, lambda *artifacts: None, needs) for name, needs in dependencies.items()]
+
+    with pytest.raises(SensorFaultException, match=message):
+        StageGraph(stages)
+
+
+def test_report_has_the_critical_path_and_the_slack():
+    stages = [
+        Stage("ingestion", lambda: time.sleep(0.05)),
+        Stage("training", lambda ingestion: time.sleep(0.2), ("ingestion",)),
+        Stage("drift", lambda ingestion: time.sleep(0.1), ("ingestion",)),
+        Stage("pusher", lambda training, drift: None, ("training", "drift")),
+    ]
+    graph = StageGraph(stages, max_workers=2)
+
+    graph.run()
+
+    report = graph.report
+    assert report["critical_path"] == ["ingestion", "training", "pusher"]
+    assert report["stages"]["drift"]["slack"] > 0.05
+    assert report["stages"]["training"]["slack"] < 0.05
+    assert report["stage_seconds"] == pytest.approx(
+        sum(stage["seconds"] for stage in report["stages"].values())
+    )
+    assert report["seconds"] < report["stage_seconds"]
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sensor_fault_detection.components.data_ingestion import DataIngestion
+from sensor_fault_detection.configuration.mongo_db_connection import MongoDBClient
+from sensor_fault_detection.entity.config_entity import DataIngestionConfig, rebase_config
+from sensor_fault_detection.utils.main_utils import (
+    read_dataframe,
+    write_dataframe,
+    write_yaml_file,
+)
+
+
+def make_frame(n_rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "aa_000": rng.random(n_rows),
+            "ab_000": rng.random(n_rows),
+            "class": np.where(rng.random(n_rows) < 0.1, "pos", "neg"),
+        }
+    )
+
+
+def make_data_ingestion(tmp_path, **changes) -> DataIngestion:
+    config = rebase_config(DataIngestionConfig(), str(tmp_path / "artifact"))
+    for name, value in changes.items():
+        setattr(config, name, value)
+    return DataIngestion(config)
+
+
+def split(data_ingestion: DataIngestion, file_paths) -> tuple:
+    data_ingestion.split_data_as_train_test(file_paths)
+    config = data_ingestion.data_ingestion_config
+    return read_dataframe(config.training_file_path), read_dataframe(config.testing_file_path)
+
+
+def test_rows_keep_their_set_when_rows_are_appended(tmp_path):
+    first, appended = make_frame(4000, 0), make_frame(2000, 1)
+    file_paths = [str(tmp_path / "part-00000.parquet"), str(tmp_path / "part-00001.parquet")]
+    write_dataframe(first, file_paths[0])
+    write_dataframe(appended, file_paths[1])
+    data_ingestion = make_data_ingestion(tmp_path, split_chunk_size=700)
+
+    train, test = split(data_ingestion, file_paths[:1])
+    train_after, test_after = split(data_ingestion, file_paths)
+
+    assert len(train) + len(test) == len(first)
+    assert abs(len(test) / len(first) - 0.2) < 0.03
+    # the rows of the first partition are split exactly like before the append
+    pd.testing.assert_frame_equal(train_after.iloc[: len(train)], train)
+    pd.testing.assert_frame_equal(test_after.iloc[: len(test)], test)
+    assert len(train_after) + len(test_after) == len(first) + len(appended)
+
+
+def test_empty_test_set_is_written_with_the_columns(tmp_path):
+    file_path = str(tmp_path / "feature_store.parquet")
+    write_dataframe(make_frame(50, 0), file_path)
+    data_ingestion = make_data_ingestion(tmp_path, train_test_split_ratio=0.0)
+
+    train, test = split(data_ingestion, [file_path])
+
+    assert len(train) == 50
+    assert len(test) == 0
+    assert list(test.columns) == ["aa_000", "ab_000", "class"]
+
+
+def make_incremental_data_ingestion(tmp_path) -> DataIngestion:
+    config = DataIngestionConfig(
+        ingestion_mode="incremental", persistent_feature_store_dir=str(tmp_path / "store")
+    )
+    return DataIngestion(rebase_config(config, str(tmp_path / "artifact")))
+
+
+def test_pending_partition_is_committed_or_removed_by_the_watermark(tmp_path):
+    data_ingestion = make_incremental_data_ingestion(tmp_path)
+    config = data_ingestion.data_ingestion_config
+    store_dir = config.persistent_feature_store_dir
+    for file_name in ("part-00000.parquet", "pending-part-00001.parquet"):
+        write_dataframe(make_frame(10, 0), os.path.join(store_dir, file_name))
+    write_yaml_file(
+        config.watermark_file_path,
+        {"field": "_id", "type": "int", "value": 20, "partition": "part-00001.parquet"},
+    )
+
+    data_ingestion.recover_pending_partitions()
+    # the watermark was saved, only the rename was missing
+    assert sorted(os.listdir(store_dir)) == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+        os.path.basename(config.watermark_file_path),
+    ]
+
+    write_dataframe(make_frame(10, 0), os.path.join(store_dir, "pending-part-00002.parquet"))
+    data_ingestion.recover_pending_partitions()
+    # the watermark was not moved past it, its documents are exported again
+    assert not os.path.exists(os.path.join(store_dir, "pending-part-00002.parquet"))
+    assert data_ingestion.get_feature_store_file_paths() == [
+        os.path.join(store_dir, "part-00000.parquet"),
+        os.path.join(store_dir, "part-00001.parquet"),
+    ]
+
+
+@pytest.mark.parametrize("crash", ["write_watermark", "rename"])
+def test_delta_export_after_a_crash_exports_every_document_once(tmp_path, monkeypatch, crash):
+    mongomock = pytest.importorskip("mongomock")
+    data_ingestion = make_incremental_data_ingestion(tmp_path)
+    config = data_ingestion.data_ingestion_config
+    client = mongomock.MongoClient()
+    monkeypatch.setitem(
+        MongoDBClient.clients, MongoDBClient.get_client_key(config.mongo_compressors), client
+    )
+    collection = client[MongoDBClient(compressors=config.mongo_compressors).database_name][
+        config.collection_name
+    ]
+    documents = make_frame(300, 0).to_dict("records")
+    for index, document in enumerate(documents):
+        document["_id"] = index
+
+    def count_rows() -> int:
+        file_paths = data_ingestion.get_feature_store_file_paths()
+        return sum(len(read_dataframe(file_path)) for file_path in file_paths)
+
+    collection.insert_many(documents[:200])
+    data_ingestion.export_delta_into_feature_store()
+    collection.insert_many(documents[200:])
+    with monkeypatch.context() as patch:
+        if crash == "write_watermark":
+            patch.setattr(data_ingestion, "write_watermark", lambda *args: 1 / 0)
+        else:
+            replace = os.replace
+
+            def crash_on_rename(source, destination):
+                if "pending-" in os.path.basename(source):
+                    raise OSError("crash")
+                replace(source, destination)
+
+            patch.setattr(os, "replace", crash_on_rename)
+        with pytest.raises(Exception):
+            data_ingestion.export_delta_into_feature_store()
+    assert count_rows() == 200
+
+    data_ingestion.export_delta_into_feature_store()
+
+    assert count_rows() == 300
+    assert data_ingestion.read_watermark() == 299
+    file_names = os.listdir(config.persistent_feature_store_dir)
+    assert not any(file_name.startswith("pending-") for file_name in file_names)
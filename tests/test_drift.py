@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from sensor_fault_detection.ml.drift import (
+    MIN_NORMALIZATION_STD,
+    PSI_MIN_PERCENT,
+    numerical_drift_statistics,
+)
+
+
+def make_block(n_rows: int, seed: int, shift: float) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    block = np.column_stack(
+        [
+            rng.normal(shift, 1.0, n_rows),
+            rng.lognormal(shift, 1.0, n_rows),
+            # few distinct values, ties between and within the samples
+            rng.integers(0, 4, n_rows) + shift,
+            np.round(rng.normal(shift, 2.0, n_rows), 1),
+        ]
+    )
+    block[rng.random(block.shape) < 0.1] = np.nan
+    block[0, 1] = np.inf
+    return block
+
+
+def expected_psi(reference: np.ndarray, current: np.ndarray, n_bins: int = 10) -> float:
+    edges = np.quantile(reference, np.linspace(0, 1, n_bins + 1)[1:-1])
+    reference_bins = np.bincount(np.searchsorted(edges, reference, side="right"), minlength=n_bins)
+    current_bins = np.bincount(np.searchsorted(edges, current, side="right"), minlength=n_bins)
+    reference_percents = np.maximum(reference_bins / len(reference), PSI_MIN_PERCENT)
+    current_percents = np.maximum(current_bins / len(current), PSI_MIN_PERCENT)
+    return np.sum(
+        (current_percents - reference_percents) * np.log(current_percents / reference_percents)
+    )
+
+
+@pytest.mark.parametrize("shift", [0.0, 0.5])
+def test_statistics_match_scipy(shift):
+    reference, current = make_block(700, 0, 0.0), make_block(400, 1, shift)
+
+    statistics = numerical_drift_statistics(reference, current)
+
+    for index in range(reference.shape[1]):
+        reference_values = reference[:, index][np.isfinite(reference[:, index])]
+        current_values = current[:, index][np.isfinite(current[:, index])]
+        assert statistics["n_reference"][index] == len(reference_values)
+        assert statistics["n_current"][index] == len(current_values)
+        assert statistics["n_unique"][index] == len(
+            np.unique(np.concatenate([reference_values, current_values]))
+        )
+        assert statistics["ks_statistic"][index] == pytest.approx(
+            stats.ks_2samp(reference_values, current_values).statistic, abs=1e-12
+        )
+        assert statistics["wasserstein_distance_norm"][index] == pytest.approx(
+            stats.wasserstein_distance(reference_values, current_values)
+            / max(reference_values.std(), MIN_NORMALIZATION_STD),
+            rel=1e-9,
+        )
+        assert statistics["psi"][index] == pytest.approx(
+            expected_psi(reference_values, current_values), rel=1e-9
+        )
+
+
+def test_empty_column_has_zero_statistics():
+    reference, current = make_block(50, 0, 0.0), make_block(50, 1, 0.0)
+    current[:, 2] = np.nan
+
+    statistics = numerical_drift_statistics(reference, current)
+
+    assert statistics["n_current"][2] == 0
+    assert statistics["ks_statistic"][2] == 0
+    assert statistics["wasserstein_distance_norm"][2] == 0
+    assert statistics["ks_statistic"][0] > 0
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import RobustScaler
+
+from sensor_fault_detection.ml.estimator import SensorFaultModel
+from sensor_fault_detection.ml.feature_pruning import (
+    FeaturePruner,
+    get_output_columns,
+    prune_preprocessor,
+)
+
+
+def make_frame(n_rows: int = 200, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {
+            "aa_000": rng.normal(size=n_rows),
+            "ab_000": np.nan,
+            "ac_000": rng.normal(size=n_rows),
+            "ad_000": 1.0,
+            "ae_000": rng.normal(size=n_rows),
+        }
+    )
+    frame.loc[::7, "ac_000"] = np.nan
+    return frame
+
+
+def make_preprocessor() -> Pipeline:
+    return Pipeline(
+        steps=[
+            ("imputer", SimpleImputer(strategy="constant", fill_value=0)),
+            ("scaler", RobustScaler()),
+        ]
+    )
+
+
+def test_all_missing_column_is_dropped_before_the_fit():
+    frame = make_frame()
+    y = np.arange(len(frame)) % 2
+    pruner = FeaturePruner(max_missing_ratio=1.0)
+    columns = pruner.select_missing_ratio(frame.isna().mean())
+    assert "ab_000" not in columns
+
+    preprocessor = make_preprocessor().fit(frame[columns])
+    x = preprocessor.transform(frame[columns])
+    positions = pruner.fit(x, y, columns=get_output_columns(preprocessor))
+
+    assert pruner.report["dropped_columns"]["missing_ratio"] == {"ab_000": 1.0}
+    assert pruner.report["n_columns"] == frame.shape[1]
+    pruned = prune_preprocessor(preprocessor, positions)
+    assert pruned.steps[0][1].columns == pruner.report["kept_columns"]
+    np.testing.assert_allclose(pruned.transform(frame), x[:, positions])
+
+
+def test_prune_preprocessor_fitted_with_an_all_missing_column():
+    frame = make_frame()
+    y = np.arange(len(frame)) % 2
+    preprocessor = make_preprocessor().fit(frame)
+    x = preprocessor.transform(frame)
+    columns = get_output_columns(preprocessor)
+    assert x.shape[1] == len(columns)
+
+    pruner = FeaturePruner(max_missing_ratio=0.7)
+    positions = pruner.fit(x, y, columns=columns, missing_ratios=frame.isna().mean())
+    kept_columns = pruner.report["kept_columns"]
+    assert kept_columns == ["aa_000", "ac_000", "ae_000"]
+
+    pruned = prune_preprocessor(preprocessor, positions)
+    expected = x[:, positions]
+    np.testing.assert_allclose(pruned.transform(frame), expected)
+    # the compiled preprocessor of the saved model gives the same features
+    model = SensorFaultModel(pruned, None)
+    assert model.feature_columns == kept_columns
+    np.testing.assert_allclose(model.compiled_preprocessor.transform(frame), expected, rtol=1e-5)
@@ -0,0 +1,135 @@
+import os
+from dataclasses import dataclass
+
+import pytest
+
+from sensor_fault_detection.entity.artifact_entity import (
+    DataIngestionArtifact,
+    SchemaValidationArtifact,
+)
+from sensor_fault_detection.pipeline.manifest import StageManifest
+
+
+@dataclass
+class StageConfig:
+    output_file_path: str
+    chunk_size: int = 10
+
+
+def write_file(file_path: str, content: str) -> str:
+    with open(file_path, "w") as file:
+        file.write(content)
+    return file_path
+
+
+def run_stage(manifest: StageManifest, config: StageConfig, inputs: dict, calls: list):
+    """the stage of the test: counts its runs and writes its output file"""
+    fingerprint = manifest.get_fingerprint(config, inputs)
+    artifact = manifest.load("stage", DataIngestionArtifact, fingerprint)
+    if artifact is None:
+        calls.append(1)
+        artifact = DataIngestionArtifact(
+            trained_file_path=write_file(config.output_file_path, "train"),
+            test_file_path=write_file(f"{config.output_file_path}.test", "test"),
+        )
+        manifest.save("stage", fingerprint, artifact, seconds=1.0)
+    return artifact
+
+
+def test_unchanged_stage_is_reused(tmp_path):
+    manifest = StageManifest(str(tmp_path / "manifests"))
+    config = StageConfig(str(tmp_path / "train.csv"))
+    inputs = {"source": write_file(str(tmp_path / "source.csv"), "rows")}
+    calls = []
+
+    first = run_stage(manifest, config, inputs, calls)
+    second = run_stage(manifest, config, inputs, calls)
+
+    assert len(calls) == 1
+    assert second == first
+
+
+def test_changed_config_inputs_or_outputs_run_the_stage_again(tmp_path):
+    manifest = StageManifest(str(tmp_path / "manifests"))
+    config = StageConfig(str(tmp_path / "train.csv"))
+    source_file_path = write_file(str(tmp_path / "source.csv"), "rows")
+    inputs = {"source": source_file_path}
+    calls = []
+    run_stage(manifest, config, inputs, calls)
+
+    run_stage(manifest, StageConfig(config.output_file_path, chunk_size=20), inputs, calls)
+    assert len(calls) == 2
+    write_file(source_file_path, "more rows")
+    run_stage(manifest, StageConfig(config.output_file_path, chunk_size=20), inputs, calls)
+    assert len(calls) == 3
+    os.remove(f"{config.output_file_path}.test")
+    run_stage(manifest, StageConfig(config.output_file_path, chunk_size=20), inputs, calls)
+    assert len(calls) == 4
+    run_stage(manifest, StageConfig(config.output_file_path, chunk_size=20), inputs, calls)
+    assert len(calls) == 4
+
+
+def test_checksum_ignores_a_touched_input(tmp_path):
+    manifest = StageManifest(str(tmp_path / "manifests"), checksum=True)
+    config = StageConfig(str(tmp_path / "train.csv"))
+    source_file_path = write_file(str(tmp_path / "source.csv"), "rows")
+    calls = []
+    run_stage(manifest, config, {"source": source_file_path}, calls)
+
+    os.utime(source_file_path, ns=(0, 0))
+    run_stage(manifest, config, {"source": source_file_path}, calls)
+
+    assert len(calls) == 1
+
+
+def test_artifact_with_optional_fields_is_read_back(tmp_path):
+    manifest = StageManifest(str(tmp_path / "manifests"))
+    artifact = SchemaValidationArtifact(
+        validation_status=True,
+        message="",
+        schema_report_file_path=write_file(str(tmp_path / "schema_report.json"), "{}"),
+        sample_file_paths={"train": write_file(str(tmp_path / "train.parquet"), "sample")},
+        complete_samples={"train": False},
+    )
+    fingerprint = manifest.get_fingerprint(StageConfig(""), {})
+    manifest.save("schema_validation", fingerprint, artifact, seconds=1.0)
+
+    assert manifest.load("schema_validation", SchemaValidationArtifact, fingerprint) == artifact
+    write_file(artifact.sample_file_paths["train"], "another sample")
+    assert manifest.load("schema_validation", SchemaValidationArtifact, fingerprint) is None
+
+
+def test_named_run_resumes_after_the_last_completed_stage(tmp_path, monkeypatch):
+    # the pipeline imports the s3 model evaluation
+    pytest.importorskip("botocore")
+    from sensor_fault_detection.pipeline.training_pipeline import TrainPipeline
+
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def start_stage(name: str) -> DataIngestionArtifact:
+        calls.append(name)
+        if name == "failing" and calls.count(name) == 1:
+            raise RuntimeError("stage failed")
+        output_file_path = write_file(str(tmp_path / f"{name}.csv"), name)
+        return DataIngestionArtifact(output_file_path, output_file_path)
+
+    def run(train_pipeline) -> None:
+        for name in ("completed", "failing"):
+            train_pipeline.run_stage(
+                name,
+                train_pipeline.data_ingestion_config,
+                {},
+                DataIngestionArtifact,
+                lambda: start_stage(name),
+            )
+
+    try:
+        run(TrainPipeline(run_name="run"))
+    except Exception:
+        pass
+    run(TrainPipeline(run_name="run"))
+    assert calls == ["completed", "failing", "failing"]
+    # a new run does not reuse the stages of the earlier one
+    run(TrainPipeline())
+    assert calls == ["completed", "failing", "failing", "completed", "failing"]
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sensor_fault_detection.utils.main_utils import DataFrameWriter, read_dataframe_rows
+
+
+def write_in_chunks(frame: pd.DataFrame, file_path: str, chunk_size: int) -> None:
+    # one row group (record batch) per chunk
+    with DataFrameWriter(file_path) as writer:
+        for start in range(0, len(frame), chunk_size):
+            writer.write(frame.iloc[start: start + chunk_size])
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "feather", "csv"])
+@pytest.mark.parametrize("n_indices", [0, 1, 40, 1000])
+def test_rows_across_row_groups(tmp_path, file_format, n_indices):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(rng.random((1000, 4)), columns=["a", "b", "c", "d"])
+    file_path = str(tmp_path / f"frame.{file_format}")
+    write_in_chunks(frame, file_path, chunk_size=97)
+    indices = np.sort(rng.choice(len(frame), n_indices, replace=False))
+
+    rows = read_dataframe_rows(file_path, indices, columns=["b", "d"], chunk_size=97)
+
+    assert list(rows.columns) == ["b", "d"]
+    np.testing.assert_allclose(rows.to_numpy(), frame[["b", "d"]].to_numpy()[indices])
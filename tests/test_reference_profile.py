@@ -0,0 +1,91 @@
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from sensor_fault_detection.components.data_validation import DataValidation
+from sensor_fault_detection.entity.artifact_entity import (
+    DataIngestionArtifact,
+    SchemaValidationArtifact,
+)
+from sensor_fault_detection.entity.config_entity import DataValidationConfig, rebase_config
+from sensor_fault_detection.ml.drift import ReferenceProfile
+from sensor_fault_detection.utils.main_utils import read_json_file, write_dataframe
+
+
+def make_frame(n_rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {
+            "aa_000": rng.lognormal(size=n_rows),
+            "ab_000": rng.integers(0, 3, size=n_rows).astype(float),
+            "ac_000": rng.normal(size=n_rows),
+            "class": np.where(rng.random(n_rows) < 0.1, "pos", "neg"),
+        }
+    )
+    frame.loc[::5, "ac_000"] = np.nan
+    return frame
+
+
+def test_column_groups_profile_is_the_whole_frame_profile():
+    frame = make_frame(2000, 0)
+    expected = ReferenceProfile.from_dataframe(frame, n_bins=20).to_dict()
+    groups = (frame[["aa_000", "ab_000"]], frame[["ac_000"]], frame[["class"]])
+    assert ReferenceProfile.from_column_groups(groups, n_bins=20).to_dict() == expected
+
+
+def test_sample_mode_profiles_the_whole_train_file(tmp_path):
+    train, test = make_frame(3000, 0), make_frame(1000, 1)
+    file_paths = {}
+    for name, frame in (("train", train), ("test", test)):
+        file_paths[name] = str(tmp_path / f"{name}.parquet")
+        write_dataframe(frame, file_paths[name])
+    config = rebase_config(DataValidationConfig(), str(tmp_path / "artifact"))
+    config.validation_mode = "sample"
+    config.sample_size = 500
+    config.reference_profile_columns_per_read = 2
+
+    DataValidation(
+        DataIngestionArtifact(
+            trained_file_path=file_paths["train"], test_file_path=file_paths["test"]
+        ),
+        config,
+    ).initiate_drift_detection(SchemaValidationArtifact(True, "", config.schema_report_file_path))
+
+    profile = ReferenceProfile.load(config.reference_profile_file_path)
+    assert profile.n_rows == len(train)
+    expected = ReferenceProfile.from_dataframe(
+        DataValidation.read_data(file_paths["train"]), n_bins=config.reference_profile_n_bins
+    )
+    assert profile.to_dict() == expected.to_dict()
+
+
+def test_drift_detection_reads_back_the_schema_validation_samples(tmp_path, monkeypatch):
+    file_paths = {}
+    for name, frame in (("train", make_frame(3000, 0)), ("test", make_frame(1000, 1))):
+        file_paths[name] = str(tmp_path / f"{name}.parquet")
+        write_dataframe(frame, file_paths[name])
+    data_ingestion_artifact = DataIngestionArtifact(
+        trained_file_path=file_paths["train"], test_file_path=file_paths["test"]
+    )
+    config = rebase_config(DataValidationConfig(), str(tmp_path / "artifact"))
+    config.validation_mode = "sample"
+    config.sample_size = 500
+
+    schema_validation_artifact = DataValidation(
+        data_ingestion_artifact, config
+    ).initiate_schema_validation()
+    assert schema_validation_artifact.sample_file_paths == {
+        "train": config.train_sample_file_path,
+        "test": config.test_sample_file_path,
+    }
+    assert schema_validation_artifact.complete_samples == {"train": False, "test": False}
+
+    # another instance, like the drift detection stage of the pipeline, draws no new sample
+    data_validation = DataValidation(data_ingestion_artifact, config)
+    monkeypatch.setattr(data_validation, "get_validation_samples", None)
+    data_validation.initiate_drift_detection(
+        replace(schema_validation_artifact, validation_status=True)
+    )
+    drift_report = read_json_file(config.drift_report_file_path)
+    assert drift_report["summary"]["validation_mode"] == "sample"
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.dummy import DummyClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import RobustScaler
+
+from sensor_fault_detection.exception import SensorFaultException
+from sensor_fault_detection.ml.estimator import SensorFaultModel
+from sensor_fault_detection.ml.schema_validation import SchemaValidator
+
+SCHEMA_CONFIG = {
+    "target_column": "class",
+    "columns": {"aa_000": "float32", "ab_000": "float32", "class": "object"},
+    "required_columns": ["aa_000"],
+    "validation": {
+        "feature_constraints": {"min_value": 0, "max_missing_ratio": 0.5},
+        "column_constraints": {"class": {"allowed_values": ["neg", "pos"]}},
+    },
+}
+
+
+def make_batch() -> pd.DataFrame:
+    return pd.DataFrame({"aa_000": [1.0, 2.0], "ab_000": [np.nan, np.nan]})
+
+
+def test_serving_batch_needs_no_target_and_no_missing_ratio():
+    validator = SchemaValidator(SCHEMA_CONFIG)
+
+    report = validator.validate(make_batch(), serving=True)
+
+    assert report["validation_status"], report["errors"]
+    # the same batch as a dataset misses the target and ab_000 is mostly missing
+    assert not validator.validate(make_batch())["validation_status"]
+
+
+def test_serving_batch_still_checks_the_features():
+    validator = SchemaValidator(SCHEMA_CONFIG)
+    batch = make_batch()
+    batch.loc[0, "aa_000"] = -1.0
+
+    report = validator.validate(make_batch().drop(columns=["ab_000"]), serving=True)
+    assert report["validation_status"]
+    report = validator.validate(batch, serving=True)
+    assert report["errors"] == ["aa_000: 1 values outside [0, inf]"]
+    report = validator.validate(batch.drop(columns=["aa_000"]), serving=True)
+    assert report["errors"] == ["missing required columns: ['aa_000']"]
+
+
+def test_predict_validates_the_batch_with_a_validator():
+    train = pd.DataFrame({"aa_000": [1.0, 2.0, 3.0, 4.0], "ab_000": [0.0, 1.0, 0.0, 1.0]})
+    preprocessor = Pipeline(
+        [("imputer", SimpleImputer(strategy="constant", fill_value=0)), ("scaler", RobustScaler())]
+    ).fit(train)
+    classifier = DummyClassifier(strategy="most_frequent").fit(train, [0, 0, 1, 0])
+    batch = make_batch()
+    batch.loc[0, "aa_000"] = -1.0
+
+    assert list(SensorFaultModel(preprocessor, classifier).predict(batch)) == [0, 0]
+    model = SensorFaultModel(preprocessor, classifier, SchemaValidator(SCHEMA_CONFIG))
+    with pytest.raises(SensorFaultException, match="Invalid prediction batch"):
+        model.predict(batch)
+    assert list(model.predict(make_batch())) == [0, 0]